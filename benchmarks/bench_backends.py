@@ -0,0 +1,83 @@
+# benchmarks/bench_backends.py
+# Jämför lagringarna för vänner (json med cache och SQLite) vid olika storlekar.
+# Kör från projektets rot:
+#   python benchmarks/bench_backends.py                 (10k, 100k och 1M vänner)
+#   python benchmarks/bench_backends.py 10000 50000     (egna storlekar)
+# Allt skrivs i en tillfällig katalog, friends.json i projektet rörs inte.
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from myblueprints import jsoncodec
+from myblueprints.repositories.friendrepository import FriendRepository
+from myblueprints.repositories.friendsqliterepository import FriendSQLiteRepository
+
+SIZES = [10_000, 100_000, 1_000_000]
+STATUSES = ["Kompis", "Awesome", "Friend", "Kollega", "Familj"]
+LOOKUPS = 2000
+PAGES = 200
+
+def make_friends(n):
+    return [{"id": i, "name": f"Vän Nummer{i}", "email": f"van{i}@example.com",
+             "status": STATUSES[i % len(STATUSES)]} for i in range(1, n + 1)]
+
+def timed(func, repeat):
+    """Medeltid per anrop i mikrosekunder."""
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def measure(repo, n, writes):
+    rnd = random.Random(1)
+    ids = [rnd.randint(1, n) for _ in range(LOOKUPS)]
+    results = {
+        'get_by_id': timed(lambda i: repo.get_by_id(ids[i]), LOOKUPS),
+        'get_by_email': timed(lambda i: repo.get_by_email(f"van{ids[i]}@example.com"), LOOKUPS),
+        'page(50)': timed(lambda i: repo.get_page(ids[i], 50), PAGES),
+        'by_status(page 50)': timed(lambda i: repo.get_page(ids[i], 50, {"status": "Friend"}), PAGES),
+    }
+    results['update'] = timed(lambda i: repo.update(ids[i], {"status": "Awesome"}), writes)
+    results['add'] = timed(lambda i: repo.add({"id": n + 1 + i, "name": "Ny Vän",
+                                               "email": f"ny{i}@example.com", "status": "Kompis"}), writes)
+    return results
+
+def run(n, workdir):
+    # Två filer: JSON-lagringen skriver sina ändringar till sin egen, SQLite importerar den andra
+    source_path = os.path.join(workdir, f'source-{n}.json')
+    json_path = os.path.join(workdir, f'friends-{n}.json')
+    db_path = os.path.join(workdir, f'friends-{n}.db')
+    jsoncodec.write_file(source_path, make_friends(n), compact=True)
+    shutil.copy(source_path, json_path)
+    # JSON-lagringen skriver om hela filen vid varje ändring, så färre skrivningar vid 1M
+    writes = 20 if n <= 100_000 else 5
+
+    start = time.perf_counter()
+    json_repo = FriendRepository(json_path, cache=True)
+    json_repo.get_version()
+    json_load = time.perf_counter() - start
+    json_results = measure(json_repo, n, writes)
+
+    start = time.perf_counter()
+    sqlite_repo = FriendSQLiteRepository(db_path)
+    sqlite_repo.import_json(source_path)
+    sqlite_load = time.perf_counter() - start
+    sqlite_results = measure(sqlite_repo, n, writes)
+    sqlite_repo.close()
+
+    print(f'\n{n:,} vänner   (inläsning: json {json_load:.2f} s, sqlite-import {sqlite_load:.2f} s)')
+    print(f'  {"operation":<20}{"json µs":>14}{"sqlite µs":>14}')
+    for name in json_results:
+        print(f'  {name:<20}{json_results[name]:>14,.1f}{sqlite_results[name]:>14,.1f}')
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f'JSON-kodare: {jsoncodec.BACKEND}')
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            run(n, workdir)
@@ -0,0 +1,102 @@
+# benchmarks/bench_batch.py
+# Hur /regex/batch skalar med antalet arbetsprocesser (REGEX_WORKERS).
+# Varje antal körs i en egen process med REGEX_WORKERS satt, eftersom regex_bp läser
+# variabeln när modulen laddas. Dokumenten är rader ur samma påhittade logg som i
+# bench_regex.py. Två tider mäts, bästa av RUNS:
+#   analys  - analysera_manga: skanningen, i processpoolen när WORKERS > 1
+#   anrop   - hela POST /regex/batch via Flasks testklient, inklusive JSON in och ut
+#             (den delen körs alltid i en process och begränsar hur mycket anropet kan skala)
+# Processpoolen startas före mätningen, så uppstarten av processerna räknas inte.
+# Skalningen syns bara på en maskin med flera kärnor: med 1 kärna visar den bara vad
+# överföringen till processerna kostar. Hittills är den bara körd på 1 kärna, så att
+# /regex/batch skalar (nästan) linjärt med antalet kärnor är INTE visat än.
+# Kör från projektets rot:
+#   python benchmarks/bench_batch.py                 (1, 2, 4, ... upp till antalet kärnor)
+#   python benchmarks/bench_batch.py 1 2 8           (egna antal processer)
+#   python benchmarks/bench_batch.py --docs 4000 --kb 4 1 4
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DOCS = 1000
+DOC_KB = 20
+RUNS = 3
+
+def make_documents(count, kb, seed=1):
+    from benchmarks.bench_regex import make_line
+    rnd = random.Random(seed)
+    documents, i = [], 0
+    for d in range(count):
+        lines, size = [], 0
+        while size < kb * 1000:
+            line = make_line(rnd, i)
+            lines.append(line)
+            size += len(line)
+            i += 1
+        documents.append({"name": f"dok{d}.log", "content": ''.join(lines)})
+    return documents
+
+def best_of(func):
+    best = float('inf')
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def measure(count, kb):
+    # Körs i barnprocessen med REGEX_WORKERS satt. Returnerar (analys, anrop) i sekunder.
+    from myblueprints import regex_bp
+    import flask_app
+    documents = make_documents(count, kb)
+    pairs = [(doc['name'], doc['content']) for doc in documents]
+    if regex_bp.WORKERS > 1:
+        # Starta alla processer innan mätningen
+        list(regex_bp.get_pool().map(regex_bp.analysera_dokument, ['x'] * regex_bp.WORKERS * 4))
+    client = flask_app.app.test_client()
+    analysis = best_of(lambda: regex_bp.analysera_manga(pairs))
+    def request():
+        response = client.post('/regex/batch', json={"documents": documents})
+        assert response.status_code == 200
+    return analysis, best_of(request)
+
+def run_workers(workers, count, kb):
+    env = dict(os.environ, PYTHONPATH=ROOT, REGEX_WORKERS=str(workers))
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(count), str(kb)],
+                         env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return [float(value) for value in out.split()[-2:]]
+
+def default_workers():
+    cores = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 <= cores:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != cores:
+        workers.append(cores)
+    return workers
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--child']:
+        sys.path.insert(0, ROOT)
+        print(*measure(int(args[1]), int(args[2])))
+        sys.exit()
+    count, kb = DOCS, DOC_KB
+    while args[:1] in (['--docs'], ['--kb']):
+        if args[0] == '--docs':
+            count = int(args[1])
+        else:
+            kb = int(args[1])
+        args = args[2:]
+    workers = [int(arg) for arg in args] or default_workers()
+    print(f'{count:,} dokument à {kb} KB, {os.cpu_count()} kärnor')
+    print(f'  {"processer":<10}{"analys s":>10}{"skalning":>10}{"anrop s":>10}{"skalning":>10}')
+    base = None
+    for n in workers:
+        analysis, request = run_workers(n, count, kb)
+        base = base or (analysis, request)
+        print(f'  {n:<10}{analysis:>10.2f}{base[0] / analysis:>9.2f}x{request:>10.2f}{base[1] / request:>9.2f}x')
@@ -0,0 +1,84 @@
+# benchmarks/bench_html.py
+# Jämför HTML-tolkningen i skraparna på de sparade sidorna i tests/fixtures:
+#   hela/html.parser  - som förut: hela sidan byggs med html.parser, sedan find_all
+#   hela/lxml         - hela sidan, men med lxml
+#   sil/html.parser   - parse_only (SoupStrainer), bara nyhetskort/bokningar byggs
+#   sil/lxml          - parse_only med lxml (standard när lxml är installerat)
+# Sidans innehåll (allt i <body>) upprepas så att sidan blir ungefär lika stor som de riktiga
+# (du.se runt 200 KB, ett TimeEdit-schema för en termin mer). Alla varianter kontrolleras
+# mot "hela/html.parser" så att de ger samma resultat.
+# Kör från projektets rot:
+#   python benchmarks/bench_html.py                 (ungefär 200 KB och 1 MB per sida)
+#   python benchmarks/bench_html.py 50              (egen upprepning av innehållet)
+#   python -m pip install lxml                      (för att jämföra med lxml)
+import os
+import sys
+import time
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup
+
+from myblueprints import dunews_bp, duschema_bp, htmlparse
+
+FIXTURES = os.path.join(ROOT, 'tests', 'fixtures')
+PAGES = {'nyheter': ('dunews.html', dunews_bp.parse_du_news, dunews_bp),
+         'schema': ('duschema.html', duschema_bp.tolka_schema, duschema_bp)}
+# Ungefärliga sidstorlekar i byte som mäts om inget annat anges
+TARGET_SIZES = [200_000, 1_000_000]
+MIN_SECONDS = 1.0
+
+def load_page(name, repeat):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        html = f.read()
+    start = html.index(b'>', html.index(b'<body')) + 1
+    end = html.rindex(b'</body>')
+    return html[:start] + html[start:end] * repeat + html[end:]
+
+def parser_names():
+    try:
+        import lxml  # noqa: F401
+        return ['html.parser', 'lxml']
+    except ImportError:
+        return ['html.parser']
+
+def variants(module):
+    for parser in parser_names():
+        # Hela sidan: parse_only byts mot en vanlig BeautifulSoup av allt
+        whole = lambda markup, name, class_, parser=parser: BeautifulSoup(markup, parser)
+        yield f'hela/{parser}', mock.patch.object(module, 'parse_only', whole)
+        yield f'sil/{parser}', mock.patch.object(htmlparse, 'HTML_PARSER', parser)
+
+def timed(func, html):
+    """Bästa tiden per tolkning i millisekunder, och resultatet."""
+    best, total, runs = float('inf'), 0.0, 0
+    while total < MIN_SECONDS or runs < 3:
+        start = time.perf_counter()
+        result = func(html)
+        elapsed = time.perf_counter() - start
+        best, total, runs = min(best, elapsed), total + elapsed, runs + 1
+    return best * 1e3, result
+
+def run(page, repeat):
+    name, func, module = PAGES[page]
+    html = load_page(name, repeat)
+    results = {}
+    for variant, patch in variants(module):
+        with patch:
+            results[variant] = timed(func, html)
+    baseline_ms, expected = results['hela/html.parser']
+    print(f'\n{page}: {len(html) / 1024:,.0f} KiB, {len(expected)} träffar')
+    print(f'  {"":<18}{"ms":>10}{"snabbare":>10}')
+    for variant, (ms, result) in results.items():
+        same = '' if result == expected else '   OLIKA RESULTAT!'
+        print(f'  {variant:<18}{ms:>10,.1f}{baseline_ms / ms:>9.1f}x{same}')
+
+if __name__ == '__main__':
+    repeats = [int(arg) for arg in sys.argv[1:]]
+    print(f'Tolkare: {", ".join(parser_names())} (skraparna använder {htmlparse.HTML_PARSER})')
+    for page, (name, _, _) in PAGES.items():
+        size = os.path.getsize(os.path.join(FIXTURES, name))
+        for repeat in repeats or [max(1, round(target / size)) for target in TARGET_SIZES]:
+            run(page, repeat)
@@ -0,0 +1,66 @@
+# benchmarks/bench_json.py
+# Jämför JSON-kodningen i jsoncodec (orjson om det är installerat) med standardbibliotekets
+# json, för en lista med vänner: koda till ett HTTP-svar, koda till fil (med indrag), och
+# avkoda. "orjson rå" är orjson utan jsoncodecs kontroll av långa heltal (se loads), så att
+# det syns vad kontrollen kostar.
+# Kör från projektets rot:
+#   python benchmarks/bench_json.py                 (1k, 100k och 1M vänner)
+#   python benchmarks/bench_json.py 50000           (egen storlek)
+#   python -m pip install orjson                    (för att jämföra med orjson)
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_backends import make_friends
+from myblueprints import jsoncodec
+
+SIZES = [1_000, 100_000, 1_000_000]
+# Minst så här lång tid per mätning (små listor kodas många gånger)
+MIN_SECONDS = 0.5
+
+def timed(func):
+    """Bästa tiden per anrop i millisekunder."""
+    best, total, runs = float('inf'), 0.0, 0
+    while total < MIN_SECONDS or runs < 3:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best, total, runs = min(best, elapsed), total + elapsed, runs + 1
+    return best * 1e3
+
+def variants(friends):
+    text = json.dumps(friends).encode()
+    result = {
+        'json': {
+            'koda svar': lambda: json.dumps(friends, separators=(',', ':')).encode(),
+            'koda fil': lambda: json.dumps(friends, indent=4).encode(),
+            'avkoda': lambda: json.loads(text),
+        },
+        'jsoncodec': {
+            'koda svar': lambda: jsoncodec.dumpb(friends),
+            'koda fil': lambda: jsoncodec.dumpb(friends, indent=True),
+            'avkoda': lambda: jsoncodec.loads(text),
+        },
+    }
+    if jsoncodec.orjson is not None:
+        result['orjson rå'] = {'avkoda': lambda: jsoncodec.orjson.loads(text)}
+    return result
+
+def run(n):
+    friends = make_friends(n)
+    print(f'\n{n:,} vänner   ({len(json.dumps(friends)) / 1e6:,.1f} MB JSON)')
+    results = {name: {op: timed(func) for op, func in ops.items()} for name, ops in variants(friends).items()}
+    names = list(results)
+    print(f'  {"ms":<12}' + ''.join(f'{name:>12}' for name in names) + f'{"json/codec":>12}')
+    for op in results['json']:
+        row = ''.join(f'{results[name][op]:>12,.2f}' if op in results[name] else f'{"":>12}' for name in names)
+        print(f'  {op:<12}{row}{results["json"][op] / results["jsoncodec"][op]:>11.1f}x')
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f'JSON-kodare: {jsoncodec.BACKEND}')
+    for n in sizes:
+        run(n)
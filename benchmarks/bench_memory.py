@@ -0,0 +1,101 @@
+# benchmarks/bench_memory.py
+# Mäter hur mycket minne vännerna tar när de ligger i minnet:
+#   dicts   - en lista med vanliga dicts (som jsoncodec.read_file ger)
+#   cache   - FriendRepository(cache=True): FriendTable med e-post- och statusindex, där
+#             filen läses en vän i taget rakt in i kolumnerna (jsoncodec.iter_file)
+# Varje variant körs i en egen process, så att minnet från en mätning inte hamnar i nästa.
+# "behållet" är allt som fortfarande är allokerat när vännerna är inlästa (tracemalloc),
+# RSS är hur mycket processen växte enligt operativsystemet (inklusive minne som användes
+# under inläsningen och sedan släpptes). Inläsningstiden mäts i en andra inläsning utan
+# tracemalloc, som annars gör allt flera gånger långsammare.
+# Kör från projektets rot:
+#   python benchmarks/bench_memory.py                 (100k och 1M vänner)
+#   python benchmarks/bench_memory.py 50000           (egen storlek)
+#   python benchmarks/bench_memory.py --root ../gammal 1000000
+#       (mät cache-varianten i en annan utcheckning, t.ex. en äldre commit)
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = [100_000, 1_000_000]
+VARIANTS = ['dicts', 'cache']
+
+def rss_bytes():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def load(variant, path):
+    # Importeras här: barnprocessen ska använda myblueprints från den utcheckning som mäts
+    from myblueprints import jsoncodec
+    from myblueprints.repositories.friendrepository import FriendRepository
+    if variant == 'dicts':
+        return jsoncodec.read_file(path)
+    repo = FriendRepository(path, cache=True)
+    repo.get_version()
+    return repo
+
+def measure(variant, path):
+    # Körs i barnprocessen. Returnerar (behållet, rss, sekunder).
+    # Först en liten fil: modulerna (Flask m.m.) ska vara importerade innan vi börjar mäta
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        f.write('[]')
+    load(variant, f.name)
+    os.remove(f.name)
+    gc.collect()
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    kept = load(variant, path)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = rss_bytes() - rss_before
+    del kept
+    start = time.perf_counter()
+    load(variant, path)
+    return retained, rss, time.perf_counter() - start
+
+def run_variant(variant, path, root):
+    env = dict(os.environ, PYTHONPATH=root)
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', variant, path, root],
+                         env=env, check=True, capture_output=True, text=True).stdout
+    return [float(value) for value in out.split()]
+
+def run(n, workdir, root):
+    from benchmarks.bench_search import make_friends
+    from myblueprints import jsoncodec
+    path = os.path.join(workdir, f'friends-{n}.json')
+    jsoncodec.write_file(path, make_friends(n), compact=True)
+    print(f'\n{n:,} vänner   (filen är {os.path.getsize(path) / 1e6:,.0f} MB)')
+    print(f'  {"":<8}{"behållet MB":>14}{"byte/vän":>10}{"RSS MB":>10}{"inläsning s":>13}')
+    results = {}
+    for variant in VARIANTS:
+        retained, rss, seconds = run_variant(variant, path, root if variant == 'cache' else ROOT)
+        results[variant] = retained, rss
+        print(f'  {variant:<8}{retained / 1e6:>14,.1f}{retained / n:>10,.0f}{rss / 1e6:>10,.1f}{seconds:>13.2f}')
+    (dicts_retained, dicts_rss), (cache_retained, cache_rss) = results['dicts'], results['cache']
+    print(f'  dicts / cache: {dicts_retained / cache_retained:.1f}x behållet, {dicts_rss / cache_rss:.1f}x RSS')
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--child']:
+        sys.path.insert(0, args[3])
+        print(*measure(args[1], args[2]))
+        sys.exit()
+    sys.path.insert(0, ROOT)
+    root = ROOT
+    if args[:1] == ['--root']:
+        root = os.path.abspath(args[1])
+        args = args[2:]
+    sizes = [int(arg) for arg in args] or SIZES
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            run(n, workdir, root)
@@ -0,0 +1,139 @@
+# benchmarks/bench_regex.py
+# Mäter /regex-analysen på genererade forensiska loggar (1-100 MB):
+#   findall   - som förut: re.findall(mönster, text) för varje mönster i PATTERNS
+#   skanners  - analysera_text: kompilerade SKANNERS med förfilter (hela texten i minnet)
+#   ström     - StromAnalys som i /regex/stream: filen läses i bitar om CHUNK_SIZE
+# Varje variant körs i en egen process, så att minnet från en mätning inte hamnar i nästa.
+# "MB/s" är filens storlek genom tiden, mätt utan tracemalloc. "topp MB" är det mesta som
+# var allokerat samtidigt (tracemalloc), inklusive själva texten för findall och skanners.
+# ström sparar högst MAX_UNIKA olika träffar per mönster, därför färre "unika" på stora filer.
+# "tid" och "minne" jämför varje variant med findall: 1.50x under tid betyder en och en halv
+# gång så snabb, 1.54x under minne att toppen är 54 % HÖGRE än för findall (sämre).
+# skanners vinner bara tid, inte minne: den håller texten, matchlistan och ett set per mönster
+# samtidigt. Det är ström som håller minnet nere på stora filer.
+# Kör från projektets rot:
+#   python benchmarks/bench_regex.py                 (1, 10 och 100 MB)
+#   python benchmarks/bench_regex.py 500             (egen storlek i MB)
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES_MB = [1, 10, 100]
+VARIANTS = ['findall', 'skanners', 'ström']
+
+def make_line(rnd, i):
+    """En rad i en påhittad logg, med ungefär en träff av något slag per rad."""
+    ip = '.'.join(str(rnd.randrange(256)) for _ in range(4))
+    val = rnd.randrange(12)
+    if val == 0:
+        extra = f'inloggning av user{rnd.randrange(5000)}@foretag{rnd.randrange(50)}.se'
+    elif val == 1:
+        extra = f'SMS från 07{rnd.choice("02369")}-{rnd.randrange(10**7):07d} postnr {rnd.randrange(100, 999)} {rnd.randrange(10, 99)}'
+    elif val == 2:
+        extra = f'nedladdning href="https://host{rnd.randrange(900)}.example/p/{rnd.randrange(10**6)}"'
+    elif val == 3:
+        extra = f'v6 2001:0db8:{rnd.randrange(65536):04x}:0000:0000:8a2e:0370:{rnd.randrange(65536):04x}'
+    elif val == 4:
+        extra = 'mac ' + ':'.join(f'{rnd.randrange(256):02X}' for _ in range(6))
+    elif val == 5:
+        extra = f'körde C:\\Users\\user{rnd.randrange(300)}\\AppData\\Local\\Temp\\p{rnd.randrange(999)}.exe'
+    elif val == 6:
+        extra = f'öppnade /var/log/app{rnd.randrange(40)}/auth.log'
+    elif val == 7:
+        extra = f'md5 {rnd.getrandbits(128):032x}'
+    elif val == 8:
+        extra = f'sha256 {rnd.getrandbits(256):064x}'
+    elif val == 9:
+        extra = f'försök mot CVE-20{rnd.randrange(10, 25)}-{rnd.randrange(1000, 99999)}'
+    else:
+        extra = 'status ok, inga avvikelser i sessionen'
+    return f'2026-01-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:{i % 59:02d} srv{i % 17} src={ip} {extra}\n'
+
+def make_log(path, megabytes, seed=1):
+    rnd = random.Random(seed)
+    target = megabytes * 1_000_000
+    written, i = 0, 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            lines = ''.join(make_line(rnd, i + j) for j in range(1000))
+            f.write(lines)
+            written += len(lines.encode('utf-8'))
+            i += 1000
+
+def analyze(variant, path):
+    # Importeras här: modulerna ska vara laddade innan mätningen börjar
+    from myblueprints import regex_bp
+    if variant == 'ström':
+        analys = regex_bp.StromAnalys()
+        with open(path, 'rb') as f:
+            for text in regex_bp.las_bitar(f):
+                analys.mata(text)
+        return analys.avsluta()
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if variant == 'skanners':
+        return regex_bp.analysera_text(text)
+    results = {}
+    for name, pattern in regex_bp.PATTERNS.items():
+        matches = re.findall(pattern, text)
+        if matches and isinstance(matches[0], tuple):
+            matches = [m[0] for m in matches]
+        results[name] = list(set(matches))
+    return results
+
+def measure(variant, path):
+    # Körs i barnprocessen. Returnerar (sekunder, topp i byte, antal unika träffar).
+    import myblueprints.regex_bp  # noqa: F401
+    start = time.perf_counter()
+    results = analyze(variant, path)
+    seconds = time.perf_counter() - start
+    unique = sum(map(len, results.values()))
+    del results
+    tracemalloc.start()
+    analyze(variant, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, unique
+
+def run_variant(variant, path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', variant, path],
+                         env=env, check=True, capture_output=True, text=True).stdout
+    return [float(value) for value in out.split()]
+
+def run(megabytes, workdir):
+    path = os.path.join(workdir, f'logg-{megabytes}.log')
+    make_log(path, megabytes)
+    size = os.path.getsize(path)
+    print(f'\n{size / 1e6:,.0f} MB logg')
+    print(f'  {"":<10}{"sekunder":>10}{"MB/s":>10}{"topp MB":>10}{"unika":>10}{"tid":>10}{"minne":>10}')
+    results = {}
+    for variant in VARIANTS:
+        seconds, peak, unique = results[variant] = run_variant(variant, path)
+        base_seconds, base_peak, _ = results['findall']
+        print(f'  {variant:<10}{seconds:>10.2f}{size / 1e6 / seconds:>10,.1f}{peak / 1e6:>10,.1f}{unique:>10,.0f}'
+              f'{base_seconds / seconds:>9.2f}x{peak / base_peak:>9.2f}x')
+    # Samma sak i klartext, så att ingen läser en högre minnestopp som en vinst
+    for variant in VARIANTS[1:]:
+        seconds, peak, _ = results[variant]
+        change = (peak / base_peak - 1) * 100
+        print(f'  {variant}: {base_seconds / seconds:.2f} gånger så snabb som findall, '
+              f'minnestoppen {abs(change):.0f} % {"högre" if change > 0 else "lägre"}')
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--child']:
+        sys.path.insert(0, ROOT)
+        print(*measure(args[1], args[2]))
+        sys.exit()
+    sizes = [int(arg) for arg in args] or SIZES_MB
+    with tempfile.TemporaryDirectory() as workdir:
+        for megabytes in sizes:
+            run(megabytes, workdir)
@@ -0,0 +1,73 @@
+# benchmarks/bench_search.py
+# Mäter sökindexet (FriendSearchIndex) på många vänner: hur lång tid bygget tar och hur
+# snabbt vanliga sökningar svarar, även korta och vanliga ord som "a" och "com".
+# Kör från projektets rot:
+#   python benchmarks/bench_search.py                 (200k och 1M vänner)
+#   python benchmarks/bench_search.py 50000           (egen storlek)
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from myblueprints import jsoncodec
+from myblueprints.repositories.friendrepository import FriendRepository
+from myblueprints.repositories.friendsearchindex import FriendSearchIndex
+
+SIZES = [200_000, 1_000_000]
+FIRST = ["anna", "anders", "bo", "britt", "carl", "cecilia", "david", "eva", "erik", "harvey",
+         "mike", "donna", "louis", "jessica", "rachel", "sara", "johan", "maria", "lars", "karin"]
+LAST = ["andersson", "berg", "carlsson", "specter", "ross", "paulsen", "litt", "pearson", "zane",
+        "lind", "lindberg", "johansson", "nilsson", "eriksson", "larsson", "olsson"]
+DOMAINS = ["law.com", "example.com", "mail.se", "firma.se"]
+QUERIES = ["a", "an", "com", "anna", "son", "berg", "anna ber", "harvey specter", "lind 12", "xyz"]
+REPEAT = 200
+
+def make_friends(n):
+    rnd = random.Random(1)
+    return [{"id": i, "name": f"{rnd.choice(FIRST).title()} {rnd.choice(LAST).title()}",
+             "email": f"{rnd.choice(FIRST)}.{rnd.choice(LAST)}{i}@{rnd.choice(DOMAINS)}",
+             "status": "Kompis"} for i in range(1, n + 1)]
+
+def percentile(times, p):
+    return sorted(times)[min(len(times) - 1, int(len(times) * p))]
+
+def run(n, workdir):
+    path = os.path.join(workdir, f'friends-{n}.json')
+    jsoncodec.write_file(path, make_friends(n), compact=True)
+    repo = FriendRepository(path, cache=True)
+    repo.get_version()
+
+    start = time.perf_counter()
+    index = FriendSearchIndex(repo)
+    index.wait_ready()
+    build = time.perf_counter() - start
+    print(f'\n{n:,} vänner   (bygget i bakgrunden tog {build:.2f} s)')
+    print(f'  {"q":<18}{"träffar":>8}{"medel µs":>12}{"p99 µs":>12}')
+    for query in QUERIES:
+        times = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            hits = index.search(query, 20)
+            times.append((time.perf_counter() - start) * 1e6)
+        print(f'  {query:<18}{len(hits):>8}{sum(times) / len(times):>12,.1f}{percentile(times, 0.99):>12,.1f}')
+
+    # En ändring följt av en sökning: ändringen förs in i indexet vid sökningen
+    rnd = random.Random(2)
+    times = []
+    for _ in range(REPEAT):
+        friend_id = rnd.randint(1, n)
+        friend = repo._table.update(friend_id, {"name": "Ny Person"}, repo.version)  # utan att skriva filen
+        repo._notify('update', friend_id, friend)
+        start = time.perf_counter()
+        index.search("ny person", 20)
+        times.append((time.perf_counter() - start) * 1e6)
+    print(f'  {"ändring + sökning":<18}{"":>8}{sum(times) / len(times):>12,.1f}{percentile(times, 0.99):>12,.1f}')
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            run(n, workdir)
@@ -1,7 +1,9 @@
 #i öppna cmd skriv: python -m pip install beautifulsoup4
 #python -m pip install flask
 from flask import Flask, request, jsonify
-import json
+from myblueprints import jsoncodec
+from myblueprints.repositories.repositoryfactory import get_friend_repository
+from myblueprints.repositories.friendrepository import FriendConflictError, is_friend_id
 import os
 
 from datetime import datetime
@@ -20,9 +22,25 @@ from myblueprints.regex_bp import regex_bp
 
 # Skapar själva Flask-appen
 app = Flask(__name__)
+# jsonify och request.get_json() går via jsoncodec (orjson om det finns installerat)
+app.json = jsoncodec.FastJSONProvider(app)
 
 # Inställningar för databas (här en enkel JSON-fil) och säkerhet
 JSON_FRIENDS_FILE = 'friends.json'
+# Samma repository som alla blueprints använder (json/log/sqlite enligt FRIENDS_BACKEND)
+repo = get_friend_repository()
+
+@app.teardown_appcontext
+def release_repository_connection(exception):
+    # Körs efter varje anrop (även efter ett strömmat svar). Med SQLite stängs trådens
+    # uppkoppling, annars skulle servern (en tråd per anrop) till slut få slut på filer.
+    repo.release_connection()
+
+@app.errorhandler(FriendConflictError)
+def friend_conflict(error):
+    # Repositoryt vägrar spara två vänner med samma e-post (eller id), oavsett version och lagring.
+    # 409 betyder 'Conflict': datan krockar med något som redan finns.
+    return jsonify({"error": "Conflict", "message": str(error)}), 409
 
 
 # --- STRUKTUR ---
@@ -66,13 +84,13 @@ def hello_there(name):
 
 
 # --- CRUD Operations (Create, Read, Update, Delete) ---
+# Alla versioner (v1-v7) delar samma repository, se repositoryfactory.py. Då ser alla
+# versioner varandras ändringar direkt, och cacher/sökindex får veta när något ändras.
 # http://127.0.0.1:5000/api/v1/friends
 @app.route('/api/v1/friends', methods=['GET'])
 def get_friends():
-    # 'with open' öppnar filen friends.json så vi kan läsa den ('r' står för read)
-    with open('friends.json', 'r') as f:
-        # json.load förvandlar innehållet i filen till en vanlig Python-lista
-        data = json.load(f)
+    # repo.get_all() ger alla vänner som en vanlig Python-lista (sorterad på id)
+    data = repo.get_all()
     
     # jsonify förvandlar Python-listan tillbaka till JSON-format så webbläsaren förstår den.
     # 200 är statuskoden för 'OK'.
@@ -81,37 +99,35 @@ def get_friends():
 #http://127.0.0.1:5000/api/v1/friends/1
 @app.route('/api/v1/friends/<int:friend_id>', methods=['GET'])
 def get_friend_by_id(friend_id):
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
-    # Vi går igenom listan 'data', en person i taget (vi kallar varje person för 'friend')
-    for friend in data:
-        # Om personens id är samma som det id som står i URL:en...
-        if friend['id'] == friend_id:
-            # HTTP stus kod 200 för ett lyckat anrop. Används oftast vid GET (hämta), PUT (uppdatera) och DELETE (ta bort). 
-            # Det betyder: "Här är det du bad om" tex en vän med detta id eller alla vänner eller "Jag har utfört ändringen".
-            return jsonify(friend), 200
+    # Repositoryt slår upp vännen direkt på id, vi behöver inte gå igenom hela listan
+    friend = repo.get_by_id(friend_id)
+    if friend:
+        # HTTP stus kod 200 för ett lyckat anrop. Används oftast vid GET (hämta), PUT (uppdatera) och DELETE (ta bort). 
+        # Det betyder: "Här är det du bad om" tex en vän med detta id eller alla vänner eller "Jag har utfört ändringen".
+        return jsonify(friend), 200
             
-    # Om vi har gått igenom hela listan utan att hitta id:t, skickar vi ett felmeddelande.
+    # Om vännen inte finns skickar vi ett felmeddelande.
     # 404 betyder 'Hittades inte'. Du försöker letar efter en vän med ett ID som inte existerar i JSON-filen.
     return jsonify({"error": "Hittades inte"}), 404
 
 ##http://127.0.0.1:5000/api/v1/friends   
 @app.route('/api/v1/friends', methods=['POST'])
 def add_friend():
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
     # request.json hämtar den data som användaren skickade (t.ex. från Postman)
     new_friend = request.json
+
+    # Repositoryt håller reda på vännerna via deras id, så ett id måste finnas och vara unikt
+    if not isinstance(new_friend, dict) or 'id' not in new_friend:
+        return jsonify({"error": "id saknas"}), 400
+    if not is_friend_id(new_friend['id']):
+        # Indexen bygger på id, så "7" eller true går inte att spara
+        return jsonify({"error": "id måste vara ett heltal"}), 400
+    if repo.get_by_id(new_friend['id']):
+        # 409 betyder 'Conflict': det finns redan en vän med det id:t
+        return jsonify({"error": "id finns redan"}), 409
     
-    # Vi lägger till den nya vännen i vår lista
-    data.append(new_friend)
-    
-    # Nu öppnar vi filen igen, men med 'w' (write) för att skriva över den med den nya listan
-    with open('friends.json', 'w') as f:
-        # indent=4 gör att JSON-filen ser snygg och läsbar ut för människor
-        json.dump(data, f, indent=4)
+    # Vi lägger till den nya vännen, repositoryt sparar till filen åt oss
+    repo.add(new_friend)
         
     # 201 betyder 'Created' (Skapad). Vi skickar tillbaka den nya vännen som bekräftelse.
     #Används specifikt vid POST. Det betyder: "Jag har tagit emot din data och skapat en ny resurs (t.ex. en ny vän i listan)".
@@ -119,38 +135,20 @@ def add_friend():
 #http://127.0.0.1:5000/api/v1/friends/1
 @app.route('/api/v1/friends/<int:friend_id>', methods=['PUT'])
 def update_friend(friend_id):
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
-    for friend in data:
-        if friend['id'] == friend_id:
-            # .update tar informationen från användaren och ändrar fälten i vårt objekt
-            friend.update(request.json)
-            
-            # Spara ner hela den uppdaterade listan till filen igen
-            with open('friends.json', 'w') as f:
-                json.dump(data, f, indent=4)
-            return jsonify(friend), 200
+    # .update tar informationen från användaren och ändrar fälten i vår vän.
+    # id:t i URL:en gäller, ett id i datan ignoreras (vännen får inte byta id)
+    updates = {key: value for key, value in request.json.items() if key != 'id'}
+    friend = repo.update(friend_id, updates)
+    if friend:
+        return jsonify(friend), 200
 
     return jsonify({"error": "Hittades inte"}), 404
 
 #http://127.0.0.1:5000/api/v1/friends/1
 @app.route('/api/v1/friends/<int:friend_id>', methods=['DELETE'])
 def delete_friend(friend_id):
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
-    # Vi skapar en tom lista där vi ska lägga alla vänner vi vill ha kvar
-    new_data = []
-    for friend in data:
-        # Om personens id INTE är det id vi vill ta bort...
-        if friend['id'] != friend_id:
-            # ...så lägger vi till dem i den nya listan.
-            new_data.append(friend)
-            
-    # Spara den nya listan (där den borttagna personen nu saknas)
-    with open('friends.json', 'w') as f:
-        json.dump(new_data, f, indent=4)
+    # Repositoryt tar bort vännen och sparar filen (finns vännen inte händer ingenting)
+    repo.delete(friend_id)
         
     return jsonify({"message": "Borttagen"}), 200
 
@@ -0,0 +1,56 @@
+# myblueprints/conditional.py
+# Villkorliga GET-anrop (conditional GET) med ETag och Last-Modified.
+# Servern skickar med en "versionsstämpel" (ETag) och en tidpunkt (Last-Modified).
+# Nästa gång skickar klienten tillbaka dem i If-None-Match / If-Modified-Since och om
+# ingenting har ändrats svarar vi 304 Not Modified UTAN body - då behöver vi varken
+# läsa in eller serialisera någon data.
+import zlib
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+def variant_etag(version):
+    """
+    ETag för ett svar som beror på hela datamängden. Samma data men olika URL/query
+    (t.ex. ?limit=2) eller format (NDJSON) ger olika svar och måste därför få olika ETag.
+    """
+    variant = zlib.crc32((request.full_path + '|' + request.headers.get('Accept', '')).encode())
+    return f'{version}-{variant:08x}'
+
+def cache_headers(etag, last_modified=None):
+    # no-cache: webbläsaren får spara svaret men måste fråga oss (villkorligt) innan den använder det
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+def is_not_modified(etag, last_modified=None):
+    # If-None-Match går före If-Modified-Since när klienten skickar båda
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    # If-Modified-Since har bara hela sekunder. Ändrades datan i samma sekund som klientens
+    # kopia kan den ha ändrats EFTER att klienten fick sin kopia (två skrivningar inom en
+    # sekund), så då skickar vi hellre hela svaret. 304 bara om den senaste ändringen
+    # gjordes i en tidigare sekund. Med ETag (If-None-Match ovan) finns inget sådant problem.
+    if request.if_modified_since and last_modified is not None:
+        return int(last_modified) < request.if_modified_since.timestamp()
+    return False
+
+def not_modified_response(headers):
+    return Response(status=304, headers=headers)
+
+def conditional_get(version, last_modified=None, per_variant=True):
+    """
+    Tar fram ETag-headers för ett GET-svar och kollar klientens villkor.
+    Returnerar (304-svar eller None, headers att skicka med ett vanligt svar).
+    per_variant=False för en enskild vän vars version redan är unik för URL:en.
+    """
+    etag = variant_etag(version) if per_variant else version
+    headers = cache_headers(etag, last_modified)
+    if per_variant:
+        # Svaret (och ETag:en) beror på Accept: en delad cache får inte lämna ut
+        # NDJSON-svaret till den som bad om en JSON-lista, eller tvärtom
+        headers['Vary'] = 'Accept'
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(headers), headers
+    return None, headers
@@ -1,26 +1,38 @@
 #i öppna cmd skriv: python -m pip install beautifulsoup4
 #python -m pip install requests
 from flask import Blueprint, jsonify
-from bs4 import BeautifulSoup
+import os
+import time
 import requests
 from datetime import datetime #för dagensdatum och tid
 
+from . import httpclient
+from .htmlparse import parse_only
+from .swrcache import SWRCache
+
 dunews_bp = Blueprint('dunews_bp', __name__)
 
-BASE_URL = "https://www.du.se"
+# Adressen kan bytas via miljövariabeln DUNEWS_URL, t.ex. mot en lokal testserver
+BASE_URL = os.environ.get('DUNEWS_URL', "https://www.du.se")
 HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# Hur många sekunder nyheterna räknas som färska (DUNEWS_TTL, standard 5 minuter)
+CACHE_TTL = float(os.environ.get('DUNEWS_TTL', 300))
 # http://127.0.0.1:5000/dunews/?api_key=abcd
 @dunews_bp.route('/')
 def get_live_news():
     try:
-        #anroper egen hjälp funktion
-        news = scrape_du_news()
+        # Nyheterna kommer från cachen (se swrcache.py). du.se besöks bara när de blivit
+        # gamla, och då i bakgrunden medan vi svarar med de vi redan har.
+        news, cached_at = news_cache.get()
         
         return jsonify({
             "source": "Högskolan Dalarna",
             "count": len(news),
             "articles": news,
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M") # Formatera enligt format: ÅÅÅÅ-MM-DD TT:MM
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M"), # Formatera enligt format: ÅÅÅÅ-MM-DD TT:MM
+            # När nyheterna hämtades från du.se och hur många sekunder sedan det var
+            "cached_at": datetime.fromtimestamp(cached_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "age": int(time.time() - cached_at)
         }),200
     ## Om hemsidan tar för lång tid på sig att svara
     except requests.exceptions.Timeout:
@@ -31,15 +43,20 @@ def get_live_news():
 
 #--------Helper functions-------
 def scrape_du_news():
-    # requests.get skickar en förfrågan till hemsidan och sparar hela svaret i 'response'
-    response = requests.get(BASE_URL, headers=HEADERS)
+    # httpclient.get skickar en förfrågan till hemsidan och sparar hela svaret i 'response'.
+    # Den återanvänder anslutningen och har timeout och nya försök inbyggt (se httpclient.py)
+    response = httpclient.get(BASE_URL, headers=HEADERS)
     # raise_for_status() kollar om vi fick ett felmeddelande från hemsidan (t.ex. 404)
     # Om något gick fel hoppar koden direkt ner till 'except'-blocket.
     response.raise_for_status() # Kolla om anropet gick bra
+    return parse_du_news(response.text)
+
+def parse_du_news(html):
     # 2. Skapa soppan (parse HTML)
     # Vi matar in texten från hemsidan och talar om att det är HTML.
-    # Nu kan Python "förstå" strukturen på sidan.
-    soup = BeautifulSoup(response.text, 'html.parser')
+    # Nu kan Python "förstå" strukturen på sidan. parse_only bygger bara nyhetskorten
+    # (<article class="news-card">), resten av sidan hoppas över (se htmlparse.py).
+    soup = parse_only(html, 'article', 'news-card')
     # Skapa en tom lista där vi ska spara våra hittade nyheter som små paket (dictionaries)
     news_items = []
 
@@ -64,7 +81,7 @@ def scrape_du_news():
                 # Här kollar vi om länken börjar med '/' och lägger till domänen i så fall.(https://www.du.se)
                 #så att de blir(https://www.du.se/sv/om-oss/nytt-och-aktuellt/......)
                 if href.startswith('/'):
-                    href = f"https://www.du.se{href}"
+                    href = f"{BASE_URL}{href}"
                 # Spara nyheten i vår lista som ett dictionary objekt
                 news_items.append({
                     "title": text,
@@ -72,4 +89,5 @@ def scrape_du_news():
                 })
     return news_items
 
-
+# En cache för hela processen, delad av alla anrop
+news_cache = SWRCache(scrape_du_news, CACHE_TTL)
@@ -1,87 +1,278 @@
-from flask import Blueprint, jsonify, render_template
+from flask import Blueprint, jsonify, render_template, request
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+
 import requests
-from bs4 import BeautifulSoup
+
+from . import httpclient
+from .conditional import conditional_get
+from .htmlparse import parse_only
+from .schemaexport import csv_chunks, ics_chunks
+from .schemaindex import FALT, SchemaIndex
+from .streaming import stream_text
+from .swrcache import SWRCache
 
 duschema_bp = Blueprint('duschema_bp', __name__, template_folder='templates')
+logger = logging.getLogger(__name__)
+
+# URL till schemat (TimeEdit grafisk vy). Kan bytas via miljövariabeln DUSCHEMA_URL
+BASE_URL = os.environ.get('DUSCHEMA_URL', "https://cloud.timeedit.net/hda/web/public/ri1t6fZ7YQb1bnQY53Q9YQtnZ507fX966n5756ny.html")
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# Hur många sekunder schemat räknas som färskt (DUSCHEMA_TTL, standard 10 minuter)
+CACHE_TTL = float(os.environ.get('DUSCHEMA_TTL', 600))
+
+# Det senast hämtade schemat och TimeEdits "versionsmärken" för det (ETag och
+# Last-Modified). Skickar vi med dem nästa gång svarar TimeEdit 304 Not Modified
+# (utan innehåll) om inget har ändrats, och vi kan behålla det vi redan har tolkat.
+# Schemat sparas som ett SchemaIndex (se schemaindex.py) som byggs en gång per version.
+_senaste = {"schema": None, "etag": None, "last_modified": None}
 
-# URL till schemat (TimeEdit grafisk vy)
-BASE_URL = "https://cloud.timeedit.net/hda/web/public/ri1t6fZ7YQb1bnQY53Q9YQtnZ507fX966n5756ny.html"
+def hamta_schema():
+    # Körs av cachen, aldrig två samtidigt (se swrcache.py)
+    headers = dict(HEADERS)
+    if _senaste["schema"] is not None:
+        if _senaste["etag"]:
+            headers['If-None-Match'] = _senaste["etag"]
+        if _senaste["last_modified"]:
+            headers['If-Modified-Since'] = _senaste["last_modified"]
+
+    # 1. Hämta HTML-koden från TimeEdit (delad session med timeout, se httpclient.py)
+    response = httpclient.get(BASE_URL, headers=headers)
+    if response.status_code == 304 and _senaste["schema"] is not None:
+        return _senaste["schema"]
+    response.raise_for_status()
+    # Versionen är en kontrollsumma av sidan: samma sida ger samma ETag även efter omstart
+    schema = SchemaIndex(tolka_schema(response.content),
+                         version=f'{zlib.crc32(response.content):08x}', last_modified=time.time())
+    _senaste.update(schema=schema, etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'))
+    return schema
 
 def skrapa_schema_data():
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    
+    """Returnerar (SchemaIndex, hämtat_tidpunkt, None) från cachen, eller (None, None, fel)
+    om vi aldrig fått något. fel är undantaget som hämtningen gav."""
     try:
-        # 1. Hämta HTML-koden från TimeEdit
-        response = requests.get(BASE_URL, headers=headers, timeout=10)
-        response.raise_for_status() 
-        
-        # 2. Skapa soppan (översättaren)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Färskt eller gammalt schema direkt ur cachen. Går TimeEdit inte att nå
+        # lämnar cachen ut den senaste fungerande kopian istället för ett fel.
+        data, cached_at = schema_cache.get()
+        return data, cached_at, None
+    except Exception as e:
+        # Hela felet hamnar i serverns logg. Den som frågade får bara veta att det inte gick
+        # (felmeddelandet kan innehålla adresser och annat som inte ska ut), se schema_saknas
+        logger.warning("Kunde inte hämta schemat från TimeEdit", exc_info=e)
+        return None, None, e
 
-        # 3. Hitta alla DIV-taggar med klassen 'bookingDiv'
-        # Varje sådan DIV representerar en lektion i schemat
-        bokningar_divs = soup.find_all('div', class_='bookingDiv')
-        
-        schema_positioner = []
+def schema_saknas(fel):
+    """Svaret när schemat inte gick att hämta: ett fast meddelande, aldrig själva felet."""
+    if isinstance(fel, requests.exceptions.Timeout):
+        return jsonify({"error": "Timeout: TimeEdit svarade för långsamt"}), 504 # Gateway Timeout
+    return jsonify({"error": "Kunde inte hämta schemat från TimeEdit"}), 500
+
+def tolka_schema(html):
+    # 2. Skapa soppan (översättaren). Bara <div class="bookingDiv"> byggs, se htmlparse.py
+    soup = parse_only(html, 'div', 'bookingDiv')
+
+    # 3. Hitta alla DIV-taggar med klassen 'bookingDiv'
+    # Varje sådan DIV representerar en lektion i schemat
+    bokningar_divs = soup.find_all('div', class_='bookingDiv')
+    
+    schema_positioner = []
+    
+    for bokning in bokningar_divs:
+        # Extrahera strängen från 'title'-attributet (där all info finns)
+        info_strang = bokning.get('title', '')
         
-        for bokning in bokningar_divs:
-            # Extrahera strängen från 'title'-attributet (där all info finns)
-            info_strang = bokning.get('title', '')
+        if info_strang:
+            #
+            #title=" 2026-01-27 08:00 - 12:00 H3LLJ_DITMG, GMI35S_V3NJJ, Lektion, Ulrika Artursson Wissa, Borlänge, B302 Lärosal/etage ID 669214" 
+            # Här gör vi "Clean Code": 
+            # .split(',') delar upp texten vid varje kommatecken till en lista (array)
+            # [p.strip() for p in ...] går igenom varje del och tar bort onödiga mellanslag direkt
+            parts = [p.strip() for p in info_strang.split(',')]
+            
+            # Tiden ligger alltid i första delen: "2026-01-22 10:00 - 12:00"
+            # Vi delar den vid mellanslag för att få ut datum och klockslag separat
+            time_parts = parts[0].split(' ')# till array
             
-            if info_strang:
-                #
-                #title=" 2026-01-27 08:00 - 12:00 H3LLJ_DITMG, GMI35S_V3NJJ, Lektion, Ulrika Artursson Wissa, Borlänge, B302 Lärosal/etage ID 669214" 
-                # Här gör vi "Clean Code": 
-                # .split(',') delar upp texten vid varje kommatecken till en lista (array)
-                # [p.strip() for p in ...] går igenom varje del och tar bort onödiga mellanslag direkt
-                parts = [p.strip() for p in info_strang.split(',')]
-                
-                # Tiden ligger alltid i första delen: "2026-01-22 10:00 - 12:00"
-                # Vi delar den vid mellanslag för att få ut datum och klockslag separat
-                time_parts = parts[0].split(' ')# till array
-                
-                # --- LOGIK FÖR LÄRARE ---
-                # Ibland finns "Grupp X" på lärarens plats (index 3). 
-                # Om ordet 'grupp' finns, hoppar vi till index -3 (tredje sista elementet)
-                larare = parts[3] if "grupp" not in parts[3].lower() else parts[-3]
-
-                # --- BYGG DICTIONARY ---
-                # Vi skapar ett paket för varje lektion
-                schema_post = {
-                    "datum": time_parts[0] if len(time_parts) > 0 else "Saknas",
-                    "tid": f"{time_parts[1]} - {time_parts[3]}" if len(time_parts) >= 4 else "Saknas",
-                    "kurs": parts[1] if len(parts) > 1 else "Saknas",
-                    "larare": larare,
-                    # Lokalen står sist. Vi tar sista delen (index -1) och plockar första ordet
-                    "lokal": parts[-1].split(' ')[0] if len(parts) > 0 else "Saknas",
-                    # Typen (Föreläsning/Handledning) ligger oftast 4 steg från slutet
-                    "typ": parts[-4] if len(parts) >= 4 else "Saknas"
-                }
-                
-                schema_positioner.append(schema_post)
-
-        return schema_positioner
+            # --- LOGIK FÖR LÄRARE ---
+            # Ibland finns "Grupp X" på lärarens plats (index 3). 
+            # Om ordet 'grupp' finns, hoppar vi till index -3 (tredje sista elementet)
+            larare = parts[3] if "grupp" not in parts[3].lower() else parts[-3]
 
-    except Exception as e:
-        # Om något går fel returnerar vi None så att vi kan hantera felet i routerna
-        print(f"Ett fel uppstod: {e}")
-        return None
+            # --- BYGG DICTIONARY ---
+            # Vi skapar ett paket för varje lektion
+            schema_post = {
+                "datum": time_parts[0] if len(time_parts) > 0 else "Saknas",
+                "tid": f"{time_parts[1]} - {time_parts[3]}" if len(time_parts) >= 4 else "Saknas",
+                "kurs": parts[1] if len(parts) > 1 else "Saknas",
+                "larare": larare,
+                # Lokalen står sist. Vi tar sista delen (index -1) och plockar första ordet
+                "lokal": parts[-1].split(' ')[0] if len(parts) > 0 else "Saknas",
+                # Typen (Föreläsning/Handledning) ligger oftast 4 steg från slutet
+                "typ": parts[-4] if len(parts) >= 4 else "Saknas"
+            }
+            
+            schema_positioner.append(schema_post)
+
+    return schema_positioner
 
 @duschema_bp.route('/')
 def get_schema():
-    data = skrapa_schema_data()
+    data, cached_at, fel = skrapa_schema_data()
     
     # Om skrapningen misslyckades (returnerade None)
     if data is None:
-        return jsonify({"error": "Kunde inte hämta schemat från TimeEdit"}), 500
+        return schema_saknas(fel)
     
     return jsonify({
         "status": "success",
-        "schema": data
+        "schema": data.poster,
+        # När schemat hämtades från TimeEdit och hur många sekunder sedan det var
+        "cached_at": datetime.fromtimestamp(cached_at).strftime("%Y-%m-%d %H:%M:%S"),
+        "age": int(time.time() - cached_at)
     }), 200
 
 @duschema_bp.route('/view')
 def show_schema():
-    data = skrapa_schema_data()
+    data, _, _ = skrapa_schema_data()
     # Om data är None skickar vi en tom lista [] så att HTML-sidan inte kraschar
-    return render_template('schema.html', schema=data or [])
\ No newline at end of file
+    return render_template('schema.html', schema=data.poster if data else [])
+
+DATUM_FEL = "fran/till ska vara ÅÅÅÅ-MM-DD eller ÅÅÅÅ-MM-DD TT:MM (utan tidszon)"
+
+def tolka_datum(text, slut=False):
+    # "2026-01-27" betyder hela dagen: som slutgräns blir det midnatt dagen efter.
+    # Med klockslag ("2026-01-27T10:00" eller "2026-01-27 10:00") gäller exakt den tiden.
+    if not text:
+        return None
+    tidpunkt = datetime.fromisoformat(text.strip())
+    # Schemat är i svensk lokal tid utan tidszon. En tid med tidszon ("...+01:00", "...Z")
+    # kan inte jämföras med det (TypeError), så den räknas som ett felaktigt datum.
+    if tidpunkt.tzinfo is not None:
+        raise ValueError("tidszon stöds inte")
+    if slut and len(text.strip()) == 10:
+        tidpunkt += timedelta(days=1)
+    return tidpunkt
+
+def las_filter():
+    """(fran, till, filter) från query-strängen. Kastar ValueError för ett felaktigt datum."""
+    fran = tolka_datum(request.args.get('fran'))
+    till = tolka_datum(request.args.get('till'), slut=True)
+    # Samma fält kan ges flera gånger (?lokal=B302&lokal=B303) eller kommaseparerat
+    filter = {falt: [v for varde in request.args.getlist(falt) for v in varde.split(',') if v.strip()]
+              for falt in FALT}
+    return fran, till, filter
+
+# http://127.0.0.1:5000/duschema/query?fran=2026-01-26&till=2026-01-30&kurs=GMI35S
+@duschema_bp.route('/query')
+def query_schema():
+    # Kontrollera frågan först, innan vi eventuellt väntar på TimeEdit
+    try:
+        fran, till, filter = las_filter()
+    except ValueError:
+        return jsonify({"error": DATUM_FEL}), 400
+
+    data, cached_at, fel = skrapa_schema_data()
+    if data is None:
+        return schema_saknas(fel)
+
+    traffar = data.query(fran, till, **filter)
+    return jsonify({
+        "status": "success",
+        "count": len(traffar),
+        "total": len(data),
+        "schema": [post for post, _, _ in traffar],
+        "cached_at": datetime.fromtimestamp(cached_at).strftime("%Y-%m-%d %H:%M:%S"),
+        "age": int(time.time() - cached_at)
+    }), 200
+
+# Tidpunkter i svaren skrivs som "ÅÅÅÅ-MM-DD TT:MM", samma format som i schemat
+TID_FORMAT = "%Y-%m-%d %H:%M"
+
+# http://127.0.0.1:5000/duschema/conflicts?fran=2026-01-26&till=2026-01-30&lokal=B302
+@duschema_bp.route('/conflicts')
+def schema_conflicts():
+    """Dubbelbokade lokaler: par av bokningar i samma lokal som överlappar i tid."""
+    try:
+        fran = tolka_datum(request.args.get('fran'))
+        till = tolka_datum(request.args.get('till'), slut=True)
+    except ValueError:
+        return jsonify({"error": DATUM_FEL}), 400
+
+    data, cached_at, fel = skrapa_schema_data()
+    if data is None:
+        return schema_saknas(fel)
+
+    krockar = [{
+        "lokal": lokal,
+        "fran": start.strftime(TID_FORMAT),
+        "till": slut.strftime(TID_FORMAT),
+        "bokningar": [post_a, post_b]
+    } for start, slut, lokal, post_a, post_b in data.konflikter(fran, till, request.args.get('lokal'))]
+    return jsonify({
+        "status": "success",
+        "count": len(krockar),
+        "conflicts": krockar,
+        "cached_at": datetime.fromtimestamp(cached_at).strftime("%Y-%m-%d %H:%M:%S")
+    }), 200
+
+# http://127.0.0.1:5000/duschema/free?fran=2026-01-27T10:00&till=2026-01-27T12:00
+@duschema_bp.route('/free')
+def free_rooms():
+    """Vilka lokaler (av dem som finns i schemat) är lediga mellan fran och till?"""
+    try:
+        fran = tolka_datum(request.args.get('fran'))
+        till = tolka_datum(request.args.get('till'), slut=True)
+    except ValueError:
+        return jsonify({"error": DATUM_FEL}), 400
+    if fran is None or till is None or till <= fran:
+        return jsonify({"error": "Ange både fran och till, med till efter fran"}), 400
+
+    data, cached_at, fel = skrapa_schema_data()
+    if data is None:
+        return schema_saknas(fel)
+
+    lediga, upptagna = data.lediga_lokaler(fran, till)
+    return jsonify({
+        "status": "success",
+        "fran": fran.strftime(TID_FORMAT),
+        "till": till.strftime(TID_FORMAT),
+        "free": lediga,
+        "busy": upptagna,
+        "cached_at": datetime.fromtimestamp(cached_at).strftime("%Y-%m-%d %H:%M:%S")
+    }), 200
+
+def exportera(chunks, mimetype, filnamn):
+    # Samma filter som /duschema/query
+    try:
+        fran, till, filter = las_filter()
+    except ValueError:
+        return jsonify({"error": DATUM_FEL}), 400
+
+    data, _, fel = skrapa_schema_data()
+    if data is None:
+        return schema_saknas(fel)
+
+    # Har schemat inte ändrats sedan klienten hämtade filen räcker ett 304
+    not_modified, headers = conditional_get(data.version, data.last_modified)
+    if not_modified:
+        return not_modified
+    headers['Content-Disposition'] = f'attachment; filename="{filnamn}"'
+    return stream_text(chunks(data.query(fran, till, **filter), data), mimetype, headers)
+
+# http://127.0.0.1:5000/duschema/export.ics?kurs=GMI35S
+@duschema_bp.route('/export.ics')
+def export_ics():
+    return exportera(lambda traffar, data: ics_chunks(traffar, data.last_modified),
+                     'text/calendar', 'schema.ics')
+
+# http://127.0.0.1:5000/duschema/export.csv?fran=2026-01-26&till=2026-01-30
+@duschema_bp.route('/export.csv')
+def export_csv():
+    return exportera(lambda traffar, data: csv_chunks(traffar), 'text/csv', 'schema.csv')
+
+# En cache för hela processen, delad av /duschema och /duschema/view
+schema_cache = SWRCache(hamta_schema, CACHE_TTL)
@@ -1,26 +1,17 @@
 # myblueprints/friends_apikey_bp.py
 from flask import Blueprint, request, jsonify, render_template
-import json
-import os
+from .conditional import conditional_get
+from .repositories.repositoryfactory import get_friend_repository
+from .repositories.friendrepository import is_friend_id
 
 # Vi skapar en ny Blueprint för säkerhets-etappen
 friends_apikey_bp = Blueprint('friends_apikey_bp', __name__)
-JSON_DATA_FILE = 'friends.json'
+# Samma repository som alla andra versioner, så ändringar syns överallt direkt
+repo = get_friend_repository()
 VALID_API_KEY = "abc"  # Vår enkla, fasta nyckel
 
 
 
-# --- Hjälpfunktioner ---
-def load_data():
-    if not os.path.exists(JSON_DATA_FILE):
-        return []
-    with open(JSON_DATA_FILE, 'r') as f:
-        return json.load(f)
-
-def save_data(data):
-    with open(JSON_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
-
 # --- Säkerhetskontroll ---
 #Genom att lägga det i @before_request skyddar vi hela Blueprinten på en gång. Om den inte går igenom, körs aldrig koden 
 # i övriga end-points/route överhuvudtaget.
@@ -49,26 +40,36 @@ def check_api_key():
 #http://127.0.0.1:5000/api/v5/friends/?api_key=abc
 @friends_apikey_bp.route('/', methods=['GET'])
 def get_friends():
-    return jsonify(load_data()), 200
+    # Har klienten redan senaste versionen svarar vi 304 utan att hämta vännerna
+    not_modified, headers = conditional_get(*repo.get_version())
+    if not_modified:
+        return not_modified
+    return jsonify(repo.get_all()), 200, headers
 
 #http://127.0.0.1:5000/api/v5/friends/1?api_key=abc
 @friends_apikey_bp.route('/<int:friend_id>', methods=['GET'])
 def get_friend_by_id(friend_id):
-    data = load_data()
-    friend = next((f for f in data if f['id'] == friend_id), None)
-    if friend:
-        return jsonify(friend), 200
+    # Varje vän har en egen version, så en ändring av någon annan vän ger inte ny ETag
+    version = repo.get_record_version(friend_id)
+    if version is not None:
+        not_modified, headers = conditional_get(version, repo.get_version()[1], per_variant=False)
+        if not_modified:
+            return not_modified
+        friend = repo.get_by_id(friend_id)
+        if friend:
+            return jsonify(friend), 200, headers
     return jsonify({"error": "Not Found", "message": "Vännen hittades inte"}), 404
 
 @friends_apikey_bp.route('/', methods=['POST'])
 def add_friend():
-    data = load_data()
     incoming = request.json
     
     # Validering av obligatoriska fält
     required = ['id', 'name', 'email', 'status']
     if not incoming or not all(k in incoming for k in required):
         return jsonify({"error": "Bad Request", "message": "Saknar data"}), 400
+    if not is_friend_id(incoming['id']):
+        return jsonify({"error": "Bad Request", "message": "ID måste vara ett heltal"}), 400
 
     # Tvättning
     new_friend = {
@@ -78,35 +79,33 @@ def add_friend():
         "status": incoming['status'].strip().capitalize()
     }
 
-    data.append(new_friend)
-    save_data(data)
+    if repo.get_by_id(new_friend['id']):
+        return jsonify({"error": "Bad Request", "message": "ID finns redan"}), 400
+
+    repo.add(new_friend)
     return jsonify(new_friend), 201
 
 @friends_apikey_bp.route('/<int:friend_id>', methods=['PUT'])
 def update_friend(friend_id):
-    data = load_data()
     incoming = request.json
-    friend = next((f for f in data if f['id'] == friend_id), None)
     
-    if not friend:
-        return jsonify({"error": "Not Found"}), 404
-
+    # Tvätta de fält som skickats och låt repositoryt spara dem
+    updates = {}
     if incoming:
-        if 'name' in incoming: friend['name'] = incoming['name'].strip().title()
-        if 'email' in incoming: friend['email'] = incoming['email'].strip().lower()
-        if 'status' in incoming: friend['status'] = incoming['status'].strip().capitalize()
+        if 'name' in incoming: updates['name'] = incoming['name'].strip().title()
+        if 'email' in incoming: updates['email'] = incoming['email'].strip().lower()
+        if 'status' in incoming: updates['status'] = incoming['status'].strip().capitalize()
 
-    save_data(data)
+    friend = repo.update(friend_id, updates)
+    if not friend:
+        return jsonify({"error": "Not Found"}), 404
     return jsonify(friend), 200
 
 @friends_apikey_bp.route('/<int:friend_id>', methods=['DELETE'])
 def delete_friend(friend_id):
-    data = load_data()
-    if not any(f['id'] == friend_id for f in data):
+    if not repo.delete(friend_id):
         return jsonify({"error": "Not Found"}), 404
 
-    updated_data = [f for f in data if f['id'] != friend_id]
-    save_data(updated_data)
     return jsonify({"message": "Raderad"}), 200
 
 @friends_apikey_bp.route('/ui') #http://127.0.0.1:5000/api/v5/friends/ui?api_key=abc
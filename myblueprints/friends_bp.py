@@ -1,6 +1,6 @@
 # myblueprints/friends_bp.py
 from flask import Blueprint, request, jsonify
-import json
+from . import jsoncodec
 import os
 
 friends_bp = Blueprint('friends_bp', __name__)
@@ -11,12 +11,12 @@ JSON_DATA_FILE = 'friends.json'
 def load_data():
     if not os.path.exists(JSON_DATA_FILE):
         return []
-    with open(JSON_DATA_FILE, 'r') as json_friends:
-        return json.load(json_friends)
+    with open(JSON_DATA_FILE, 'rb') as json_friends:
+        return jsoncodec.load(json_friends)
 
 def save_data(data):
-    with open(JSON_DATA_FILE, 'w') as json_friends:
-        json.dump(data, json_friends, indent=4)
+    with open(JSON_DATA_FILE, 'wb') as json_friends:
+        jsoncodec.dump(data, json_friends)
 
 # Security Check
 @friends_bp.before_request
@@ -1,21 +1,24 @@
 # myblueprints/friends__messy_bp.py
 from flask import Blueprint, request, jsonify
-import json
+from .repositories.repositoryfactory import get_friend_repository
+from .repositories.friendrepository import is_friend_id
 
 # Vi skapar en 'Blueprint'. Tänk på det som en egen liten under-avdelning 
 # i vår applikation som bara hanterar allt som har med 'vänner' att göra.
 friends_messy_bp = Blueprint('friends_messy_bp', __name__)
 
+# Alla versioner delar samma repository (se repositories/repositoryfactory.py), så en
+# ändring här syns direkt i v1-v7 och tvärtom.
+repo = get_friend_repository()
+
 # --- CRUD Operations (Skapa, Läsa, Uppdatera, Ta bort) ---
 
 # Denna route körs när någon går till adressen med en GET-förfrågan (för att hämta data)
 #http://127.0.0.1:5000/api/v2/friends/
 @friends_messy_bp.route('/', methods=['GET'])
 def get_friends():
-    # 'with open' öppnar filen friends.json så vi kan läsa den ('r' står för read)
-    with open('friends.json', 'r') as f:
-        # json.load förvandlar innehållet i filen till en vanlig Python-lista
-        data = json.load(f)
+    # repo.get_all() ger alla vänner som en vanlig Python-lista (sorterad på id)
+    data = repo.get_all()
     
     # jsonify förvandlar Python-listan tillbaka till JSON-format så webbläsaren förstår den.
     # 200 är statuskoden för 'OK'.
@@ -25,17 +28,13 @@ def get_friends():
 # Denna route tar emot ett ID i adressen, t.ex. /friends/1
 @friends_messy_bp.route('/<int:friend_id>', methods=['GET'])
 def get_friend_by_id(friend_id):
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
-    # Vi går igenom listan 'data', en person i taget (vi kallar varje person för 'friend')
-    for friend in data:
-        # Om personens id är samma som det id som står i URL:en...
-        if friend['id'] == friend_id:
-            # HTTP stus kod 200 för ett lyckat anrop. Används oftast vid GET (hämta), PUT (uppdatera) och DELETE (ta bort). Det betyder: "Här är det du bad om" eller "Jag har utfört ändringen".
-            return jsonify(friend), 200
+    # Repositoryt slår upp vännen direkt på id, vi behöver inte gå igenom hela listan
+    friend = repo.get_by_id(friend_id)
+    if friend:
+        # HTTP stus kod 200 för ett lyckat anrop. Används oftast vid GET (hämta), PUT (uppdatera) och DELETE (ta bort). Det betyder: "Här är det du bad om" eller "Jag har utfört ändringen".
+        return jsonify(friend), 200
             
-    # Om vi har gått igenom hela listan utan att hitta id:t, skickar vi ett felmeddelande.
+    # Om vännen inte finns skickar vi ett felmeddelande.
     # 404 betyder 'Hittades inte'. Du försöker letar efter en vän med ett ID som inte existerar i JSON-filen.
     return jsonify({"error": "Hittades inte"}), 404
 
@@ -43,19 +42,21 @@ def get_friend_by_id(friend_id):
 # Denna route används för att skapa en ny vän med POST
 @friends_messy_bp.route('/', methods=['POST'])
 def add_friend():
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
     # request.json hämtar den data som användaren skickade (t.ex. från Postman)
     new_friend = request.json
+
+    # Repositoryt håller reda på vännerna via deras id, så ett id måste finnas och vara unikt
+    if not isinstance(new_friend, dict) or 'id' not in new_friend:
+        return jsonify({"error": "id saknas"}), 400
+    if not is_friend_id(new_friend['id']):
+        # Indexen bygger på id, så "7" eller true går inte att spara
+        return jsonify({"error": "id måste vara ett heltal"}), 400
+    if repo.get_by_id(new_friend['id']):
+        # 409 betyder 'Conflict': det finns redan en vän med det id:t
+        return jsonify({"error": "id finns redan"}), 409
     
-    # Vi lägger till den nya vännen i vår lista
-    data.append(new_friend)
-    
-    # Nu öppnar vi filen igen, men med 'w' (write) för att skriva över den med den nya listan
-    with open('friends.json', 'w') as f:
-        # indent=4 gör att JSON-filen ser snygg och läsbar ut för människor
-        json.dump(data, f, indent=4)
+    # Vi lägger till den nya vännen, repositoryt sparar till filen åt oss
+    repo.add(new_friend)
         
     # 201 betyder 'Created' (Skapad). Vi skickar tillbaka den nya vännen som bekräftelse.
     #Används specifikt vid POST. Det betyder: "Jag har tagit emot din data och skapat en ny resurs (t.ex. en ny vän i listan)".
@@ -65,18 +66,12 @@ def add_friend():
 # Denna route ändrar en befintlig vän
 @friends_messy_bp.route('/<int:friend_id>', methods=['PUT'])
 def update_friend(friend_id):
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
-    for friend in data:
-        if friend['id'] == friend_id:
-            # .update tar informationen från användaren och ändrar fälten i vårt objekt
-            friend.update(request.json)
-            
-            # Spara ner hela den uppdaterade listan till filen igen
-            with open('friends.json', 'w') as f:
-                json.dump(data, f, indent=4)
-            return jsonify(friend), 200
+    # .update tar informationen från användaren och ändrar fälten i vår vän.
+    # id:t i URL:en gäller, ett id i datan ignoreras (vännen får inte byta id)
+    updates = {key: value for key, value in request.json.items() if key != 'id'}
+    friend = repo.update(friend_id, updates)
+    if friend:
+        return jsonify(friend), 200
 
     return jsonify({"error": "Hittades inte"}), 404
 
@@ -84,19 +79,7 @@ def update_friend(friend_id):
 # Denna route tar bort en vän
 @friends_messy_bp.route('/<int:friend_id>', methods=['DELETE'])
 def delete_friend(friend_id):
-    with open('friends.json', 'r') as f:
-        data = json.load(f)
-    
-    # Vi skapar en tom lista där vi ska lägga alla vänner vi vill ha kvar
-    new_data = []
-    for friend in data:
-        # Om personens id INTE är det id vi vill ta bort...
-        if friend['id'] != friend_id:
-            # ...så lägger vi till dem i den nya listan.
-            new_data.append(friend)
-            
-    # Spara den nya listan (där den borttagna personen nu saknas)
-    with open('friends.json', 'w') as f:
-        json.dump(new_data, f, indent=4)
+    # Repositoryt tar bort vännen och sparar filen (finns vännen inte händer ingenting)
+    repo.delete(friend_id)
         
-    return jsonify({"message": "Borttagen"}), 200
\ No newline at end of file
+    return jsonify({"message": "Borttagen"}), 200
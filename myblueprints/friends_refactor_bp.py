@@ -1,18 +1,10 @@
 # myblueprints/friends_refactor_bp.py
 from flask import Blueprint, request, jsonify
-import json
-import os
+from .repositories.repositoryfactory import get_friend_repository
+from .repositories.friendrepository import is_friend_id
 friends_refactor_bp = Blueprint('friends_refactor_bp', __name__)
-JSON_DATA_FILE = 'friends.json'
-def load_data():
-    if not os.path.exists(JSON_DATA_FILE):
-        return []
-    with open(JSON_DATA_FILE, 'r') as json_friends:
-        return json.load(json_friends)
-
-def save_data(data):
-    with open(JSON_DATA_FILE, 'w') as json_friends:
-        json.dump(data, json_friends, indent=4)
+# Samma repository som alla andra versioner, så ändringar syns överallt direkt
+repo = get_friend_repository()
 
 
 # --- CRUD Operations ---
@@ -20,7 +12,7 @@ def save_data(data):
 @friends_refactor_bp.route('/', methods=['GET'])
 def get_friends():
     # 200 OK: Standard response for successful GET
-    return jsonify(load_data()), 200
+    return jsonify(repo.get_all()), 200
 
 #http://127.0.0.1:5000/api/v3/friends/1
 @friends_refactor_bp.route('/<int:friend_id>', methods=['GET'])
@@ -29,11 +21,8 @@ def get_friend_by_id(friend_id):
     Hämtar en enskild vän baserat på ID.
     <int:friend_id> i URL:en gör att Flask skickar med siffran som ett argument till funktionen.
     """
-    data = load_data()
-    
-    # Vi letar igenom listan efter en vän med matchande ID
-    # 'next' hämtar det första objektet som matchar villkoret, eller None om det inte finns
-    friend = next((f for f in data if f['id'] == friend_id), None)
+    # Repositoryt slår upp vännen på ID, eller ger None om den inte finns
+    friend = repo.get_by_id(friend_id)
 
     if friend:
         # Om vännen hittas, returnera den med status 200 OK
@@ -45,41 +34,40 @@ def get_friend_by_id(friend_id):
 
 @friends_refactor_bp.route('/', methods=['POST'])
 def add_friend():
-    data = load_data()
     new_friend = request.json
 
     if not new_friend or 'id' not in new_friend:
         # 400 Bad Request: Client sent invalid data
         return jsonify({"error": "Invalid data"}), 400
+    if not is_friend_id(new_friend['id']):
+        # 400 Bad Request: the ID must be an integer (the indexes are built on it)
+        return jsonify({"error": "ID must be an integer"}), 400
+    if repo.get_by_id(new_friend['id']):
+        # 409 Conflict: A friend with that ID already exists
+        return jsonify({"error": "Friend already exists"}), 409
 
-    data.append(new_friend)
-    save_data(data)
+    repo.add(new_friend)
     # 201 Created: Successful post resulting in a new resource
     return jsonify(new_friend), 201
 
 
 @friends_refactor_bp.route('/<int:friend_id>', methods=['PUT'])
 def update_friend(friend_id):
-    data = load_data()
-    for friend in data:
-        if friend['id'] == friend_id:
-            friend.update(request.json)
-            save_data(data)
-            # 200 OK: Resource updated successfully
-            return jsonify(friend), 200
+    # The ID in the URL wins, a friend can't change its ID
+    updates = {key: value for key, value in request.json.items() if key != 'id'}
+    friend = repo.update(friend_id, updates)
+    if friend:
+        # 200 OK: Resource updated successfully
+        return jsonify(friend), 200
 
     # 404 Not Found: Resource with that ID doesn't exist
     return jsonify({"error": "Friend not found"}), 404
 #api/v1/friends/2
 @friends_refactor_bp.route('/<int:friend_id>', methods=['DELETE'])
 def delete_friend(friend_id):
-    data = load_data()
-    updated_data = [f for f in data if f['id'] != friend_id]
-
-    if len(updated_data) == len(data):
+    if not repo.delete(friend_id):
         return jsonify({"error": "Friend not found"}), 404
 
-    save_data(updated_data)
     # 204 No Content: Success, but nothing to return (common for DELETE)
     # Or use 200 OK with a message
-    return jsonify({"message": "Deleted successfully"}), 200
\ No newline at end of file
+    return jsonify({"message": "Deleted successfully"}), 200
@@ -1,14 +1,23 @@
 # myblueprints/friends_repository_bp.py
 from flask import Blueprint, request, jsonify
+import base64
 import re
-# Vi hämtar klassen från mappen 'myblueprints/repositories' och filen 'friend_repository'
-from .repositories.friendrepository import FriendRepository
+# Vi hämtar repositoryt från mappen 'myblueprints/repositories'.
+# Vilken lagring (json/log/sqlite) som används styrs av FRIENDS_BACKEND, se repositoryfactory.py
+from .repositories.repositoryfactory import get_friend_repository
+from .repositories.friendsearchindex import FriendSearchIndex
+from .repositories.friendrepository import is_friend_id
+from . import jsoncodec
+from .streaming import stream_items
+from .conditional import conditional_get
 
 # Skapar Blueprint
 friends_repository_bp = Blueprint('friends_repository_bp', __name__)
 
-# Initiera repository-instansen med sökvägen till JSON-filen
-repo = FriendRepository('friends.json')
+# Hämta det delade repositoryt (samma instans som v7 använder)
+repo = get_friend_repository()
+# Sökindex för namn/e-post som uppdateras automatiskt när repositoryt ändras
+search_index = FriendSearchIndex(repo)
 
 # Global konstant för e-postmönster
 EMAIL_REGEX = r'^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$'
@@ -30,14 +39,15 @@ def sanitize_value(value):
 
 # --- 2. VALIDATION FUNCTION (Validering) ---
 
-def validate_friend(friend_data, is_new=True):
+def validate_friend(friend_data, is_new=True, friend_id=None):
     """
     Kontrollerar affärsregler på den tvättade datan.
+    friend_id anges vid uppdatering (PUT) så att vännen får behålla sin egen e-post.
     Returnerar (True, None) om allt är okej.
     """
     # Kolla ID om det är en ny vän (POST)
     if is_new:
-        if not isinstance(friend_data.get('id'), int):
+        if not is_friend_id(friend_data.get('id')):
             return False, "ID must be an integer."
         # Använder repositoryt för att kolla om ID redan finns
         if repo.get_by_id(friend_data.get('id')):
@@ -52,8 +62,74 @@ def validate_friend(friend_data, is_new=True):
     if 'email' in friend_data:
         if not re.match(EMAIL_REGEX, friend_data['email']):
             return False, "Invalid email format."
+        # Kolla att ingen annan redan har e-posten (uppslag i repositoryts e-postindex)
+        existing = repo.get_by_email(friend_data['email'])
+        own_id = friend_data.get('id') if is_new else friend_id
+        if existing and existing['id'] != own_id:
+            return False, "Email already exists."
 
     return True, None
+
+# --- 3. LISTNING MED SIDOR, FILTER OCH FÄLT ---
+# ?limit=10              -> högst 10 vänner per svar
+# ?cursor=...            -> fortsätt efter förra sidan (värdet kommer i headern X-Next-Cursor)
+# ?fields=name,email     -> skicka bara de här fälten
+# ?status=Kompis         -> filter på lika med (name, email, status)
+
+LIST_FILTERS = ('name', 'email', 'status')
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(friend_id):
+    # Cursorn ska vara "opak" för klienten: den skickar bara tillbaka det den fick
+    return base64.urlsafe_b64encode(jsoncodec.dumpb(friend_id)).decode()
+
+def decode_cursor(cursor):
+    # Klienten kan skicka vad som helst, så kontrollera att det verkligen blev ett id.
+    # Annars kraschar jämförelsen med id:na först när svaret redan börjat strömmas.
+    after_id = jsoncodec.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not is_friend_id(after_id):
+        raise ValueError("cursor is not an id")
+    return after_id
+
+def list_friends(args):
+    """
+    Hämtar en sida vänner enligt query-parametrarna i args.
+    Returnerar (vänner, headers, None) eller (None, None, felmeddelande).
+    Utan limit är 'vänner' en generator så att hela listan kan strömmas ut.
+    """
+    limit = None
+    if 'limit' in args:
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            return None, None, "limit must be an integer."
+        if not (1 <= limit <= MAX_PAGE_SIZE):
+            return None, None, f"limit must be between 1 and {MAX_PAGE_SIZE}."
+
+    after_id = None
+    if 'cursor' in args:
+        try:
+            after_id = decode_cursor(args['cursor'])
+        except ValueError:
+            return None, None, "Invalid cursor."
+
+    filters = {key: args[key] for key in LIST_FILTERS if key in args}
+    if 'email' in filters:
+        filters['email'] = filters['email'].lower()
+
+    headers = {}
+    if limit is None:
+        friends = repo.iter_friends(after_id, filters)
+    else:
+        friends, has_more = repo.get_page(after_id, limit, filters)
+        if has_more:
+            headers['X-Next-Cursor'] = encode_cursor(friends[-1]['id'])
+
+    if 'fields' in args:
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        friends = ({key: friend[key] for key in fields if key in friend} for friend in friends)
+    return friends, headers, None
+
 # --- Säkerhetskontroll ---
 #Genom att lägga det i @before_request skyddar vi hela Blueprinten på en gång. Om den inte går igenom, körs aldrig koden i övriga end points/route överhuvudtaget.
 #http://127.0.0.1:5000/api/v6/friends/?api_key=abc
@@ -79,16 +155,24 @@ def check_api_key():
         }), 401
 # --- API ROUTES ---
 #http://127.0.0.1:5000/api/v6/friends/?api_key=abc
+#http://127.0.0.1:5000/api/v6/friends/?api_key=abc&limit=2&fields=name,email
 @friends_repository_bp.route('/', methods=['GET'])
 def get_friends():
     """
-    Hämtar alla vänner.
-    Anropar repo.get_all() som sköter filkontakten.
+    Hämtar alla vänner, eller en sida/ett urval (se list_friends ovan).
+    Repositoryt sköter filkontakten.
     """
-    all_friends = repo.get_all()
-    
-    # Vi skickar tillbaka listan som JSON med statuskod 200 (OK)
-    return jsonify(all_friends), 200
+    # Villkorlig GET: oförändrad datamängd -> 304 utan att någon vän läses eller serialiseras
+    not_modified, conditional_headers = conditional_get(*repo.get_version())
+    if not_modified:
+        return not_modified
+
+    friends, headers, error_msg = list_friends(request.args)
+    if error_msg:
+        return jsonify({"error": "Bad Request", "message": error_msg}), 400
+
+    # Vi strömmar listan som JSON (eller NDJSON om klienten ber om det) med statuskod 200 (OK)
+    return stream_items(friends, 200, {**headers, **conditional_headers})
 
 #http://127.0.0.1:5000/api/v6/friends/1?api_key=abc
 @friends_repository_bp.route('/<int:friend_id>', methods=['GET'])
@@ -96,16 +180,72 @@ def get_friend_by_id(friend_id):
     """
     Hämtar en enskild vän med hjälp av repositoryt.
     """
+    # Varje vän har en egen version, så ETag:en ändras bara när just den vännen ändras
+    version = repo.get_record_version(friend_id)
+    headers = {}
+    if version is not None:
+        _, last_modified = repo.get_version()
+        not_modified, headers = conditional_get(version, last_modified, per_variant=False)
+        if not_modified:
+            return not_modified
+
     # Vi ber repositoryt att hitta vännen åt oss
     friend = repo.get_by_id(friend_id)
 
     if friend:
         # Om vännen finns (inte är None), returnera den
-        return jsonify(friend), 200
+        return jsonify(friend), 200, headers
     
     # Om vännen inte hittades (None), returnera 404
     return jsonify({"error": f"Friend with ID {friend_id} not found"}), 404
 
+#http://127.0.0.1:5000/api/v6/friends/by-email/harvey@law.com?api_key=abc
+@friends_repository_bp.route('/by-email/<email>', methods=['GET'])
+def get_friend_by_email(email):
+    """
+    Hämtar en vän via e-post. Repositoryt har ett index på e-post, så vi slipper loopa.
+    """
+    not_modified, headers = conditional_get(*repo.get_version())
+    if not_modified:
+        return not_modified
+
+    friend = repo.get_by_email(email)
+    if friend:
+        return jsonify(friend), 200, headers
+    return jsonify({"error": f"Friend with email {email} not found"}), 404
+
+#http://127.0.0.1:5000/api/v6/friends/search?q=harv&api_key=abc
+@friends_repository_bp.route('/search', methods=['GET'])
+def search_friends():
+    """
+    Sök på namn och e-post (t.ex. för en sökruta som fylls i medan man skriver).
+    Alla ord i q måste matcha. Bästa träffen först, med poängen i fältet 'score'.
+    Headern X-Search-Truncated: true betyder att alla kandidater inte hann kontrolleras.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Bad Request", "message": "Query parameter q is required"}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"error": "Bad Request", "message": "limit must be an integer."}), 400
+    if not (1 <= limit <= MAX_PAGE_SIZE):
+        return jsonify({"error": "Bad Request", "message": f"limit must be between 1 and {MAX_PAGE_SIZE}."}), 400
+
+    # Med många kandidater kan sökningen ge upp innan alla kontrollerats (se
+    # friendsearchindex.py). Då får klienten veta det: det kan finnas bättre träffar.
+    results, truncated = search_index.search_with_truncated(query, limit)
+    return jsonify(results), 200, {'X-Search-Truncated': 'true' if truncated else 'false'}
+
+#http://127.0.0.1:5000/api/v6/friends/by-status/Awesome?api_key=abc
+@friends_repository_bp.route('/by-status/<status>', methods=['GET'])
+def get_friends_by_status(status):
+    # Alla vänner med exakt denna status, sorterade på id
+    not_modified, headers = conditional_get(*repo.get_version())
+    if not_modified:
+        return not_modified
+    return jsonify(repo.get_by_status(status)), 200, headers
+
 @friends_repository_bp.route('/', methods=['POST'])
 def add_friend():
     incoming = request.get_json()
@@ -151,7 +291,7 @@ def pdate_friend(friend_id):
     if 'status' in incoming: updates['status'] = sanitize_value(incoming['status'])
 
     # STEG 2: VALIDATE (Kolla reglerna på den tvättade datan)
-    is_valid, error_msg = validate_friend(updates, is_new=False)
+    is_valid, error_msg = validate_friend(updates, is_new=False, friend_id=friend_id)
     if not is_valid:
         return jsonify({"error": "Validation Error", "message": error_msg}), 400
 
@@ -169,4 +309,120 @@ def delete_friend(friend_id):
     # Repository-klassen sköter logiken för borttagning
     if repo.delete(friend_id):
         return jsonify({"message": f"Friend {friend_id} deleted"}), 200
-    return jsonify({"error": "Not Found"}), 404
\ No newline at end of file
+    return jsonify({"error": "Not Found"}), 404
+
+# --- MASSOPERATIONER (bulk) ---
+# Istället för tusentals separata anrop skickar man en lista. Varje post går genom samma
+# sanitize_value/validate_friend som ovan och fel rapporteras per post (index i listan).
+# Alla godkända poster sparas sedan med EN inläsning och EN skrivning i repositoryt.
+
+def prepare_bulk_create(items):
+    """Returnerar (godkända vänner, fel-lista) för en lista med nya vänner."""
+    friends, errors = [], []
+    seen_ids, seen_emails = set(), set()
+    required = ['id', 'name', 'email', 'status']
+    for i, incoming in enumerate(items):
+        if not isinstance(incoming, dict) or not all(field in incoming for field in required):
+            errors.append({"index": i, "message": "Missing required fields"})
+            continue
+
+        clean_data = {
+            "id": incoming.get('id'),
+            "name": sanitize_value(incoming.get('name')),
+            "email": sanitize_value(incoming.get('email')).lower(),
+            "status": sanitize_value(incoming.get('status'))
+        }
+        is_valid, error_msg = validate_friend(clean_data, is_new=True)
+        if is_valid and clean_data['id'] in seen_ids:
+            is_valid, error_msg = False, "ID appears more than once in the batch."
+        if is_valid and clean_data['email'] in seen_emails:
+            is_valid, error_msg = False, "Email appears more than once in the batch."
+        if not is_valid:
+            errors.append({"index": i, "id": clean_data['id'], "message": error_msg})
+            continue
+
+        seen_ids.add(clean_data['id'])
+        seen_emails.add(clean_data['email'])
+        clean_data["name"] = clean_data["name"].title()
+        clean_data["status"] = clean_data["status"].capitalize()
+        friends.append(clean_data)
+    return friends, errors
+
+def prepare_bulk_update(items):
+    """Returnerar ({id: ändringar}, fel-lista) för en lista med {"id": .., fält som ska ändras}."""
+    updates_by_id, errors = {}, []
+    seen_emails = set()
+    for i, incoming in enumerate(items):
+        friend_id = incoming.get('id') if isinstance(incoming, dict) else None
+        if not is_friend_id(friend_id):
+            errors.append({"index": i, "message": "ID must be an integer."})
+            continue
+        if friend_id in updates_by_id:
+            errors.append({"index": i, "id": friend_id, "message": "ID appears more than once in the batch."})
+            continue
+        if not repo.get_by_id(friend_id):
+            errors.append({"index": i, "id": friend_id, "message": "Not Found"})
+            continue
+
+        updates = {}
+        if 'name' in incoming: updates['name'] = sanitize_value(incoming['name'])
+        if 'email' in incoming: updates['email'] = sanitize_value(incoming['email']).lower()
+        if 'status' in incoming: updates['status'] = sanitize_value(incoming['status'])
+
+        is_valid, error_msg = validate_friend(updates, is_new=False, friend_id=friend_id)
+        if is_valid and updates.get('email') in seen_emails:
+            is_valid, error_msg = False, "Email appears more than once in the batch."
+        if not is_valid:
+            errors.append({"index": i, "id": friend_id, "message": error_msg})
+            continue
+
+        if 'email' in updates: seen_emails.add(updates['email'])
+        if 'name' in updates: updates['name'] = updates['name'].title()
+        if 'status' in updates: updates['status'] = updates['status'].capitalize()
+        updates_by_id[friend_id] = updates
+    return updates_by_id, errors
+
+def prepare_bulk_delete(items):
+    """Returnerar (id som ska tas bort, fel-lista) för en lista med id."""
+    friend_ids, errors = [], []
+    for i, friend_id in enumerate(items):
+        if not is_friend_id(friend_id):
+            errors.append({"index": i, "message": "ID must be an integer."})
+        else:
+            friend_ids.append(friend_id)
+    return friend_ids, errors
+
+#http://127.0.0.1:5000/api/v6/friends/bulk?api_key=abc  body: [{"id": 10, "name": ..., "email": ..., "status": ...}, ...]
+@friends_repository_bp.route('/bulk', methods=['POST'])
+def add_friends_bulk():
+    incoming = request.get_json()
+    if not isinstance(incoming, list):
+        return jsonify({"error": "Bad Request", "message": "Body must be a JSON array"}), 400
+
+    friends, errors = prepare_bulk_create(incoming)
+    created = repo.add_many(friends) if friends else []
+    return jsonify({"created": created, "errors": errors}), 201 if created else 400
+
+#body: [{"id": 10, "status": "kompis"}, ...]
+@friends_repository_bp.route('/bulk', methods=['PATCH'])
+def update_friends_bulk():
+    incoming = request.get_json()
+    if not isinstance(incoming, list):
+        return jsonify({"error": "Bad Request", "message": "Body must be a JSON array"}), 400
+
+    updates_by_id, errors = prepare_bulk_update(incoming)
+    updated = repo.update_many(updates_by_id) if updates_by_id else []
+    return jsonify({"updated": updated, "errors": errors}), 200 if updated else 400
+
+#body: [10, 11, 12]
+@friends_repository_bp.route('/bulk', methods=['DELETE'])
+def delete_friends_bulk():
+    incoming = request.get_json()
+    if not isinstance(incoming, list):
+        return jsonify({"error": "Bad Request", "message": "Body must be a JSON array"}), 400
+
+    friend_ids, errors = prepare_bulk_delete(incoming)
+    deleted = repo.delete_many(friend_ids) if friend_ids else []
+    deleted_set = set(deleted)
+    errors += [{"id": friend_id, "message": "Not Found"} for friend_id in friend_ids if friend_id not in deleted_set]
+    return jsonify({"deleted": deleted, "errors": errors}), 200 if deleted else 404
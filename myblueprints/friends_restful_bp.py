@@ -1,16 +1,45 @@
 from flask import Blueprint, request, render_template
 from flask_restful import Api, Resource, reqparse, abort #kom ihåg att installera flask-restful jag behövde stå i cmd prompten för att kunna göra detta: python -m pip install flask-restful  
 import re
-# Vi hämtar klassen från mappen 'myblueprints/repositories' och filen 'friend_repository'
-from .repositories.friendrepository import FriendRepository
+# Vi hämtar repositoryt från mappen 'myblueprints/repositories'.
+# Vilken lagring (json/log/sqlite) som används styrs av FRIENDS_BACKEND, se repositoryfactory.py
+from .repositories.repositoryfactory import get_friend_repository
+from .repositories.changefeed import FriendChangeFeed
+from .repositories.friendrepository import FriendConflictError, is_friend_id
+# Massoperationerna validerar med samma sanitize_value/validate_friend-kedja som v6
+from .friends_respository_bp import prepare_bulk_create, prepare_bulk_update, prepare_bulk_delete
+# Sidor (?limit/?cursor), ?fields och filter fungerar likadant som i v6
+from .friends_respository_bp import list_friends
+from . import jsoncodec
+from .streaming import stream_items, stream_events, sse_event
+from .conditional import conditional_get
 
 # --- Skapa blueprinten ---
 friends_restful_bp = Blueprint('friends_restful_bp', __name__)
 #Vi kopplar Flask-RESTful Api till vår blueprint.
 # Detta gör att vi kan använda klasser (Resources) istället för vanliga funktioner.
-api = Api(friends_restful_bp) # kopplar Flask-RESTful to the Blueprint
+class FriendApi(Api):
+    # Flask-RESTful gör om alla fel i en Resource till 500 innan appens errorhandler
+    # hinner se dem. En krock i repositoryt (t.ex. samma e-post) ska bli 409 även här.
+    def handle_error(self, e):
+        if isinstance(e, FriendConflictError):
+            return self.make_response({"error": "Conflict", "message": str(e)}, 409)
+        return super().handle_error(e)
 
-repo = FriendRepository('friends.json')
+api = FriendApi(friends_restful_bp) # kopplar Flask-RESTful to the Blueprint
+
+# Flask-RESTful har en egen JSON-kodning (inte jsonify), så vi byter ut den mot jsoncodec
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    return jsoncodec.json_response(data, code, headers)
+
+repo = get_friend_repository()
+# Numrerade ändringar för /changes (skapas direkt så att inga ändringar missas)
+change_feed = FriendChangeFeed(repo)
+
+# Så länge väntar /changes på nästa ändring innan en "keepalive" skickas. Den håller
+# anslutningen vid liv och gör att servern märker när klienten har stängt sidan.
+KEEPALIVE_SECONDS = 15
 
 VALID_API_KEY = "abc"
 EMAIL_REGEX = r'^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$'
@@ -30,6 +59,35 @@ def friends_page():
     # Renderar templates/friends.html
     return render_template('crudview.html')
 
+#http://127.0.0.1:5000/api/v7/friends/changes?api_key=abc&since=0
+@friends_restful_bp.route('/changes')
+def friend_changes():
+    # Server-Sent Events: en händelse per ändring (add/update/delete) med löpnummer som id.
+    # ?since=N (eller headern Last-Event-ID när webbläsaren kopplar upp igen) ger först
+    # allt efter N. Utan since börjar flödet från nu. 'reset' betyder "hämta hela listan igen".
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(since) if since is not None else change_feed.seq
+    except ValueError:
+        return {"error": "Bad Request", "message": "since must be an integer."}, 400
+
+    def events(since):
+        # Skickas direkt så att webbläsaren ser att anslutningen är öppen. retry = hur många
+        # millisekunder EventSource väntar innan den kopplar upp igen efter ett avbrott.
+        yield 'retry: 3000\n\n'
+        while True:
+            batch, seq = change_feed.events_since(since, timeout=KEEPALIVE_SECONDS)
+            if batch is None:
+                yield sse_event({"seq": seq}, 'reset', seq)
+            elif not batch:
+                # Rader som börjar med ':' är kommentarer och ignoreras av EventSource
+                yield ': keepalive\n\n'
+            for event_seq, op, friend_id, friend in batch or ():
+                yield sse_event({"seq": event_seq, "id": friend_id, "friend": friend}, op, event_seq)
+            since = seq
+
+    return stream_events(events(since))
+
 # --- 2. Request Parsing & Sanitization ---
 # Denna funktion skickas in i vår Parser nedan. 
 #Den tvättar datan INNAN den ens når våra GET/POST-metoder.
@@ -44,6 +102,16 @@ def sanitize_type(value):
     clean = re.sub(r'<.*?>', '', str(value)).strip()
     return clean
 
+def friend_id_type(value):
+    # Som int, men true/false (som int() gör om till 1/0) och heltal som inte ryms i
+    # 64 bitar stoppas här. Annars skulle repositoryt säga nej och det bli ett 500-fel.
+    if isinstance(value, bool):
+        raise ValueError("ID must be an integer")
+    value = int(value)
+    if not is_friend_id(value):
+        raise ValueError("ID must be an integer")
+    return value
+
 # Parsar POST/PUT
 # Istället för att använda request.get_json() och kolla manuellt, 
 # skapar vi en mall för hur inkommande data SKA se ut.
@@ -52,7 +120,7 @@ friend_parser = reqparse.RequestParser()
 
 # För ID: Krävs, får inte vara null, och måste vara ett heltal
 friend_parser.add_argument('id', 
-    type=int, 
+    type=friend_id_type, 
     required=True, 
     nullable=False, 
     help='ID is required and must be a valid integer.')
@@ -66,9 +134,23 @@ friend_parser.add_argument('status', type=sanitize_type, required=True, help="St
 #I Flask-RESTful grupperar vi logiken i klasser baserat på URL-end pointen.
 class FriendList(Resource):
     #Hanterar anrop till roten, t.ex. /api/v7/friends/
-    #för att få alla friends
+    #för att få alla friends, t.ex. /api/v7/friends/?limit=2&fields=name,email
     def get(self):
-        return repo.get_all(), 200
+        # Oförändrad datamängd -> 304 direkt, utan att läsa eller serialisera vänner
+        not_modified, conditional_headers = conditional_get(*repo.get_version())
+        if not_modified:
+            return not_modified
+
+        # Löpnumret tas INNAN listan läses: en ändring mitt emellan kommer då med i /changes
+        # (att få samma ändring två gånger gör inget, den ger samma resultat)
+        seq = change_feed.seq
+        friends, headers, error_msg = list_friends(request.args)
+        if error_msg:
+            abort(400, message=error_msg)
+        headers['X-Change-Seq'] = str(seq)
+        # Ett färdigt Response skickar Flask-RESTful vidare som det är, så listan strömmas
+        # istället för att serialiseras i ett stycke (NDJSON med Accept: application/x-ndjson)
+        return stream_items(friends, 200, {**headers, **conditional_headers})
 
     def post(self):
         #Skapa en ny vän
@@ -86,6 +168,10 @@ class FriendList(Resource):
         if not re.match(EMAIL_REGEX, args['email']):
             abort(400, message="Invalid email format.")
 
+        # E-post måste vara unik (slås upp i repositoryts e-postindex)
+        if repo.get_by_email(args['email']):
+            abort(400, message="Email already exists.")
+
         # Formattering
         args['name'] = args['name'].title()
         args['email'] = args['email'].lower()
@@ -97,10 +183,18 @@ class FriendList(Resource):
 class FriendItem(Resource):
     #Hanterar anrop till specifika ID:n, t.ex. /api/v7/friends/1
     def get(self, friend_id):
+        # ETag per vän: ändras bara när just den här vännen ändras
+        version = repo.get_record_version(friend_id)
+        if version is None:
+            abort(404, message=f"Friend {friend_id} not found")
+        not_modified, headers = conditional_get(version, repo.get_version()[1], per_variant=False)
+        if not_modified:
+            return not_modified
+
         friend = repo.get_by_id(friend_id)
         if not friend:
             abort(404, message=f"Friend {friend_id} not found")
-        return friend, 200
+        return friend, 200, headers
 
     def put(self, friend_id):
         #Uppdatera en befintlig vän /api/v7/friends/2
@@ -109,6 +203,10 @@ class FriendItem(Resource):
             
         # Use partial parsing (don't require all fields for PUT)
         args = friend_parser.parse_args()
+
+        existing = repo.get_by_email(args['email'])
+        if existing and existing['id'] != friend_id:
+            abort(400, message="Email already exists.")
         
         # Re-apply formatting
         if args['name']: args['name'] = args['name'].title()
@@ -124,8 +222,60 @@ class FriendItem(Resource):
             return {"message": f"Friend {friend_id} deleted"}, 200
         abort(404, message="Friend not found")
 
+class FriendByEmail(Resource):
+    #Hämta en vän via e-post, t.ex. /api/v7/friends/by-email/harvey@law.com
+    def get(self, email):
+        not_modified, headers = conditional_get(*repo.get_version())
+        if not_modified:
+            return not_modified
+
+        friend = repo.get_by_email(email)
+        if not friend:
+            abort(404, message=f"Friend with email {email} not found")
+        return friend, 200, headers
+
+class FriendsByStatus(Resource):
+    #Alla vänner med en viss status, t.ex. /api/v7/friends/by-status/Awesome
+    def get(self, status):
+        not_modified, headers = conditional_get(*repo.get_version())
+        if not_modified:
+            return not_modified
+        return repo.get_by_status(status), 200, headers
+
+class FriendBulk(Resource):
+    #Massoperationer mot /api/v7/friends/bulk. Body är en JSON-lista.
+    #Fel rapporteras per post, godkända poster sparas i EN skrivning.
+    def _items(self):
+        items = request.get_json(silent=True)
+        if not isinstance(items, list):
+            abort(400, message="Body must be a JSON array")
+        return items
+
+    def post(self):
+        #[{"id": 10, "name": ..., "email": ..., "status": ...}, ...]
+        friends, errors = prepare_bulk_create(self._items())
+        created = repo.add_many(friends) if friends else []
+        return {"created": created, "errors": errors}, 201 if created else 400
+
+    def patch(self):
+        #[{"id": 10, "status": "kompis"}, ...]
+        updates_by_id, errors = prepare_bulk_update(self._items())
+        updated = repo.update_many(updates_by_id) if updates_by_id else []
+        return {"updated": updated, "errors": errors}, 200 if updated else 400
+
+    def delete(self):
+        #[10, 11, 12]
+        friend_ids, errors = prepare_bulk_delete(self._items())
+        deleted = repo.delete_many(friend_ids) if friend_ids else []
+        deleted_set = set(deleted)
+        errors += [{"id": friend_id, "message": "Not Found"} for friend_id in friend_ids if friend_id not in deleted_set]
+        return {"deleted": deleted, "errors": errors}, 200 if deleted else 404
+
 # --- 4. Registera routes ---
 # Since url_prefix is '/api/v7/friends' in flask_app.py, these paths are relative to that.
 api.add_resource(FriendList, '/')                 # Becomes: /api/v7/friends/ för at thater GET för att hämat all vänner och POST för att lägg till en vän
 api.add_resource(FriendItem, '/<int:friend_id>')  # Becomes: /api/v7/friends/1 för att hantera enskild vän vid PUT och DELETE
+api.add_resource(FriendByEmail, '/by-email/<email>')      # Becomes: /api/v7/friends/by-email/harvey@law.com
+api.add_resource(FriendsByStatus, '/by-status/<status>')  # Becomes: /api/v7/friends/by-status/Awesome
+api.add_resource(FriendBulk, '/bulk')             # Becomes: /api/v7/friends/bulk för POST/PATCH/DELETE av många vänner i ett anrop
 
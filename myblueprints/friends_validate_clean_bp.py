@@ -1,11 +1,13 @@
 # myblueprints/friends_validate_clean_bp.py
 from flask import Blueprint, request, jsonify
-import json
-import os
 import re
 
+from .repositories.repositoryfactory import get_friend_repository
+from .repositories.friendrepository import is_friend_id
+
 friends_validate_bp = Blueprint('friends_validate_bp', __name__)
-JSON_DATA_FILE = 'friends.json'
+# Samma repository som alla andra versioner, så ändringar syns överallt direkt
+repo = get_friend_repository()
 
 # Global konstants för validering
 """
@@ -22,16 +24,6 @@ EMAIL_REGEX = r'^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$'
 
 # --- Utility Functions (Hjälpfunktioner) ---
 
-def load_data():
-    if not os.path.exists(JSON_DATA_FILE):
-        return []
-    with open(JSON_DATA_FILE, 'r') as f:
-        return json.load(f)
-
-def save_data(data):
-    with open(JSON_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
-
 # --- SANITIZATION FUNCTION (Tvättning) ---
 
 def sanitize_value(value):
@@ -47,16 +39,17 @@ def sanitize_value(value):
 
 # --- VALIDATION FUNCTION (Validering) ---
 
-def validate_friend(friend_data, is_new=True, existing_data=None):
+def validate_friend(friend_data, is_new=True, friend_id=None):
     """
     Kontrollerar att datan följer affärsreglerna.
+    friend_id anges vid uppdatering (PUT) så att vännen får behålla sin egen e-post.
     Returnerar (True, None) om OK, annars (False, "Felmeddelande").
     """
-    # 1. Validera ID (endast vid POST/ny vän)
+    # 1. Validera ID (endast vid POST/ny vän). Repositoryt slår upp id direkt.
     if is_new:
-        if not isinstance(friend_data.get('id'), int):
+        if not is_friend_id(friend_data.get('id')):
             return False, "ID must be an integer."
-        if existing_data and any(f['id'] == friend_data['id'] for f in existing_data):
+        if repo.get_by_id(friend_data['id']):
             return False, "ID already exists."
 
     # 2. Validera Namn (om det finns med i datan)
@@ -68,6 +61,11 @@ def validate_friend(friend_data, is_new=True, existing_data=None):
     if 'email' in friend_data:
         if not re.match(EMAIL_REGEX, friend_data['email']):
             return False, "Invalid email format."
+        # E-posten får inte redan användas av någon annan vän (uppslag i e-postindexet)
+        existing = repo.get_by_email(friend_data['email'])
+        own_id = friend_data.get('id') if is_new else friend_id
+        if existing and existing['id'] != own_id:
+            return False, "Email already exists."
 
     return True, None
 
@@ -75,19 +73,17 @@ def validate_friend(friend_data, is_new=True, existing_data=None):
 
 @friends_validate_bp.route('/', methods=['GET'])
 def get_friends():
-    return jsonify(load_data()), 200
+    return jsonify(repo.get_all()), 200
 
 @friends_validate_bp.route('/<int:friend_id>', methods=['GET'])
 def get_friend_by_id(friend_id):
-    data = load_data()
-    friend = next((f for f in data if f['id'] == friend_id), None)
+    friend = repo.get_by_id(friend_id)
     if friend:
         return jsonify(friend), 200
     return jsonify({"error": "Friend not found"}), 404
 
 @friends_validate_bp.route('/', methods=['POST'])
 def add_friend():
-    all_friends = load_data()
     incoming = request.get_json()
 
     # Kontrollera att alla fält finns
@@ -104,7 +100,7 @@ def add_friend():
     }
 
     # STEG 2: VALIDATE (Kontrollera regler)
-    is_valid, error_msg = validate_friend(clean_data, is_new=True, existing_data=all_friends)
+    is_valid, error_msg = validate_friend(clean_data, is_new=True)
     if not is_valid:
         return jsonify({"error": "Validation Error", "message": error_msg}), 400
 
@@ -116,17 +112,15 @@ def add_friend():
         "status": clean_data["status"].capitalize()
     }
 
-    all_friends.append(new_friend)
-    save_data(all_friends)
+    repo.add(new_friend)
     return jsonify(new_friend), 201
 
 @friends_validate_bp.route('/<int:friend_id>', methods=['PUT'])
 def update_friend(friend_id):
-    all_friends = load_data()
     incoming = request.get_json()
     
-    # Hitta vännen i listan
-    friend = next((f for f in all_friends if f['id'] == friend_id), None)
+    # Hitta vännen
+    friend = repo.get_by_id(friend_id)
     if not friend:
         return jsonify({"error": "Not Found"}), 404
 
@@ -140,28 +134,21 @@ def update_friend(friend_id):
         updates['status'] = sanitize_value(incoming['status'])
 
     # STEG 2: VALIDATE (Kolla om de uppdaterade värdena är okej)
-    is_valid, error_msg = validate_friend(updates, is_new=False)
+    is_valid, error_msg = validate_friend(updates, is_new=False, friend_id=friend_id)
     if not is_valid:
         return jsonify({"error": "Validation Error", "message": error_msg}), 400
 
     # STEG 3: APPLY UPDATES
-    if 'name' in updates: friend['name'] = updates['name'].title()
-    if 'email' in updates: friend['email'] = updates['email']
-    if 'status' in updates: friend['status'] = updates['status'].capitalize()
+    if 'name' in updates: updates['name'] = updates['name'].title()
+    if 'status' in updates: updates['status'] = updates['status'].capitalize()
 
-    save_data(all_friends)
+    friend = repo.update(friend_id, updates)
     return jsonify(friend), 200
 
 @friends_validate_bp.route('/<int:friend_id>', methods=['DELETE'])
 def delete_friend(friend_id):
-    all_friends = load_data()
-    original_length = len(all_friends)
-    
-    # Filtrera bort vännen
-    all_friends = [f for f in all_friends if f['id'] != friend_id]
-    
-    if len(all_friends) == original_length:
+    # delete returnerar False om vännen inte fanns
+    if not repo.delete(friend_id):
         return jsonify({"error": "Not Found"}), 404
 
-    save_data(all_friends)
     return jsonify({"message": f"Friend {friend_id} deleted"}), 200
\ No newline at end of file
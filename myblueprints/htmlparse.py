@@ -0,0 +1,27 @@
+# myblueprints/htmlparse.py
+# Snabbare HTML-tolkning för skraparna.
+# BeautifulSoup(html, 'html.parser') bygger ett objekt för VARJE tagg och text på sidan,
+# fast vi bara behöver några få. Med en SoupStrainer ("sil") byggs bara de taggar vi
+# frågar efter (och det som ligger inuti dem), resten av sidan hoppas över.
+# Är lxml installerat (python -m pip install lxml) används det, det är skrivet i C och
+# läser sidan mycket snabbare. Välj själv med SCRAPER_HTML_PARSER=html.parser eller lxml.
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401 (vi vill bara veta om det finns)
+    _DEFAULT_PARSER = 'lxml'
+except ImportError:
+    _DEFAULT_PARSER = 'html.parser'
+
+HTML_PARSER = os.environ.get('SCRAPER_HTML_PARSER', _DEFAULT_PARSER)
+
+def parse_only(markup, name, class_):
+    """Soppa med bara taggarna name med CSS-klassen class_ (och deras innehåll)."""
+    # Medan sidan läses är class-attributet en vanlig sträng, t.ex. "news-card highlight".
+    # class_='news-card' skulle då inte matcha, så vi delar upp strängen själva
+    # (precis som find_all(class_=...) gör efteråt).
+    def has_class(value):
+        return value is not None and class_ in value.split()
+    return BeautifulSoup(markup, HTML_PARSER, parse_only=SoupStrainer(name, class_=has_class))
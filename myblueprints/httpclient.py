@@ -0,0 +1,74 @@
+# myblueprints/httpclient.py
+# Gemensam HTTP-klient för skraparna (dunews, duschema).
+# requests.get() öppnar en ny TCP- och TLS-anslutning varje gång. En Session håller
+# istället anslutningarna öppna (keep-alive) och återanvänder dem, vilket sparar flera
+# tur-och-retur-resor till servern per hämtning.
+# - timeout (anslut, läs) på alla anrop, så att ingen hämtning kan hänga för evigt
+# - nya försök med ökande väntetid (backoff) vid anslutningsfel och 429/5xx-svar
+# - högst MAX_PER_HOST samtidiga hämtningar mot samma värd
+# - varje hämtning mäts, de senaste finns i recent_fetches()
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 2))
+MAX_PER_HOST = int(os.environ.get('HTTP_MAX_PER_HOST', 4))
+USER_AGENT = 'Mozilla/5.0'
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits = {}
+_fetches = deque(maxlen=100)
+
+def _create_session():
+    # read=False: en läs-timeout försöker inte igen (den har redan väntat READ_TIMEOUT
+    # sekunder) och kommer ut som requests.exceptions.ReadTimeout
+    retry = Retry(total=MAX_RETRIES, read=False, backoff_factor=0.5,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=MAX_PER_HOST, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+def get_session():
+    """Sessionen delas av alla trådar (urllib3:s anslutningspool är trådsäker)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+def _host_limit(host):
+    with _session_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return _host_limits[host]
+
+def get(url, timeout=None, **kwargs):
+    """Som requests.get, men via den delade sessionen med timeout, nya försök och mätning."""
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    status = None
+    try:
+        with _host_limit(host):
+            response = get_session().get(url, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        _fetches.append({"host": host, "url": url, "status": status,
+                         "seconds": round(time.perf_counter() - start, 4), "at": time.time()})
+
+def recent_fetches():
+    """De senaste hämtningarna: värd, url, status (None vid fel) och tid i sekunder."""
+    return list(_fetches)
@@ -0,0 +1,215 @@
+# myblueprints/jsoncodec.py
+# EN plats för all JSON-kodning i appen: repositoryt, load_data/save_data i blueprintarna,
+# jsonify (via appens JSON-provider), Flask-RESTful och strömmade svar går alla hit.
+# Är orjson installerat (python -m pip install orjson) används det - det är skrivet i Rust
+# och flera gånger snabbare än standardbibliotekets json. Annars används json som vanligt.
+#
+# Filer skrivs med indrag (lätta att läsa) om inte FRIENDS_JSON_COMPACT=1 är satt,
+# då skrivs allt på en rad: mindre fil och snabbare att läsa/skriva.
+# OBS: filfunktionerna load/dump vill ha filer öppnade binärt ('rb'/'wb'),
+# då blir det alltid UTF-8 oavsett vilket operativsystem vi kör på.
+import codecs
+import json
+import os
+import re
+from itertools import islice
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson else 'json'
+
+COMPACT_FILES = os.environ.get('FRIENDS_JSON_COMPACT', '0') == '1'
+
+# orjson läser heltal utanför 64 bitar som float, utan att säga till (ett id som
+# 1180591620717411303424 blir 1.1805916207174113e+21). Finns det 19 siffror i rad någonstans
+# i texten (kan vara ett sådant tal) läser vi med json istället, som ger exakt samma heltal.
+# En sådan sifferföljd inuti en sträng ger också json, vilket bara är lite långsammare.
+# Sökningen görs med bytes.translate (siffror -> '0', allt annat -> ' ') en bit i taget:
+# flera gånger snabbare än ett reguljärt uttryck som \d{19}.
+_DIGIT_MASK = bytes(ord('0') if b in b'0123456789' else ord(' ') for b in range(256))
+_LONG_NUMBER = b'0' * 19
+_SCAN_CHUNK = 1 << 20
+
+def _has_long_number(data):
+    for start in range(0, len(data), _SCAN_CHUNK):
+        # Börja 18 tecken före biten, så att en sifferföljd över en gräns också hittas
+        chunk = data[max(start - len(_LONG_NUMBER) + 1, 0):start + _SCAN_CHUNK]
+        if _LONG_NUMBER in chunk.translate(_DIGIT_MASK):
+            return True
+    return False
+
+def dumpb(obj, indent=False, sort_keys=False, default=None):
+    """Kodar obj till JSON-bytes. indent=True ger läsbar text med radbrytningar."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if default is not None:
+            # Låt default (t.ex. Flasks) bestämma hur datum och dataklasser ser ut
+            option |= orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # orjson klarar t.ex. inte heltal större än 64 bitar, det gör json
+            pass
+    if indent:
+        # Två blanksteg som orjson (OPT_INDENT_2): filerna ser likadana ut med och utan orjson
+        text = json.dumps(obj, indent=2, sort_keys=sort_keys, default=default)
+    else:
+        text = json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys, default=default)
+    return text.encode('utf-8')
+
+def dumps(obj, **kwargs):
+    """Som dumpb men returnerar str."""
+    return dumpb(obj, **kwargs).decode('utf-8')
+
+def loads(data):
+    """Avkodar JSON från str eller bytes. Fel ger ValueError (json.JSONDecodeError)."""
+    if orjson is not None:
+        try:
+            data = data.encode('utf-8') if isinstance(data, str) else data
+        except UnicodeEncodeError:
+            # Ensamma surrogattecken ("\ud800" som tecken, inte som escape): bara json klarar dem
+            return json.loads(data)
+        if not _has_long_number(data):
+            return orjson.loads(data)
+    return json.loads(data)
+
+def load(f):
+    return loads(f.read())
+
+def dump(obj, f, compact=None):
+    compact = COMPACT_FILES if compact is None else compact
+    f.write(dumpb(obj, indent=not compact))
+
+def read_file(path, default=None):
+    """Läser en JSON-fil, eller returnerar default (tom lista) om filen inte finns."""
+    if not os.path.exists(path):
+        return [] if default is None else default
+    with open(path, 'rb') as f:
+        return load(f)
+
+# iter_file läser så här många byte åt gången
+READ_CHUNK = 1 << 20
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_AFTER_ELEMENT = (' ', '\t', '\n', '\r', ',', ']')
+
+def iter_file(path, chunk_size=READ_CHUNK):
+    """
+    Läser en JSON-fil med en lista och lämnar ut elementen ett i taget (ingenting om filen
+    inte finns). Samma värden som read_file, men varken hela texten eller hela listan behöver
+    finnas i minnet: filen läses chunk_size byte i taget och varje element avkodas för sig
+    med json (som ger exakta heltal, se loads). Kastar ValueError om filen inte är en lista.
+    """
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        buffer, pos, eof = '', 0, False
+
+        def skip_whitespace():
+            # Hoppar över blanktecken. Returnerar nästa tecken, '' om filen är slut.
+            nonlocal buffer, pos, eof
+            while True:
+                pos = _WHITESPACE.match(buffer, pos).end()
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                buffer, pos = read_more()
+
+        def read_more():
+            nonlocal eof
+            data = f.read(chunk_size)
+            eof = not data
+            return buffer[pos:] + utf8.decode(data, final=eof), 0
+
+        if skip_whitespace() != '[':
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+        if skip_whitespace() == ']':
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # Ett tal sist i bufferten kan fortsätta i nästa bit ("12" av "123", "1.5" av
+                # "1.5e3"): elementet är klart först när det följs av det som får komma efter
+                complete = eof or buffer[end:end + 1] in _AFTER_ELEMENT
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                buffer, pos = read_more()
+                continue
+            pos = end
+            yield item
+            # Vanligast (kompakt fil): ett kommatecken direkt efter elementet
+            if buffer[pos:pos + 1] != ',':
+                separator = skip_whitespace()
+                if separator == ']':
+                    return
+                if separator != ',':
+                    raise ValueError(f"{path}: expected ',' or ']' after element")
+            pos += 1
+            if pos == len(buffer) or buffer[pos] in ' \t\n\r':
+                skip_whitespace()
+
+def write_file(path, obj, compact=None):
+    with open(path, 'wb') as f:
+        dump(obj, f, compact)
+
+def dump_items(items, f, compact=None, chunk_size=1000):
+    """
+    Skriver items (t.ex. en generator) som en JSON-lista, chunk_size element i taget.
+    Samma fil som dump(list(items), f), men hela listan behöver aldrig finnas i minnet.
+    """
+    compact = COMPACT_FILES if compact is None else compact
+    items = iter(items)
+    f.write(b'[')
+    first = True
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        data = dumpb(chunk, indent=not compact)
+        # Ta bort listans egna klamrar (och radbrytningen före ']' med indrag)
+        inner = data[1:-1] if compact else data[1:-2]
+        f.write(inner if first else b',' + inner)
+        first = False
+    f.write(b']' if compact or first else b'\n]')
+
+def write_items(path, items, compact=None):
+    with open(path, 'wb') as f:
+        dump_items(items, f, compact)
+
+def json_response(data, status=200, headers=None):
+    """Ett färdigt JSON-Response (används av Flask-RESTful i v7)."""
+    response = current_app.response_class(dumpb(data) + b'\n', status=status, mimetype='application/json')
+    response.headers.extend(headers or {})
+    return response
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Gör att jsonify och request.get_json() använder dumpb/loads.
+    Beter sig som Flasks standard: sorterade nycklar, och indrag i debug-läge.
+    """
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                     indent=bool(kwargs.get('indent')), default=kwargs.get('default', self.default))
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and current_app.debug)
+        body = dumpb(obj, indent=indent, sort_keys=self.sort_keys, default=self.default)
+        return current_app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -1,5 +1,18 @@
 from flask import Flask, Blueprint, request, jsonify
+import codecs
+import hashlib
+import os
 import re # för att kunna skriv regex
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from . import jsoncodec
+from .resultcache import ResultCache, content_key
+from .watchlist import WatchlistStore
 
 #Vi skapar en ny Blueprint för regex
 regex_bp = Blueprint('reg_bp', __name__)
@@ -128,6 +141,112 @@ PATTERNS = {
 
 }
 
+# --- SNABBARE SKANNING ---
+# re.findall(pattern, text) letar upp (eller kompilerar) mönstret varje gång och går
+# igenom hela texten en gång per mönster. Här kompileras allt EN gång när modulen laddas
+# och varje skanning görs så billig som möjligt, utan att resultatet ändras:
+#
+# 1) Nödvändiga tecken: ett e-postmönster kan inte matcha i en text utan '@'.
+#    "'@' in text" är mycket snabbare än en regex-skanning, saknas tecknet hoppar vi över den.
+# 2) Snabbare men likvärdiga former. re kan hoppa direkt till nästa tänkbara starttecken
+#    om mönstret BÖRJAR med en teckenklass, t.ex. [0-9]. Börjar det med \b eller en grupp
+#    provar re istället varje position i texten. \b[0-9] betyder "en siffra som inte har
+#    ett ordtecken före sig", vilket också kan skrivas [0-9](?<!\w[0-9]).
+# 3) md5 och sha256 är hela "ord" med exakt 32 respektive 64 hextecken, så båda hittas i
+#    samma skanning och sorteras efter längd.
+#
+# En snabb form används bara om mönstret i PATTERNS fortfarande ser ut exakt som när
+# formen skrevs. Ändrar någon i PATTERNS används det nya mönstret som det är.
+# Obs: alla mönster i EN stor alternation (a|b|c) går inte, då hittas bara ett mönster
+# per ställe i texten och t.ex. postnummer inuti ett mobilnummer skulle försvinna.
+HEX = '[0-9a-fA-F]'
+SNABBA_FORMER = {
+    "ipv4": (r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b',
+             r'[0-9](?<!\w[0-9])[0-9]{0,2}\.(?:[0-9]{1,3}\.){2}[0-9]{1,3}\b'),
+    "ipv6": (r'\b(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b',
+             rf'{HEX}(?<!\w{HEX}){HEX}{{0,3}}:(?:{HEX}{{1,4}}:){{6}}{HEX}{{1,4}}\b'),
+    # Samma mönster, bara första varvet skrivet utanför gruppen
+    "mac_address": (r'(?:[0-9a-fA-F]{2}[:-]){5}[0-9a-fA-F]{2}',
+                    rf'{HEX}{{2}}[:-](?:{HEX}{{2}}[:-]){{4}}{HEX}{{2}}'),
+}
+# (mönster som ska slås ihop, den sammanslagna formen, längd på träffen -> namn)
+HASH_FORM = ({"md5_hash": r'\b[0-9a-fA-F]{32}\b', "sha256_hash": r'\b[0-9a-fA-F]{64}\b'},
+             rf'{HEX}(?<!\w{HEX}){HEX}{{31}}(?:{HEX}{{32}})?\b',
+             {32: "md5_hash", 64: "sha256_hash"})
+
+# Minst ett av tecknen måste finnas i texten för att mönstret ska kunna matcha
+KRAVER_TECKEN = {
+    "email": ('@',),
+    "swe_mobile": ('07',),
+    "html_links": ('href="',),
+    "ipv4": ('.',),
+    "ipv6": (':',),
+    "mac_address": (':', '-'),
+    "windows_path": (':\\',),
+    "linux_path": ('/',),
+}
+
+def bygg_skanners(patterns):
+    """
+    Lista med (kompilerat regex, namn, nödvändiga tecken). namn är antingen mönstrets
+    namn eller en dict längd -> namn för en sammanslagen skanning.
+    """
+    skanners = []
+    original, form, namn_per_langd = HASH_FORM
+    sla_ihop = all(patterns.get(namn) == monster for namn, monster in original.items())
+    if sla_ihop:
+        skanners.append((re.compile(form), namn_per_langd, ()))
+    for namn, monster in patterns.items():
+        if sla_ihop and namn in original:
+            continue
+        snabb = SNABBA_FORMER.get(namn)
+        if snabb and snabb[0] == monster:
+            monster = snabb[1]
+        skanners.append((re.compile(monster), namn, KRAVER_TECKEN.get(namn, ())))
+    return skanners
+
+SKANNERS = bygg_skanners(PATTERNS)
+
+def analysera_text(text):
+    """Samma resultat som re.findall för varje mönster i PATTERNS (utan dubbletter)."""
+    traffar = {namn: set() for namn in PATTERNS}
+    for regex, namn, kraver in SKANNERS:
+        if kraver and not any(tecken in text for tecken in kraver):
+            continue
+        matches = regex.findall(text)
+        # Hantera om regexet har grupper (t.ex. html_links)
+        if matches and isinstance(matches[0], tuple):
+            matches = [m[0] for m in matches]
+        if isinstance(namn, dict):
+            for m in matches:
+                traffar[namn[len(m)]].add(m)
+        else:
+            traffar[namn].update(matches)
+    # Ta bort dubbletter (set) och spara som listor, i samma ordning som PATTERNS
+    return {namn: list(hittade) for namn, hittade in traffar.items()}
+
+# Bevakningslistor med kända IOC:er (se watchlist.py). Laddas om när filerna ändras
+watchlists = WatchlistStore()
+
+# --- RESULTATCACHE ---
+# Samma rapport skickas ofta in många gånger. Resultatet sparas med en hash av texten som
+# nyckel (se resultcache.py), så en likadan text besvaras utan att skannas igen.
+# Nyckeln innehåller också en version av PATTERNS och bevakningslistorna: ändras ett
+# mönster eller en lista blir det nya nycklar och gamla resultat används inte.
+MONSTER_VERSION = hashlib.sha256(jsoncodec.dumpb(list(PATTERNS.items()))).hexdigest()[:16]
+CACHE_BYTES = int(os.environ.get('REGEX_CACHE_BYTES', 64 * 1024 * 1024))
+# Sätt REGEX_CACHE_FILE (t.ex. regexcache.db) för att spara resultaten mellan omstarter
+result_cache = ResultCache(CACHE_BYTES, os.environ.get('REGEX_CACHE_FILE'))
+
+def bevaka(analys, text, listor=None):
+    """Träffarna i bevakningslistorna för en analyserad text, eller None om det inte finns listor."""
+    listor = listor or watchlists.get()
+    if listor is None:
+        return None
+    literal_antal = {}
+    listor.rakna_literaler(text, literal_antal)
+    return listor.rapport(analys, literal_antal)
+
 @regex_bp.route('/', methods=['POST'])
 def analyze():
     data = request.get_json()
@@ -135,21 +254,320 @@ def analyze():
         return jsonify({"error": "Skicka JSON med fältet 'content'"}), 400
     
     text = data['content']
-    results = {}
+    listor = watchlists.get()
+    nyckel = content_key(text, MONSTER_VERSION + (listor.version if listor else ''))
+    svar = result_cache.get(nyckel)
+    # X-Cache: HIT om svaret kom från cachen, MISS om texten skannades
+    cache_status = 'HIT'
+    if svar is None:
+        cache_status = 'MISS'
+        # Alla mönster är kompilerade sedan start, se analysera_text ovan
+        results = analysera_text(text)
 
-    for name, pattern in PATTERNS.items():
-        matches = re.findall(pattern, text)
-        
-        # Hantera om regexet har grupper (t.ex. html_links)
-        if matches and isinstance(matches[0], tuple):
-            matches = [m[0] for m in matches]
-            
-        # Ta bort dubbletter och spara
-        results[name] = list(set(matches))
+        svar = {
+            "status": "success",
+            "analysis": results
+        }
+        # Finns bevakningslistor flaggas träffarna i dem
+        bevakning = bevaka(results, text, listor)
+        if bevakning is not None:
+            svar["watchlist"] = bevakning
+        result_cache.put(nyckel, svar)
+
+    response = jsonify(svar)
+    response.headers['X-Cache'] = cache_status
+    return response
+
+# Hur bra fungerar cachen? Antal träffar/missar, storlek och hur mycket som slängts
+@regex_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+# --- STRÖMMAD ANALYS AV STORA FILER ---
+# /regex/ kräver hela dokumentet som en JSON-sträng: request-bodyn, den avkodade texten
+# och alla träfflistor ligger i minnet samtidigt. /regex/stream läser istället uppladdningen
+# bit för bit (CHUNK_SIZE tecken åt gången) så att minnet inte växer med filens storlek.
+#
+# En träff kan ligga över gränsen mellan två bitar. Därför analyseras bara början av
+# fönstret, de sista OVERLAP tecknen sparas och analyseras igen tillsammans med nästa bit.
+# Några tecken före fönstret (KONTEXT) sparas också, så att \b och (?<!...) ser samma
+# sak som de hade gjort i hela texten. Träffar längre än OVERLAP tecken kan delas.
+CHUNK_SIZE = 1024 * 1024
+OVERLAP = 4096
+KONTEXT = 16
+# Högst så många olika träffar sparas per mönster, resten räknas bara
+MAX_UNIKA = 10000
+
+class StromAnalys:
+    def __init__(self, listor=None):
+        # Bevakningslistorna (Watchlists) som gällde när analysen startade, eller None
+        self.listor = listor
+        self.literal_antal = {}
+        self.traffar = {namn: set() for namn in PATTERNS}
+        self.antal = {namn: 0 for namn in PATTERNS}
+        self.avklippta = set()
+        self.tecken = 0
+        self._buffer = ''
+        # _buffer[0] ligger på position _offset i hela texten, de första _kontext
+        # tecknen är redan analyserade och finns bara med som sammanhang
+        self._offset = 0
+        self._kontext = 0
+        # Där varje skanning får hitta nästa träff (som findall: aldrig inuti förra träffen)
+        self._nasta = [0] * len(SKANNERS)
+        # Ett ord i bevakningslistorna kan vara längre än OVERLAP. Hela ordet och tecknet
+        # efter det måste finnas i bufferten för att \b-kollen ska bli rätt
+        self._overlap = max(OVERLAP, listor.literal_overlap() if listor is not None else 0)
+
+    def mata(self, text):
+        """Lägg till nästa bit av texten och analysera allt som inte längre kan ändras."""
+        self.tecken += len(text)
+        self._buffer += text
+        if len(self._buffer) - self._kontext > self._overlap:
+            self._skanna(len(self._buffer) - self._overlap)
+
+    def avsluta(self):
+        """Analysera resten och returnera resultatet i samma format som analysera_text."""
+        self._skanna(len(self._buffer), sista=True)
+        return {namn: list(hittade) for namn, hittade in self.traffar.items()}
+
+    def _skanna(self, grans, sista=False):
+        # Träffar som BÖRJAR före grans är klara, resten tas i nästa fönster
+        buffer = self._buffer
+        for i, (regex, namn, kraver) in enumerate(SKANNERS):
+            if kraver and not any(tecken in buffer for tecken in kraver):
+                continue
+            # Som findall: har mönstret en grupp (t.ex. html_links) är det gruppen vi vill ha
+            grupp = 1 if regex.groups else 0
+            varden = []
+            slut = None
+            for m in regex.finditer(buffer, max(self._kontext, self._nasta[i] - self._offset)):
+                if m.start() >= grans and not sista:
+                    break
+                varden.append(m[grupp] or '')
+                slut = m.end()
+            if slut is not None:
+                self._nasta[i] = self._offset + slut
+                if isinstance(namn, dict):
+                    for varde in varden:
+                        self._spara(namn[len(varde)], [varde])
+                else:
+                    self._spara(namn, varden)
+        if self.listor is not None:
+            self.listor.rakna_literaler(buffer, self.literal_antal, self._kontext,
+                                        None if sista else grans)
+        # Släng det som är klart, men behåll KONTEXT tecken före gränsen
+        behall = max(grans - KONTEXT, 0)
+        self._buffer = buffer[behall:]
+        self._offset += behall
+        self._kontext = grans - behall
+
+    def _spara(self, namn, varden):
+        self.antal[namn] += len(varden)
+        hittade = self.traffar[namn]
+        if len(hittade) + len(varden) <= MAX_UNIKA:
+            hittade.update(varden)
+            return
+        # Nära taket: lägg till en i taget och sluta när MAX_UNIKA olika har sparats
+        for varde in varden:
+            if varde in hittade:
+                continue
+            if len(hittade) >= MAX_UNIKA:
+                self.avklippta.add(namn)
+                break
+            hittade.add(varde)
+
+def las_bitar(stream, storlek=None):
+    """Läser en binär ström bit för bit och avkodar UTF-8 (även tecken som delats mellan bitarna)."""
+    avkodare = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    while True:
+        data = stream.read(storlek or CHUNK_SIZE)
+        if not data:
+            break
+        yield avkodare.decode(data)
+    yield avkodare.decode(b'', final=True)
+
+# curl -X POST --data-binary @stor.log -H "Content-Type: application/octet-stream" http://127.0.0.1:5000/regex/stream
+# curl -X POST -F file=@stor.log http://127.0.0.1:5000/regex/stream
+@regex_bp.route('/stream', methods=['POST'])
+def analyze_stream():
+    if request.mimetype == 'multipart/form-data':
+        # Werkzeug sparar filen i en temporär fil (på disk när den är stor), vi läser den i bitar
+        uppladdad = request.files.get('file')
+        if uppladdad is None:
+            return jsonify({"error": "Skicka filen i fältet 'file'"}), 400
+        stream = uppladdad.stream
+    else:
+        # Rå body: läs direkt från anslutningen
+        stream = request.stream
+
+    analys = StromAnalys(watchlists.get())
+    for text in las_bitar(stream):
+        analys.mata(text)
+    results = analys.avsluta()
+
+    svar = {
+        "status": "success",
+        "analysis": results,
+        "characters": analys.tecken,
+        # Antal träffar per mönster (med dubbletter) och mönster som nådde MAX_UNIKA
+        "counts": analys.antal,
+        "truncated": sorted(analys.avklippta)
+    }
+    if analys.listor is not None:
+        svar["watchlist"] = analys.listor.rapport(results, analys.literal_antal)
+    return jsonify(svar)
+
+# --- MÅNGA DOKUMENT PÅ EN GÅNG ---
+# Ett fall består ofta av tusentals små filer. Ett anrop per fil till /regex/ använder
+# bara en processorkärna. /regex/batch tar emot alla dokument på en gång och delar upp
+# skanningen på flera PROCESSER (trådar hjälper inte: Pythons GIL låter bara en tråd
+# i taget köra Python-kod, och regex-skanningen håller GIL:en).
+# Antal processer: REGEX_WORKERS, annars en per kärna.
+WORKERS = int(os.environ.get('REGEX_WORKERS', os.cpu_count() or 1))
+MAX_DOKUMENT = 10000
+MAX_DOKUMENT_STORLEK = 50 * 1024 * 1024
+# Högst så mycket (i byte, uppackat) får alla filerna i ett arkiv vara tillsammans. De läses
+# in i minnet, och ett litet arkiv kan packas upp till väldigt mycket ("zip-bomb")
+MAX_TOTAL_STORLEK = 200 * 1024 * 1024
+# Små jobb körs direkt i den här processen, det tar längre tid att skicka dem till en annan
+MIN_TECKEN_FOR_POOL = 256 * 1024
+
+class ForStortError(ValueError):
+    """För många dokument eller för stora filer i anropet. Blir 413 i API:et."""
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Processpoolen startas första gången den behövs och delas sedan av alla anrop."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+        return _pool
+
+def analysera_dokument(innehall):
+    # Körs i en arbetsprocess. Filer från arkiv skickas som bytes och avkodas här,
+    # så att huvudprocessen slipper göra det. Varje process har sina egna bevakningslistor.
+    if isinstance(innehall, bytes):
+        innehall = innehall.decode('utf-8', errors='replace')
+    analys = analysera_text(innehall)
+    return analys, bevaka(analys, innehall)
+
+def _arkivfiler(fil):
+    # (namn, uppackad storlek, funktion som läser filen) för varje fil i arkivet.
+    # Storleken står i arkivets innehållsförteckning, inget packas upp förrän vi läser
+    if zipfile.is_zipfile(fil):
+        fil.seek(0)
+        with zipfile.ZipFile(fil) as arkiv:
+            for info in arkiv.infolist():
+                if not info.is_dir():
+                    # zipfile packar aldrig upp mer än file_size, även om filen ljuger
+                    yield info.filename, info.file_size, lambda info=info: arkiv.read(info)
+        return
+    fil.seek(0)
+    # tarfile gissar själv om arkivet är packat (gz, bz2, xz). Är det inget arkiv alls
+    # kastar den tarfile.TarError
+    with tarfile.open(fileobj=fil) as arkiv:
+        for info in arkiv:
+            if info.isfile():
+                yield info.name, info.size, lambda info=info: arkiv.extractfile(info).read()
+
+def las_arkiv(fil):
+    """
+    (namn, bytes) för varje fil i ett zip- eller tar-arkiv. fil måste gå att söka i (seek).
+    Antalet filer och den sammanlagda storleken räknas under tiden: ForStortError så fort
+    något tak passeras, innan resten av arkivet läses in. (I ett packat tar-arkiv måste
+    tarfile ändå packa upp det som ligger före nästa fil, men det sparas aldrig.)
+    """
+    antal = totalt = 0
+    for namn, storlek, las in _arkivfiler(fil):
+        antal += 1
+        totalt += storlek
+        if antal > MAX_DOKUMENT:
+            raise ForStortError(f"Högst {MAX_DOKUMENT} dokument per anrop")
+        if storlek > MAX_DOKUMENT_STORLEK:
+            raise ForStortError(f"{namn} är större än {MAX_DOKUMENT_STORLEK} byte")
+        if totalt > MAX_TOTAL_STORLEK:
+            raise ForStortError(f"Filerna i arkivet är större än {MAX_TOTAL_STORLEK} byte tillsammans")
+        yield namn, las()
+
+def las_dokument():
+    """Dokumenten i anropet som en lista med (namn, str eller bytes)."""
+    if request.is_json:
+        data = request.get_json()
+        # Antingen {"documents": [...]} eller bara listan
+        if isinstance(data, dict):
+            data = data.get('documents')
+        if not isinstance(data, list):
+            raise ValueError("Skicka JSON med en lista 'documents'")
+        dokument = []
+        for i, dok in enumerate(data):
+            # Ett dokument är en sträng eller {"name": ..., "content": ...}
+            if isinstance(dok, dict) and isinstance(dok.get('content'), str):
+                dokument.append((str(dok.get('name', i)), dok['content']))
+            elif isinstance(dok, str):
+                dokument.append((str(i), dok))
+            else:
+                raise ValueError(f"Dokument {i} saknar 'content'")
+        if len(dokument) > MAX_DOKUMENT:
+            raise ForStortError(f"Högst {MAX_DOKUMENT} dokument per anrop")
+        return dokument
+    # Ett zip/tar-arkiv, som fil i multipart ('file') eller som rå body
+    if request.mimetype == 'multipart/form-data':
+        uppladdad = request.files.get('file')
+        if uppladdad is None:
+            raise ValueError("Skicka arkivet i fältet 'file'")
+        return list(las_arkiv(uppladdad.stream))
+    # Rå body: kopiera till en temporär fil (i minnet om den är liten, annars på disk)
+    # eftersom arkiven behöver kunna hoppa fram och tillbaka i filen
+    with tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024) as fil:
+        shutil.copyfileobj(request.stream, fil)
+        return list(las_arkiv(fil))
+
+def analysera_manga(dokument):
+    """Analysera alla dokument, i processpoolen om det lönar sig. Resultaten i samma ordning."""
+    innehall = [text for _, text in dokument]
+    if WORKERS <= 1 or len(innehall) < 2 or sum(map(len, innehall)) < MIN_TECKEN_FOR_POOL:
+        return [analysera_dokument(text) for text in innehall]
+    # chunksize: skicka flera dokument per paket till processerna (färre, större överföringar)
+    chunksize = max(1, len(innehall) // (WORKERS * 4))
+    return list(get_pool().map(analysera_dokument, innehall, chunksize=chunksize))
+
+# POST JSON: {"documents": [{"name": "a.log", "content": "..."}, "bara text", ...]}
+# curl -X POST -F file=@fall.zip http://127.0.0.1:5000/regex/batch
+# curl -X POST --data-binary @fall.tar.gz -H "Content-Type: application/gzip" http://127.0.0.1:5000/regex/batch
+@regex_bp.route('/batch', methods=['POST'])
+def analyze_batch():
+    try:
+        dokument = las_dokument()
+    except ForStortError as e:
+        return jsonify({"error": str(e)}), 413 # Payload Too Large
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({"error": f"Kunde inte läsa dokumenten: {e}"}), 400
+    except tarfile.TarError:
+        return jsonify({"error": "Kunde inte läsa dokumenten: skicka JSON, ett zip- eller ett tar-arkiv"}), 400
+
+    resultat = analysera_manga(dokument)
+
+    # Sammanfattning: alla träffar från alla dokument, utan dubbletter
+    sammanfattning = {namn: set() for namn in PATTERNS}
+    for analys, _ in resultat:
+        for namn, traffar in analys.items():
+            sammanfattning[namn].update(traffar)
+
+    dokument_svar = []
+    for (namn, _), (analys, bevakning) in zip(dokument, resultat):
+        dok = {"name": namn, "analysis": analys}
+        if bevakning is not None:
+            dok["watchlist"] = bevakning
+        dokument_svar.append(dok)
 
     return jsonify({
         "status": "success",
-        "analysis": results
+        "count": len(dokument),
+        "documents": dokument_svar,
+        "summary": {namn: list(traffar) for namn, traffar in sammanfattning.items()}
     })
 
 """
@@ -0,0 +1,49 @@
+# --- ÄNDRINGSFLÖDE (change feed) ---
+#myblueprints/repositories/changefeed.py
+# Samlar repositoryts ändringar i en numrerad kö så att klienter kan fråga
+# "vad har hänt sedan nummer 41?" och bara få de nya ändringarna, istället för att
+# hämta hela listan igen. Används av /api/v7/friends/changes (Server-Sent Events).
+#
+# Varje händelse är (seq, op, friend_id, friend) där seq räknas upp med 1 per ändring.
+# Bara de senaste MAX_EVENTS sparas (en ringbuffert). Frågar någon efter något äldre
+# än så (eller ett nummer från före en omstart) får den istället svaret "ladda om allt".
+import threading
+from collections import deque
+from itertools import islice
+
+MAX_EVENTS = 1000
+
+class FriendChangeFeed:
+    def __init__(self, repo, max_events=MAX_EVENTS):
+        self._events = deque(maxlen=max_events)
+        self.seq = 0
+        # Condition = lås + möjlighet att vänta tills någon säger "nu har det hänt något"
+        self._changed = threading.Condition()
+        repo.subscribe(self._on_change)
+
+    def _on_change(self, op, friend_id, friend):
+        # Körs under repositoryts lås: bara en kopia och en append, inget annat
+        if op in ('add', 'update'):
+            # Samma dict går till alla prenumeranter, så vi sparar en egen kopia
+            friend = dict(friend)
+        else:
+            friend = None
+        with self._changed:
+            self.seq += 1
+            self._events.append((self.seq, op, friend_id, friend))
+            self._changed.notify_all()
+
+    def events_since(self, since, timeout=None):
+        """
+        Returnerar (händelser, senaste_seq) för allt efter since.
+        Finns inga nya händelser väntar vi upp till timeout sekunder på nästa.
+        händelser är None om since är för gammal (eller okänd): klienten får ladda om allt.
+        """
+        with self._changed:
+            if since == self.seq and timeout:
+                self._changed.wait(timeout)
+            oldest = self._events[0][0] if self._events else self.seq + 1
+            if since > self.seq or since < oldest - 1:
+                return None, self.seq
+            # seq är obrutna, så positionen i kön kan räknas ut direkt
+            return list(islice(self._events, since - oldest + 1, None)), self.seq
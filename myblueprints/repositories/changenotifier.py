@@ -0,0 +1,20 @@
+# --- NOTISER VID ÄNDRINGAR ---
+#myblueprints/repositories/changenotifier.py
+# Ett repository kan tala om för andra delar av appen (t.ex. sökindexet) att något ändrats.
+# Den som vill veta registrerar en funktion med subscribe(). Funktionen anropas med
+#   (op, friend_id, friend)   där op är 'add', 'update', 'delete' eller 'reset'
+# 'reset' betyder "allt kan ha ändrats" (t.ex. friends.json skrevs om av en annan version).
+#
+# OBS: anropet sker medan repositoryt håller sitt lås. Lyssnaren ska vara snabb och får inte
+# själv anropa repositoryt (då kan två trådar låsa varandra).
+
+class ChangeNotifier:
+    def subscribe(self, listener):
+        # Skapas här istället för i __init__ så att klassen kan blandas in var som helst
+        if not hasattr(self, '_listeners'):
+            self._listeners = []
+        self._listeners.append(listener)
+
+    def _notify(self, op, friend_id=None, friend=None):
+        for listener in getattr(self, '_listeners', ()):
+            listener(op, friend_id, friend)
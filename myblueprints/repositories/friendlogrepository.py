@@ -0,0 +1,248 @@
+# --- REPOSITORY MED LOGG (append-only) ---
+#myblueprints/repositories/friendlogrepository.py
+# Samma gränssnitt som FriendRepository, men varje ändring skrivs som EN rad sist i en
+# loggfil istället för att hela friends.json skrivs om. Då kostar en skrivning lika mycket
+# oavsett hur många vänner vi har.
+#
+# friends.json       -> snapshot (ögonblicksbild) av alla vänner
+# friends.json.log   -> en JSON-rad per ändring sedan senaste snapshot, t.ex.
+#                       {"op": "add", "friend": {...}}
+#                       {"op": "update", "id": 1, "updates": {...}}
+#                       {"op": "delete", "id": 1}
+# Vid start läses snapshot och sedan spelas loggen upp ovanpå den. När loggen blivit lång
+# "komprimeras" den i en bakgrundstråd: allt skrivs till en ny snapshot och loggen töms.
+#
+# Varje post kontrolleras (_check_record) INNAN den skrivs, så att loggen aldrig innehåller
+# något som inte går att spela upp. Hittas ändå en sådan rad vid start (t.ex. från en äldre
+# version) flyttas den till friends.json.log.rejected istället för att stoppa uppstarten.
+import os
+import shutil
+import threading
+
+from .. import jsoncodec
+from .friendrepository import FriendConflictError, FriendRepository, check_friend, is_friend_id, without_id
+
+class FriendLogRepository(FriendRepository):
+    def __init__(self, file_path, log_path=None, compact_after=1000):
+        super().__init__(file_path, cache=True)
+        self.log_path = log_path or file_path + '.log'
+        # Loggen under pågående komprimering (flyttas hit innan ny snapshot skrivs)
+        self.old_log_path = self.log_path + '.old'
+        # Rader som inte gick att spela upp (karantän)
+        self.rejected_path = self.log_path + '.rejected'
+        self.compact_after = compact_after
+        self._log_records = 0
+        self._compactor = None
+        self._recover()
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+
+    # --- Uppstart / återställning ---
+
+    def _recover(self):
+        self._set_cache(self._iter_file())
+        # Om vi kraschade mitt i en komprimering finns den gamla loggen kvar.
+        # Att spela upp den igen är ofarligt: add/update/delete ger samma resultat två gånger.
+        interrupted = os.path.exists(self.old_log_path)
+        rejected = []
+        if interrupted:
+            self._replay(self.old_log_path, rejected)
+        if os.path.exists(self.log_path):
+            self._log_records = self._replay(self.log_path, rejected)
+        if rejected:
+            with open(self.rejected_path, 'ab') as f:
+                f.writelines(rejected)
+                f.flush()
+                os.fsync(f.fileno())
+        if interrupted or rejected:
+            # Gör klart den avbrutna komprimeringen (eller bli av med de kasserade raderna)
+            # innan vi tar emot nya skrivningar: ny snapshot och tom logg
+            done_logs = [path for path in (self.old_log_path, self.log_path) if os.path.exists(path)]
+            self._write_snapshot(self._table, done_logs)
+            self._log_records = 0
+
+    def _replay(self, path, rejected):
+        """Spelar upp loggen i path. Rader som inte går att tillämpa läggs i rejected."""
+        count = 0
+        good_offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                # En rad utan radbrytning betyder att vi dog mitt i en skrivning.
+                # Den sista halva raden kastas.
+                if not line.endswith(b'\n'):
+                    break
+                good_offset += len(line)
+                try:
+                    record = jsoncodec.loads(line)
+                    self._check_record(record)
+                except ValueError:
+                    # En hel rad som ändå inte går att använda: hoppa över den, resten gäller
+                    rejected.append(line)
+                    continue
+                self._apply(record)
+                count += 1
+        if good_offset != os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(good_offset)
+        return count
+
+    @staticmethod
+    def _check_record(record):
+        """Kastar ValueError om posten inte går att tillämpa med _apply."""
+        if not isinstance(record, dict):
+            raise ValueError("log record must be an object")
+        op = record.get('op')
+        if op == 'add':
+            check_friend(record.get('friend'))
+        elif op in ('update', 'delete'):
+            if not is_friend_id(record.get('id')):
+                raise ValueError("id must be an integer")
+            if op == 'update' and not isinstance(record.get('updates'), dict):
+                raise ValueError("updates must be an object")
+        else:
+            raise ValueError(f"unknown op: {op}")
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'add':
+            self._index_add(record['friend'])
+        elif op == 'update':
+            self._index_update(record['id'], record['updates'])
+        elif op == 'delete':
+            self._index_remove(record['id'])
+
+    # --- Skrivning ---
+
+    def _append(self, records):
+        # Kontrollera allt först: en post som skrivits men inte går att tillämpa skulle
+        # ligga kvar i loggen och stoppa nästa uppstart
+        for record in records:
+            self._check_record(record)
+        # En write + fsync per anrop, oavsett hur stor datamängden är
+        self._log_file.write(''.join(jsoncodec.dumps(r) + '\n' for r in records))
+        self._log_file.flush()
+        os.fsync(self._log_file.fileno())
+        # Först när raden ligger på disk ändrar vi minnet (samma kod som vid uppspelning)
+        for record in records:
+            self._apply(record)
+        self._log_records += len(records)
+        if self._log_records >= self.compact_after:
+            self._start_compaction()
+
+    # --- Komprimering ---
+
+    def _start_compaction(self):
+        if self._compactor and self._compactor.is_alive():
+            return
+        # Byt logg under låset: nya skrivningar hamnar i en tom logg medan snapshot skrivs
+        self._log_file.close()
+        if os.path.exists(self.old_log_path):
+            # Förra komprimeringen misslyckades och dess logg finns kvar. Den får inte skrivas
+            # över (ändringarna finns inte i någon snapshot), så loggen läggs sist i den.
+            # Dör vi mitt i spelas raderna upp två gånger vid start, vilket är ofarligt.
+            self._merge_into_old_log()
+        else:
+            os.replace(self.log_path, self.old_log_path)
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+        self._log_records = 0
+        # En kopia av kolumnerna (några få stora arrayer, inga dicts), som tråden skriver
+        # medan tabellen fortsätter att ändras
+        snapshot = self._table.snapshot()
+        self._compactor = threading.Thread(target=self._write_snapshot, args=(snapshot, [self.old_log_path]),
+                                           daemon=True)
+        self._compactor.start()
+
+    def _merge_into_old_log(self):
+        with open(self.log_path, 'rb') as src, open(self.old_log_path, 'ab') as dst:
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.log_path)
+
+    def _write_snapshot(self, table, done_logs):
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            jsoncodec.dump_items(table.rows(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        # os.replace är atomiskt: antingen gamla eller nya snapshot, aldrig en halv fil
+        os.replace(tmp_path, self.file_path)
+        # Allt i loggarna finns nu i snapshoten
+        for path in done_logs:
+            os.remove(path)
+
+    def compact(self):
+        """Komprimerar direkt och väntar tills den nya snapshoten är skriven."""
+        with self._lock:
+            if self._compactor:
+                self._compactor.join()
+            self._start_compaction()
+            compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def close(self):
+        with self._lock:
+            if self._compactor:
+                self._compactor.join()
+            self._log_file.close()
+
+    # --- Samma API som FriendRepository ---
+    # get_all, get_page, get_by_id, get_by_email och get_by_status ärvs: de läser indexen.
+
+    def _refresh(self):
+        # Allt finns redan i minnet, snapshot-filen ska aldrig läsas om här
+        pass
+
+    # Id och e-post kontrolleras innan något skrivs till loggen (samma regler som i FriendRepository)
+
+    def add(self, friend_dict):
+        check_friend(friend_dict)
+        with self._lock:
+            self._check_new_ids([friend_dict['id']])
+            self._check_emails({friend_dict['id']: friend_dict.get('email')})
+            self._append([{"op": "add", "friend": friend_dict}])
+            return friend_dict
+
+    def update(self, friend_id, updates):
+        with self._lock:
+            if friend_id not in self._table:
+                return None
+            if 'email' in updates:
+                self._check_emails({friend_id: updates['email']})
+            self._append([{"op": "update", "id": friend_id, "updates": without_id(updates)}])
+            return self._table.get(friend_id)
+
+    def delete(self, friend_id):
+        with self._lock:
+            if friend_id not in self._table:
+                return False
+            self._append([{"op": "delete", "id": friend_id}])
+            return True
+
+    def add_many(self, friends):
+        for friend in friends:
+            check_friend(friend)
+        new_emails = {friend['id']: friend.get('email') for friend in friends}
+        if len(new_emails) != len(friends):
+            raise FriendConflictError("The same id appears more than once.")
+        with self._lock:
+            self._check_new_ids(new_emails)
+            self._check_emails(new_emails)
+            self._append([{"op": "add", "friend": friend} for friend in friends])
+            return friends
+
+    def update_many(self, updates_by_id):
+        with self._lock:
+            records = [{"op": "update", "id": friend_id, "updates": without_id(updates)}
+                       for friend_id, updates in updates_by_id.items() if friend_id in self._table]
+            self._check_emails({r['id']: r['updates']['email'] for r in records if 'email' in r['updates']})
+            if records:
+                self._append(records)
+            return [self._table.get(r['id']) for r in records]
+
+    def delete_many(self, friend_ids):
+        with self._lock:
+            deleted = [friend_id for friend_id in dict.fromkeys(friend_ids) if friend_id in self._table]
+            if deleted:
+                self._append([{"op": "delete", "id": friend_id} for friend_id in deleted])
+            return deleted
@@ -0,0 +1,456 @@
+# --- KOMPAKT LAGRING AV VÄNNER I MINNET ---
+#myblueprints/repositories/friendrecord.py
+# En vanlig dict kostar flera hundra byte per vän: hashtabellen, nycklarna, och en egen
+# str/int för varje värde. Med en miljon vänner blir det gigabyte. FriendTable lagrar
+# istället vännerna i KOLUMNER (en array per fält), sorterade på id:
+#
+#   ids        array('q')   1, 2, 5, ...          (8 byte per vän, ingen int per vän)
+#   versions   array('q')   version per vän (för ETag)
+#   name/email offset + längd in i EN gemensam bytearray (_blob) med all text som UTF-8
+#   status     array('i')   en kod per vän. Själva värdena ("Kompis", "Awesome", ...)
+#              finns bara en gång, i _status_values ("dictionary encoding")
+#
+# Det som inte passar i kolumnerna (namn som inte är en sträng, egna nycklar från v2/v3
+# o.s.v.) sparas i _other, en vanlig dict men bara för de vänner som har något sådant.
+#
+# Indexen är också arrayer: e-post som sorterad array med hash-värden (+ id), och per
+# status en sorterad array med id. Allt som lämnar tabellen är vanliga dicts (row/get) -
+# de skapas först när de behövs, precis innan det blir JSON.
+#
+# En ändring skriver den nya texten sist i _blob och pekar om offset. Den gamla texten blir
+# skräp, och när mer än hälften av _blob är skräp packas den om.
+#
+# Priset för det lilla minnet: kolumnerna är sorterade arrayer, så en NY vän (eller en
+# borttagen) flyttar alla efterföljande element i varje kolumn och index (array.insert/del,
+# O(n) per skrivning). En miljon vänner är några millisekunder per add/delete. En ändring
+# av en befintlig vän skriver bara om dess platser (men flyttar i e-post/status-indexen).
+import bisect
+from array import array
+from itertools import islice
+
+FIELDS = ('id', 'name', 'email', 'status')
+_FIELD_SET = frozenset(FIELDS)
+TEXT_FIELDS = ('name', 'email')
+
+# Specialvärden i längd-kolumnerna (och i status-kolumnen)
+_MISSING = -1  # fältet finns inte alls
+_NULL = -2     # fältet finns men är null (None)
+_OTHER = -3    # värdet är inte en sträng (eller inte giltig UTF-8), det ligger i _other
+
+# _blob packas om när mer än hälften är skräp och den är större än så här
+COMPACT_MIN_BYTES = 1 << 20
+
+def _utf8(value):
+    # Texten som UTF-8, eller None om värdet inte är en sträng (eller innehåller ensamma
+    # surrogattecken som "\ud800", som JSON tillåter men UTF-8 inte)
+    if type(value) is not str:
+        return None
+    try:
+        return value.encode('utf-8')
+    except UnicodeEncodeError:
+        return None
+
+def _status_key(value):
+    # True och 1 (och 1.0) är samma nyckel i en dict, typen håller isär dem
+    return (type(value), value)
+
+class FriendTable:
+    def __init__(self, email_key):
+        # email_key: funktion som normaliserar en e-post (samma som repositoryts e-postindex)
+        self._email_key = email_key
+        self.ids = array('q')
+        self.versions = array('q')
+        self._offsets = {field: array('q') for field in TEXT_FIELDS}
+        self._lengths = {field: array('i') for field in TEXT_FIELDS}
+        self._blob = bytearray()
+        self._garbage = 0
+        self._status = array('i')
+        self._status_values = []
+        self._status_codes = {}
+        self._other = {}
+        # Index: (hash av normaliserad e-post, id) sorterat, och status-kod -> sorterade id
+        self._email_hashes = array('q')
+        self._email_ids = array('q')
+        self._status_ids = {}
+
+    @classmethod
+    def from_dicts(cls, friends, email_key, version):
+        """
+        Bygger en tabell av dicts (samma id två gånger: den sista gäller). friends kan vara
+        en generator (se jsoncodec.iter_file): varje vän läggs in i kolumnerna direkt och
+        behövs sedan inte mer, så hela listan med dicts behöver aldrig finnas i minnet.
+        """
+        table = cls(email_key)
+        # Samma sak som put() för varje vän, men utskrivet här: vid start med en miljon vänner
+        # märks varje funktionsanrop. Vännerna läggs sist i den ordning de kommer och
+        # sorteras på id efteråt (en fil som skrivits av oss är redan sorterad).
+        blob = table._blob
+        ids, status = table.ids, table._status
+        text_columns = [(field, table._offsets[field], table._lengths[field]) for field in TEXT_FIELDS]
+        # Hash av normaliserad e-post per plats, och om platsen har någon e-post alls
+        email_hashes, has_email = array('q'), bytearray()
+        other_by_pos = {}
+        for pos, friend in enumerate(friends):
+            friend_id = friend['id']
+            if type(friend_id) is not int or not -2 ** 63 <= friend_id < 2 ** 63:
+                raise ValueError(f"id must be a 64-bit integer: {friend_id!r}")
+            ids.append(friend_id)
+            if friend.keys() <= _FIELD_SET:
+                other = {}
+            else:
+                other = {key: value for key, value in friend.items() if key not in FIELDS}
+            for field, offsets, lengths in text_columns:
+                value = friend.get(field)
+                data = _utf8(value)
+                if data is not None:
+                    offsets.append(len(blob))
+                    lengths.append(len(data))
+                    blob += data
+                else:
+                    offsets.append(0)
+                    if field not in friend:
+                        lengths.append(_MISSING)
+                    elif value is None:
+                        lengths.append(_NULL)
+                    else:
+                        other[field] = value
+                        lengths.append(_OTHER)
+            status.append(table._encode_status(friend, other))
+            email = friend.get('email')
+            email_hashes.append(hash(email_key(email)) if email is not None else 0)
+            has_email.append(email is not None)
+            if other:
+                other_by_pos[pos] = other
+        order = table._sort_by_id()
+        if order is not None:
+            email_hashes = array('q', [email_hashes[pos] for pos in order])
+            has_email = bytearray(has_email[pos] for pos in order)
+            other_by_pos = {new: other_by_pos[old] for new, old in enumerate(order) if old in other_by_pos}
+        table._other = {table.ids[pos]: other for pos, other in other_by_pos.items()}
+        table.versions = array('q', [version]) * len(table.ids)
+        for pos, code in enumerate(table._status):
+            if code >= 0 and table._status_values[code] is not None:
+                if code not in table._status_ids:
+                    table._status_ids[code] = array('q')
+                table._status_ids[code].append(table.ids[pos])
+        # Sortera på hash-värdet. sort är stabil, så lika hash-värden behåller id-ordningen.
+        by_hash = sorted((pos for pos in range(len(table.ids)) if has_email[pos]), key=email_hashes.__getitem__)
+        table._email_hashes = array('q', [email_hashes[pos] for pos in by_hash])
+        table._email_ids = array('q', [table.ids[pos] for pos in by_hash])
+        return table
+
+    def _sort_by_id(self):
+        """
+        Sorterar kolumnerna på id och tar bort dubbletter (den sista gäller). Returnerar
+        None om de redan var sorterade, annars de gamla platserna i den nya ordningen.
+        """
+        ids = self.ids
+        if all(a < b for a, b in zip(ids, islice(ids, 1, None))):
+            return None
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        # Lika id ligger bredvid varandra i ankomstordning: behåll den sista av dem
+        order = [pos for i, pos in enumerate(order) if i + 1 == len(order) or ids[order[i + 1]] != ids[pos]]
+        kept = set(order)
+        for pos in range(len(ids)):
+            if pos not in kept:
+                self._release(pos)
+        self.ids = array('q', [ids[pos] for pos in order])
+        for field in TEXT_FIELDS:
+            self._offsets[field] = array('q', [self._offsets[field][pos] for pos in order])
+            self._lengths[field] = array('i', [self._lengths[field][pos] for pos in order])
+        self._status = array('i', [self._status[pos] for pos in order])
+        return order
+
+    def keep_versions(self, old):
+        """Vänner som ser exakt likadana ut i tabellen old behåller sin version därifrån."""
+        if not len(old):
+            return
+        for pos, friend_id in enumerate(self.ids):
+            old_pos = old.position(friend_id)
+            if old_pos is not None and self._raw(pos) == old._raw(old_pos):
+                self.versions[pos] = old.versions[old_pos]
+
+    def _raw(self, pos):
+        # Vännens värden utan att avkoda texten (billigare än att jämföra row())
+        raw = []
+        for field in TEXT_FIELDS:
+            length = self._lengths[field][pos]
+            start = self._offsets[field][pos]
+            raw.append(self._blob[start:start + length] if length >= 0 else length)
+        code = self._status[pos]
+        raw.append(_status_key(self._status_values[code]) if code >= 0 else code)
+        raw.append(self._other.get(self.ids[pos]))
+        return raw
+
+    def snapshot(self):
+        """En kopia av kolumnerna (utan index) som går att läsa med rows() medan tabellen ändras."""
+        copy = FriendTable(self._email_key)
+        copy.ids, copy.versions = self.ids[:], self.versions[:]
+        copy._offsets = {field: column[:] for field, column in self._offsets.items()}
+        copy._lengths = {field: column[:] for field, column in self._lengths.items()}
+        copy._blob = bytes(self._blob)
+        copy._status, copy._status_values = self._status[:], self._status_values[:]
+        # Dictarna i _other byts ut (aldrig ändras) när en vän ändras, så en grund kopia räcker
+        copy._other = dict(self._other)
+        return copy
+
+    # --- Läsa ---
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, friend_id):
+        return self.position(friend_id) is not None
+
+    def position(self, friend_id):
+        """Vännens plats i kolumnerna, eller None."""
+        if type(friend_id) is not int:
+            return None
+        pos = bisect.bisect_left(self.ids, friend_id)
+        return pos if pos < len(self.ids) and self.ids[pos] == friend_id else None
+
+    def get(self, friend_id):
+        pos = self.position(friend_id)
+        return self.row(pos) if pos is not None else None
+
+    def row(self, pos):
+        """Vännen på plats pos som en vanlig dict (samma nycklar och värden som sparades)."""
+        friend_id = self.ids[pos]
+        friend = {'id': friend_id}
+        other = self._other.get(friend_id)
+        for field in TEXT_FIELDS:
+            length = self._lengths[field][pos]
+            if length >= 0:
+                start = self._offsets[field][pos]
+                friend[field] = self._blob[start:start + length].decode()
+            elif length == _NULL:
+                friend[field] = None
+            elif length == _OTHER:
+                friend[field] = other[field]
+        code = self._status[pos]
+        if code >= 0:
+            friend['status'] = self._status_values[code]
+        elif code == _OTHER:
+            friend['status'] = other['status']
+        if other:
+            for key, value in other.items():
+                if key not in FIELDS:
+                    friend[key] = value
+        return friend
+
+    def rows(self):
+        """Alla vänner som dicts, i id-ordning (används när hela filen skrivs)."""
+        # Samma sak som row() för varje plats, men de vanliga vännerna (namn, e-post och
+        # status, inget annat) byggs direkt ur kolumnerna utan ett metodanrop per vän
+        blob, other, values = self._blob, self._other, self._status_values
+        columns = zip(range(len(self.ids)), self.ids, self._offsets['name'], self._lengths['name'],
+                      self._offsets['email'], self._lengths['email'], self._status)
+        for pos, friend_id, name_start, name_length, email_start, email_length, code in columns:
+            if name_length >= 0 and email_length >= 0 and code >= 0 and friend_id not in other:
+                yield {'id': friend_id, 'name': blob[name_start:name_start + name_length].decode(),
+                       'email': blob[email_start:email_start + email_length].decode(),
+                       'status': values[code]}
+            else:
+                yield self.row(pos)
+
+    def _text(self, pos, field):
+        # Ett enda fält, utan att bygga hela dicten. None om fältet saknas eller är null.
+        length = self._lengths[field][pos]
+        if length >= 0:
+            start = self._offsets[field][pos]
+            return self._blob[start:start + length].decode()
+        if length == _OTHER:
+            return self._other[self.ids[pos]][field]
+        return None
+
+    def email_owners(self, email):
+        """Alla id (i id-ordning) vars e-post är samma som email efter normalisering."""
+        key = self._email_key(email)
+        h = hash(key)
+        owners = []
+        i = bisect.bisect_left(self._email_hashes, h)
+        while i < len(self._email_hashes) and self._email_hashes[i] == h:
+            friend_id = self._email_ids[i]
+            # Samma hash betyder nästan alltid samma e-post, men kontrollera
+            if self._index_email_of(self.position(friend_id)) == key:
+                owners.append(friend_id)
+            i += 1
+        return owners
+
+    def email_owner(self, email):
+        owners = self.email_owners(email)
+        return owners[0] if owners else None
+
+    def status_ids(self, status):
+        """Sorterad array med id för alla vänner med exakt denna status."""
+        try:
+            code = self._status_codes.get(_status_key(status))
+        except TypeError:
+            return ()
+        return self._status_ids.get(code, ())
+
+    # --- Skriva ---
+
+    def put(self, friend, version):
+        """Lägger till vännen, eller ersätter den som har samma id."""
+        friend_id = friend['id']
+        pos = bisect.bisect_left(self.ids, friend_id)
+        if pos < len(self.ids) and self.ids[pos] == friend_id:
+            self._unindex(pos)
+            self._release(pos)
+            self.versions[pos] = version
+            for column, value in zip(self._columns(), self._encode_friend(friend)):
+                column[pos] = value
+        else:
+            self.ids.insert(pos, friend_id)
+            self.versions.insert(pos, version)
+            for column, value in zip(self._columns(), self._encode_friend(friend)):
+                column.insert(pos, value)
+        self._index(pos)
+        self._maybe_compact()
+
+    def update(self, friend_id, updates, version):
+        """Ändrar fälten i updates. Returnerar den nya dicten, eller None om vännen inte finns."""
+        pos = self.position(friend_id)
+        if pos is None:
+            return None
+        friend = self.row(pos)
+        friend.update(updates)
+        friend['id'] = friend_id
+        self.put(friend, version)
+        return friend
+
+    def remove(self, friend_id):
+        """Tar bort vännen. Returnerar den borttagna dicten, eller None."""
+        pos = self.position(friend_id)
+        if pos is None:
+            return None
+        friend = self.row(pos)
+        self._unindex(pos)
+        self._release(pos)
+        self._other.pop(friend_id, None)
+        del self.ids[pos]
+        del self.versions[pos]
+        for column in self._columns():
+            del column[pos]
+        self._maybe_compact()
+        return friend
+
+    def version(self, friend_id):
+        pos = self.position(friend_id)
+        return self.versions[pos] if pos is not None else None
+
+    # --- Kolumnerna ---
+
+    def _encode(self, friend, other):
+        # Returnerar värdena för kolumnerna (name_offset, name_length, email_offset, email_length, status)
+        values = []
+        for field in TEXT_FIELDS:
+            if field not in friend:
+                values += (0, _MISSING)
+                continue
+            value = friend[field]
+            data = _utf8(value)
+            if value is None:
+                values += (0, _NULL)
+            elif data is not None:
+                values += (len(self._blob), len(data))
+                self._blob += data
+            else:
+                other[field] = value
+                values += (0, _OTHER)
+        values.append(self._encode_status(friend, other))
+        return values
+
+    def _encode_status(self, friend, other):
+        if 'status' not in friend:
+            return _MISSING
+        value = friend['status']
+        try:
+            key = _status_key(value)
+            code = self._status_codes.get(key)
+        except TypeError:
+            # Listor och dicts går inte att använda som nyckel
+            other['status'] = value
+            return _OTHER
+        if code is None:
+            code = self._status_codes[key] = len(self._status_values)
+            self._status_values.append(value)
+        return code
+
+    def _columns(self):
+        return (self._offsets['name'], self._lengths['name'], self._offsets['email'],
+                self._lengths['email'], self._status)
+
+    def _encode_friend(self, friend):
+        # Kolumnvärdena för vännen. Det som inte får plats i kolumnerna hamnar i _other
+        # (en ny dict varje gång, så att snapshot() kan dela de gamla).
+        other = {key: value for key, value in friend.items() if key not in FIELDS}
+        values = self._encode(friend, other)
+        if other:
+            self._other[friend['id']] = other
+        else:
+            self._other.pop(friend['id'], None)
+        return values
+
+    def _release(self, pos):
+        for field in TEXT_FIELDS:
+            self._garbage += max(self._lengths[field][pos], 0)
+
+    def _maybe_compact(self):
+        if self._garbage * 2 <= len(self._blob) or len(self._blob) < COMPACT_MIN_BYTES:
+            return
+        blob = bytearray()
+        for field in TEXT_FIELDS:
+            offsets, lengths = self._offsets[field], self._lengths[field]
+            for pos in range(len(offsets)):
+                if lengths[pos] > 0:
+                    start = offsets[pos]
+                    offsets[pos] = len(blob)
+                    blob += self._blob[start:start + lengths[pos]]
+        self._blob = blob
+        self._garbage = 0
+
+    # --- Indexen ---
+
+    def _index_email_of(self, pos):
+        email = self._text(pos, 'email')
+        return None if email is None else self._email_key(email)
+
+    def _index_status(self, pos):
+        code = self._status[pos]
+        if code >= 0 and self._status_values[code] is not None:
+            ids = self._status_ids.get(code)
+            if ids is None:
+                ids = self._status_ids[code] = array('q')
+            bisect.insort(ids, self.ids[pos])
+
+    def _index(self, pos):
+        friend_id = self.ids[pos]
+        email = self._index_email_of(pos)
+        if email is not None:
+            h = hash(email)
+            # Bland lika hash-värden ligger id:na i ordning
+            lo = bisect.bisect_left(self._email_hashes, h)
+            hi = bisect.bisect_right(self._email_hashes, h)
+            i = lo + bisect.bisect_left(self._email_ids[lo:hi], friend_id)
+            self._email_hashes.insert(i, h)
+            self._email_ids.insert(i, friend_id)
+        self._index_status(pos)
+
+    def _unindex(self, pos):
+        friend_id = self.ids[pos]
+        email = self._index_email_of(pos)
+        if email is not None:
+            h = hash(email)
+            i = bisect.bisect_left(self._email_hashes, h)
+            while self._email_ids[i] != friend_id:
+                i += 1
+            del self._email_hashes[i]
+            del self._email_ids[i]
+        code = self._status[pos]
+        ids = self._status_ids.get(code)
+        if ids is not None:
+            del ids[bisect.bisect_left(ids, friend_id)]
+            if not ids:
+                del self._status_ids[code]
@@ -1,52 +1,462 @@
 # --- REPOSITORY KLASS ---
 #myblueprints/repositories/friendrepository.py
 # Denna klass sköter all kontakt med JSON-filen
-import json
+import bisect
+import logging
 import os
-class FriendRepository:
-    def __init__(self, file_path):
+import threading
+import time
+
+from .. import jsoncodec
+from .changenotifier import ChangeNotifier
+from .friendrecord import FriendTable
+
+logger = logging.getLogger(__name__)
+
+def normalize_email(email):
+    # Samma e-post oavsett versaler/mellanslag: " Harvey@Law.com" == "harvey@law.com"
+    return str(email).strip().lower()
+
+def is_friend_id(value):
+    # Indexen sorterar och slår upp vänner på id, så id måste vara ett heltal som ryms i
+    # 64 bitar (cachen lagrar id:na i en array, se friendrecord.py).
+    # bool räknas inte fast det är en sorts int i Python (True == 1).
+    return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+
+def check_friend(friend):
+    """Kastar ValueError om vännen inte går att spara (måste vara en dict med heltals-id)."""
+    if not isinstance(friend, dict) or not is_friend_id(friend.get('id')):
+        raise ValueError("id must be an integer")
+
+def save_rejected(file_path, friends):
+    """Lägger vännerna (en JSON-rad var) sist i file_path + '.rejected' och varnar i loggen."""
+    rejected_path = file_path + '.rejected'
+    with open(rejected_path, 'ab') as f:
+        f.writelines(jsoncodec.dumpb(friend) + b'\n' for friend in friends)
+    logger.warning("%d friend(s) in %s without a valid integer id were skipped and saved in %s",
+                   len(friends), file_path, rejected_path)
+
+def without_id(updates):
+    # En vän byter aldrig id: id:t i URL:en gäller, ett id bland ändringarna ignoreras.
+    # Annars skulle vännen flytta utan att indexen (som bygger på id) hängde med.
+    return {key: value for key, value in updates.items() if key != 'id'}
+
+# Signaturen när filen inte finns. Ett eget värde (inte None, som betyder "okänd, läs om")
+# så att en saknad fil inte läses om, och ger ny version och 'reset', vid varje anrop.
+MISSING_FILE = 'missing'
+
+class FriendConflictError(Exception):
+    """Ändringen skulle ge två vänner samma e-post (eller samma id). Blir 409 i API:et."""
+
+def find_email_conflict(email_owners, new_emails):
+    """
+    email_owners: funktion, normaliserad e-post -> de id som har den just nu.
+    new_emails: {id: ny e-post} för vännerna som läggs till eller ändras.
+    Returnerar en e-post som skulle hamna hos två vänner, eller None.
+    En e-post som en annan vän har just nu räknas som upptagen, även om den vännen byter
+    i samma anrop (samma regel som det unika indexet i SQLite).
+    """
+    claimed = {}
+    for friend_id, email in new_emails.items():
+        if email is None:
+            continue
+        email = normalize_email(email)
+        if claimed.setdefault(email, friend_id) != friend_id:
+            return email
+        if any(owner != friend_id for owner in email_owners(email)):
+            return email
+    return None
+
+def check_unique_emails(email_owners, new_emails):
+    email = find_email_conflict(email_owners, new_emails)
+    if email is not None:
+        raise FriendConflictError(f"Email {email} already exists.")
+
+def matches_filters(friend, filters):
+    # Likhetsfilter, t.ex. {"status": "Kompis"}. E-post jämförs normaliserad (som i e-postindexet).
+    for key, value in filters.items():
+        actual = friend.get(key)
+        if key == 'email' and actual is not None:
+            if normalize_email(actual) != normalize_email(value):
+                return False
+        elif actual != value:
+            return False
+    return True
+
+class FriendRepository(ChangeNotifier):
+    def __init__(self, file_path, cache=False):
         self.file_path = file_path
+        # cache=True: håll vännerna i minnet och läs bara om filen när den ändrats.
+        # Vännerna ligger i en FriendTable (se friendrecord.py): kolumner sorterade på id,
+        # så get_by_id är en binärsökning och GET behöver aldrig sortera. Tabellen har även
+        # index för e-post och status, och versionen (för ETag) för varje vän.
+        # Ut ur repositoryt lämnas alltid vanliga dicts, så anroparna märker ingen skillnad.
+        # E-post och id är unika: add/update kastar FriendConflictError istället för att skriva en dubblett.
+        self.cache = cache
+        self._lock = threading.RLock()
+        self._table = FriendTable(normalize_email)
+        self._signature = None
+        # Versioner för ETag: räknas upp vid varje ändring. _epoch gör dem unika per
+        # process så att en omstart (då räknaren börjar om) aldrig ger en gammal ETag.
+        self._epoch = time.time_ns()
+        self.version = 0
+        self.last_modified = time.time()
+
+    def _file_signature(self):
+        # mtime/storlek/inode ändras när någon (även en annan version av API:et) skriver filen
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return MISSING_FILE
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read_file(self):
+        return jsoncodec.read_file(self.file_path)
+
+    def _iter_file(self):
+        # Med cache läses filen en vän i taget rakt in i tabellen (se FriendTable.from_dicts):
+        # hela listan med dicts finns aldrig i minnet, inte ens under inläsningen
+        return jsoncodec.iter_file(self.file_path)
+
+    def _set_cache(self, friends):
+        old_table = self._table
+        # Ny version för datamängden. Vänner som ser likadana ut som förut behåller sin version.
+        self._touch()
+        bad = []
+        self._table = FriendTable.from_dicts(self._valid_records(friends, bad), normalize_email, self.version)
+        self._table.keep_versions(old_table)
+        if bad:
+            save_rejected(self.file_path, bad)
+        self._notify('reset')
+
+    @staticmethod
+    def _valid_records(friends, bad):
+        # Vänner utan ett giltigt id (t.ex. "7" eller true i en gammal friends.json) får inte
+        # plats i tabellen. De hoppas över, men sparas (i bad) i friends.json.rejected: nästa
+        # skrivning av friends.json innehåller dem inte (samma sak som loggens .rejected).
+        for friend in friends:
+            if isinstance(friend, dict) and is_friend_id(friend.get('id')):
+                yield friend
+            else:
+                bad.append(friend)
+
+    def _touch(self):
+        self.version += 1
+        self.last_modified = time.time()
+
+    # --- Ändra en vän i tabellen (och tala om det för prenumeranterna) ---
+
+    def _index_add(self, friend):
+        existed = friend['id'] in self._table
+        self._touch()
+        self._table.put(friend, self.version)
+        # Prenumeranterna får en egen kopia, anroparens dict kan ändras efteråt
+        self._notify('update' if existed else 'add', friend['id'], dict(friend))
+
+    def _index_remove(self, friend_id):
+        friend = self._table.remove(friend_id)
+        if friend is not None:
+            self._touch()
+            self._notify('delete', friend_id, friend)
+
+    def _index_update(self, friend_id, updates):
+        """Returnerar vännen efter ändringen, eller None om den inte finns."""
+        if friend_id not in self._table:
+            return None
+        self._touch()
+        friend = self._table.update(friend_id, without_id(updates), self.version)
+        self._notify('update', friend_id, friend)
+        return dict(friend)
+
+    def _refresh(self):
+        # Läs bara om filen om någon annan har ändrat den sedan sist
+        signature = self._file_signature()
+        if signature != self._signature:
+            self._set_cache(self._iter_file())
+            self._signature = signature
 
     def _load(self):
-        if not os.path.exists(self.file_path):
-            return []
-        with open(self.file_path, 'r') as f:
-            return json.load(f)
+        # Bara utan cache: med cache läses allt via indexet
+        return self._read_file()
 
     def _save(self, data):
-        with open(self.file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        with self._lock:
+            try:
+                jsoncodec.write_items(self.file_path, data)
+            except Exception:
+                # Osäkert vad som hamnade i filen, tvinga omläsning nästa gång
+                self._signature = None
+                raise
+            if self.cache:
+                # Vår egen skrivning ska inte trigga en omläsning
+                self._signature = self._file_signature()
+
+    def _save_index(self):
+        # Med cache är tabellen sanningen: skriv hela filen (i id-ordning), en bit i taget
+        # så att hela listan med dicts aldrig behöver finnas i minnet
+        self._save(self._table.rows())
+
+    def _check_emails(self, new_emails, data=None):
+        """Kastar FriendConflictError om new_emails ({id: e-post}) krockar med någon annans e-post."""
+        if data is None:
+            check_unique_emails(self._table.email_owners, new_emails)
+            return
+        owners = {}
+        for f in data:
+            if f.get('email') is not None:
+                owners.setdefault(normalize_email(f['email']), []).append(f['id'])
+        check_unique_emails(lambda email: owners.get(email, ()), new_emails)
+
+    def _check_new_ids(self, friend_ids, data=None):
+        """Kastar FriendConflictError om något av id:na redan finns (som primärnyckeln i SQLite)."""
+        existing = self._table if data is None else {f['id'] for f in data}
+        if any(friend_id in existing for friend_id in friend_ids):
+            raise FriendConflictError("ID already exists.")
+
+    def release_connection(self):
+        # Samma gränssnitt som SQLite-repositoryt, men en JSON-fil har inga uppkopplingar
+        pass
+
+    # --- Versioner (för ETag / Last-Modified) ---
+
+    def get_version(self):
+        """
+        Returnerar (version, senast_ändrad) för hela datamängden utan att serialisera något.
+        Utan cache används filens mtime/storlek/inode som version (bara ett os.stat).
+        """
+        if self.cache:
+            with self._lock:
+                self._refresh()
+                return f'{self._epoch}-{self.version}', self.last_modified
+        signature = self._file_signature()
+        if signature == MISSING_FILE:
+            return 'empty', None
+        return '-'.join(str(part) for part in signature), signature[0] / 1e9
+
+    def get_record_version(self, friend_id):
+        """Version för en enskild vän, eller None om den inte finns."""
+        if self.cache:
+            with self._lock:
+                self._refresh()
+                version = self._table.version(friend_id)
+                return f'{self._epoch}-{version}' if version is not None else None
+        friend = self.get_by_id(friend_id)
+        return self.get_version()[0] if friend is not None else None
 
     def get_all(self):
+        if self.cache:
+            with self._lock:
+                self._refresh()
+                return list(self._table.rows())
         data = self._load()
         # Vi sorterar listan 'data' baserat på nyckeln 'id' i varje dictionary.
         # sorted() returnerar en ny, sorterad lista.
         sorted_data = sorted(data, key=lambda friend: friend['id'])
         return sorted_data #self._load()
 
+    def get_page(self, after_id=None, limit=None, filters=None):
+        """
+        Hämtar vänner sorterade på id, med start efter after_id (cursor).
+        Returnerar (vänner, finns_fler). Med cache kostar det O(sidans storlek).
+        """
+        filters = filters or {}
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                ids, get = self._candidate_ids(filters), self._table.get
+            else:
+                index = {f['id']: f for f in self._load()}
+                ids, get = sorted(index), index.get
+            start = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+            page = []
+            for pos in range(start, len(ids)):
+                friend = get(ids[pos])
+                if not matches_filters(friend, filters):
+                    continue
+                if limit is not None and len(page) == limit:
+                    return page, True
+                page.append(friend)
+            return page, False
+
+    def iter_friends(self, after_id=None, filters=None):
+        """
+        Som get_page utan limit, men en generator: vännerna lämnas ut en i taget så att
+        ett strömmat svar aldrig behöver bygga hela listan (eller hela JSON-texten) i minnet.
+        """
+        filters = filters or {}
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                ids = self._candidate_ids(filters)
+            else:
+                index = {f['id']: f for f in self._load()}
+                ids = sorted(index)
+            start = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+            # Kopia av id:na: låset släpps innan vi börjar lämna ut vänner
+            ids = ids[start:]
+        for friend_id in ids:
+            if self.cache:
+                # Tabellen kan ändras medan vi lämnar ut vänner: läs en i taget under låset
+                with self._lock:
+                    friend = self._table.get(friend_id)
+            else:
+                friend = index.get(friend_id)
+            if friend is not None and matches_filters(friend, filters):
+                yield friend
+
+    def _candidate_ids(self, filters):
+        # Använd e-post/status-indexen när filtret tillåter, annars alla id
+        if 'email' in filters:
+            return self._table.email_owners(filters['email'])
+        if 'status' in filters:
+            return self._table.status_ids(filters['status'])
+        return self._table.ids
+
+    def get_by_email(self, email):
+        if self.cache:
+            with self._lock:
+                self._refresh()
+                return self._table.get(self._table.email_owner(email))
+        email = normalize_email(email)
+        return next((f for f in self._load() if f.get('email') is not None and normalize_email(f['email']) == email), None)
+
+    def get_by_status(self, status):
+        friends, _ = self.get_page(filters={'status': status})
+        return friends
+
     def get_by_id(self, friend_id):
+        if self.cache:
+            with self._lock:
+                self._refresh()
+                return self._table.get(friend_id)
         data = self._load()
         return next((f for f in data if f['id'] == friend_id), None)
 
     def add(self, friend_dict):
-        data = self._load()
-        data.append(friend_dict)
-        self._save(data)
-        return friend_dict
+        check_friend(friend_dict)
+        new_emails = {friend_dict['id']: friend_dict.get('email')}
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                self._check_new_ids(new_emails)
+                self._check_emails(new_emails)
+                self._index_add(friend_dict)
+                self._save_index()
+                return friend_dict
+            data = self._load()
+            self._check_new_ids(new_emails, data)
+            self._check_emails(new_emails, data)
+            data.append(friend_dict)
+            self._save(data)
+            return friend_dict
 
     def update(self, friend_id, updates):
-        data = self._load()
-        for friend in data:
-            if friend['id'] == friend_id:
-                friend.update(updates)
-                self._save(data)
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                if friend_id not in self._table:
+                    return None
+                if 'email' in updates:
+                    self._check_emails({friend_id: updates['email']})
+                friend = self._index_update(friend_id, updates)
+                self._save_index()
                 return friend
-        return None
+            data = self._load()
+            friend = next((f for f in data if f['id'] == friend_id), None)
+            if friend is None:
+                return None
+            if 'email' in updates:
+                self._check_emails({friend_id: updates['email']}, data)
+            friend.update(without_id(updates))
+            self._save(data)
+            return friend
 
     def delete(self, friend_id):
-        data = self._load()
-        if not any(f['id'] == friend_id for f in data):
-            return False
-        updated_data = [f for f in data if f['id'] != friend_id]
-        self._save(updated_data)
-        return True
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                if friend_id not in self._table:
+                    return False
+                self._index_remove(friend_id)
+                self._save_index()
+                return True
+            data = self._load()
+            updated_data = [f for f in data if f['id'] != friend_id]
+            if len(updated_data) == len(data):
+                return False
+            self._save(updated_data)
+            return True
+
+    # --- Massoperationer: en inläsning och en skrivning oavsett hur många vänner ---
+
+    def add_many(self, friends):
+        # Alla kontrolleras innan något ändras: antingen sparas hela listan eller ingenting
+        for friend in friends:
+            check_friend(friend)
+        new_emails = {friend['id']: friend.get('email') for friend in friends}
+        if len(new_emails) != len(friends):
+            raise FriendConflictError("The same id appears more than once.")
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                self._check_new_ids(new_emails)
+                self._check_emails(new_emails)
+                for friend in friends:
+                    self._index_add(friend)
+                self._save_index()
+                return friends
+            data = self._load()
+            self._check_new_ids(new_emails, data)
+            self._check_emails(new_emails, data)
+            data.extend(friends)
+            self._save(data)
+            return friends
+
+    def update_many(self, updates_by_id):
+        """updates_by_id: {id: {fält: nytt värde}}. Returnerar de vänner som fanns och uppdaterades."""
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                index = self._table
+            else:
+                data = self._load()
+                index = {f['id']: f for f in data}
+            new_emails = {friend_id: updates['email'] for friend_id, updates in updates_by_id.items()
+                          if friend_id in index and 'email' in updates}
+            if new_emails:
+                self._check_emails(new_emails, None if self.cache else data)
+            updated = []
+            for friend_id, updates in updates_by_id.items():
+                if self.cache:
+                    friend = self._index_update(friend_id, updates)
+                else:
+                    friend = index.get(friend_id)
+                    if friend is not None:
+                        friend.update(without_id(updates))
+                if friend is not None:
+                    updated.append(friend)
+            if not updated:
+                return updated
+            if self.cache:
+                self._save_index()
+            else:
+                self._save(data)
+            return updated
+
+    def delete_many(self, friend_ids):
+        """Returnerar listan med de id som faktiskt fanns och togs bort."""
+        with self._lock:
+            if self.cache:
+                self._refresh()
+                deleted = [friend_id for friend_id in dict.fromkeys(friend_ids) if friend_id in self._table]
+                if deleted:
+                    for friend_id in deleted:
+                        self._index_remove(friend_id)
+                    self._save_index()
+                return deleted
+            ids = set(friend_ids)
+            data = self._load()
+            deleted = [f['id'] for f in data if f['id'] in ids]
+            if deleted:
+                self._save([f for f in data if f['id'] not in ids])
+            return deleted
@@ -0,0 +1,332 @@
+# --- SÖKINDEX FÖR VÄNNER ---
+#myblueprints/repositories/friendsearchindex.py
+# Snabb sökning på namn och e-post utan att loopa igenom alla vänner.
+# Varje vän delas upp i "ord" (tokens): "Harvey Specter", "harvey@law.com" ->
+#   harvey, specter, harvey@law.com, law, com
+# Orden sätts ihop till en text med ett mellanslag före varje ord:
+#   " harvey specter harvey@law.com law com"
+# Två index byggs:
+#   _tokens  ord -> [id, ...]                 (exakt träff)
+#   _grams   3 tecken -> [id, ...]            (träff var som helst i texten, t.ex. "arv")
+#            plus " h" för varje ords första bokstav. Eftersom mellanslaget står före varje
+#            ord betyder " ha" att något ord BÖRJAR på "ha", så prefix-sökningar slår upp
+#            sina vänner direkt.
+# Listorna är sorterade på id. Träffar rankas: exakt ord (3p) > början av ord (2p) >
+# inuti ord (1p), och vid lika poäng lägsta id först.
+#
+# Vi letar aldrig fram ALLA träffar för att sedan ta de bästa. Med ett sökord gås listorna
+# igenom i id-ordning, en poängnivå i taget, och sökningen stannar när limit träffar
+# hittats ("a" bland en miljon vänner tittar alltså bara på ett tjugotal). Med flera ord
+# gås det ovanligaste ordets lista igenom och varje kandidat kontrolleras mot alla ord. Är
+# den listan lång tas snittet av alla ordens listor, så att ovanliga kombinationer hittas.
+#
+# Indexet byggs i en bakgrundstråd: när appen startar och när repositoryt säger 'reset'
+# (t.ex. friends.json ändrad utifrån). Under tiden svarar sökningar från det gamla indexet,
+# bara den allra första sökningen får vänta. Vanliga ändringar (add/update/delete) läggs i
+# en kö och förs in en vän i taget vid nästa sökning, så att repositoryts skrivningar aldrig
+# behöver vänta på sökindexet.
+import bisect
+import heapq
+import re
+import threading
+from collections import deque
+from itertools import islice
+
+EXACT, PREFIX, SUBSTRING = 3, 2, 1
+
+# Blir kön längre än så här bygger vi hellre om hela indexet
+MAX_PENDING = 10000
+# Med flera sökord: så många kandidater poängsätts först ur den kortaste listan, och sedan
+# som mest lika många ur snittet av alla listor. Blir det fler säger search_with_truncated
+# det (truncated=True).
+MAX_CANDIDATES = 20000
+# Fler inaktuella id än så här per vän (i snitt) -> bygg om indexet
+STALE_PER_FRIEND = 8
+
+def tokenize(friend):
+    words = re.findall(r'[^\W_]+', str(friend.get('name', '')).lower())
+    email = str(friend.get('email', '')).strip().lower()
+    if email:
+        words.append(email)
+        words.extend(re.findall(r'[^\W_]+', email))
+    # dict.fromkeys tar bort dubbletter men behåller ordningen
+    return tuple(dict.fromkeys(words))
+
+def search_text(words):
+    return ''.join(' ' + word for word in words)
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def grams(words):
+    # Alla trigram i texten, plus " x" för varje ords första bokstav (prefix med 1 tecken)
+    return trigrams(search_text(words)) | {' ' + word[0] for word in words}
+
+def _insert_id(ids, friend_id):
+    # Sorterad lista utan dubbletter (id:t kan redan finnas kvar sedan tidigare, se _remove)
+    pos = bisect.bisect_left(ids, friend_id)
+    if pos == len(ids) or ids[pos] != friend_id:
+        ids.insert(pos, friend_id)
+
+class FriendSearchIndex:
+    def __init__(self, repo):
+        self.repo = repo
+        self._lock = threading.Lock()
+        self._pending = deque()
+        # Bakgrundsbygget: _ready sätts när första indexet finns, _building medan ett bygge pågår
+        self._ready = threading.Event()
+        self._building = False
+        self._rebuild_requested = False
+        self._builder = None
+        self._builder_lock = threading.Lock()
+        self._record_tokens, self._record_text, self._tokens, self._grams = {}, {}, {}, {}
+        self._stale = 0
+        repo.subscribe(self._on_change)
+        self._request_rebuild()
+
+    # --- Händelser från repositoryt (körs i skrivarens tråd, ska vara snabbt) ---
+
+    def _on_change(self, op, friend_id, friend):
+        if op == 'reset' or len(self._pending) >= MAX_PENDING:
+            self._pending.clear()
+            self._request_rebuild()
+        else:
+            self._pending.append((op, friend_id, friend))
+
+    def _request_rebuild(self):
+        with self._builder_lock:
+            self._rebuild_requested = True
+            if self._builder is None:
+                self._builder = threading.Thread(target=self._run_builds, daemon=True)
+                self._builder.start()
+
+    # --- Bygg om hela indexet (bakgrundstråden) ---
+
+    def _run_builds(self):
+        while True:
+            with self._builder_lock:
+                if not self._rebuild_requested:
+                    self._builder = None
+                    return
+                self._rebuild_requested = False
+            with self._lock:
+                # Ändringar härifrån och framåt kan saknas i bygget: de ligger kvar i kön och
+                # förs in efteråt (att föra in en ändring som redan finns med gör ingenting)
+                self._building = True
+                self._pending.clear()
+            try:
+                built = self._build()
+            except BaseException:
+                # Behåll det gamla indexet. Nästa 'reset' försöker bygga igen.
+                with self._lock:
+                    self._building = False
+                    self._ready.set()
+                with self._builder_lock:
+                    self._builder = None
+                raise
+            finally:
+                # Bakgrundstråden ska inte hålla en SQLite-uppkoppling öppen
+                self.repo.release_connection()
+            with self._lock:
+                self._record_tokens, self._record_text, self._tokens, self._grams = built
+                self._stale = 0
+                self._building = False
+                self._catch_up()
+                self._ready.set()
+
+    def _build(self):
+        record_tokens, record_text, tokens, grams_index = {}, {}, {}, {}
+        # iter_friends ger vännerna i id-ordning, så append håller listorna sorterade
+        for friend in self.repo.iter_friends():
+            friend_id = friend['id']
+            words = tokenize(friend)
+            record_tokens[friend_id] = words
+            record_text[friend_id] = search_text(words)
+            for word in words:
+                tokens.setdefault(word, []).append(friend_id)
+            for gram in grams(words):
+                grams_index.setdefault(gram, []).append(friend_id)
+        return record_tokens, record_text, tokens, grams_index
+
+    def wait_ready(self, timeout=None):
+        """Väntar tills inget bygge pågår (används av tester och benchmarks)."""
+        self._ready.wait(timeout)
+        while True:
+            with self._builder_lock:
+                builder = self._builder
+            if builder is None:
+                return
+            builder.join(timeout)
+
+    def _catch_up(self):
+        # Anropas med self._lock. Under ett bygge får kön vänta (se _run_builds).
+        if self._building:
+            return
+        while self._pending:
+            op, friend_id, friend = self._pending.popleft()
+            self._remove(friend_id)
+            if op in ('add', 'update'):
+                self._add(friend_id, friend)
+        # Många inaktuella id i listorna gör sökningarna långsammare: bygg om i bakgrunden
+        if self._stale > STALE_PER_FRIEND * max(len(self._record_text), 1000):
+            self._stale = 0
+            self._request_rebuild()
+
+    # --- Uppdatera indexen för en vän ---
+    # Ett id tas aldrig bort ur listorna (att ta bort mitt i en lista med en miljon id
+    # flyttar hela resten av listan). Istället kontrolleras varje kandidat mot vännens
+    # aktuella ord/text vid sökningen, så ett inaktuellt id ger ingen träff. _stale räknar
+    # hur många sådana som finns, och nästa bygge blir av med dem.
+
+    def _add(self, friend_id, friend):
+        words = tokenize(friend)
+        self._record_tokens[friend_id] = words
+        self._record_text[friend_id] = search_text(words)
+        for word in words:
+            _insert_id(self._tokens.setdefault(word, []), friend_id)
+        for gram in grams(words):
+            _insert_id(self._grams.setdefault(gram, []), friend_id)
+
+    def _remove(self, friend_id):
+        words = self._record_tokens.pop(friend_id, None)
+        if words is not None:
+            del self._record_text[friend_id]
+            self._stale += len(words) + len(grams(words))
+
+    # --- Sökning ---
+
+    def _smallest_posting(self, gram_set):
+        # Vännen måste ha alla trigram, så den kortaste listan räcker som kandidater
+        return min((self._grams.get(gram, ()) for gram in gram_set), key=len)
+
+    def _prefix_candidates(self, term):
+        if len(term) <= 2:
+            # " h" / " ha" finns i indexet: exakt de vänner som har ett ord som börjar på term
+            return self._grams.get(' ' + term, ())
+        return self._smallest_posting(trigrams(' ' + term))
+
+    def _substring_candidates(self, term):
+        return self._smallest_posting(trigrams(term))
+
+    def _best_score(self, term):
+        # Högsta poäng någon vän kan få för term (kan vara för högt, aldrig för lågt)
+        if self._tokens.get(term):
+            return EXACT
+        return PREFIX if self._prefix_candidates(term) else SUBSTRING
+
+    def _score(self, friend_id, term):
+        # 0 = ingen träff (eller ett inaktuellt id). Korta sökord (1-2 tecken) matchar bara början av ord.
+        words = self._record_tokens.get(friend_id)
+        if words is None:
+            return 0
+        if term in words:
+            return EXACT
+        text = self._record_text[friend_id]
+        if ' ' + term in text:
+            return PREFIX
+        if len(term) >= 3 and term in text:
+            return SUBSTRING
+        return 0
+
+    def _search_term(self, term, limit):
+        # En poängnivå i taget, i id-ordning. Varje nivå slutar så fort vi har limit träffar.
+        hits = []
+        for friend_id in self._tokens.get(term, ()):
+            if self._score(friend_id, term) == EXACT:
+                hits.append((friend_id, EXACT))
+                if len(hits) == limit:
+                    return hits
+        if len(hits) < limit:
+            for friend_id in self._prefix_candidates(term):
+                if self._score(friend_id, term) == PREFIX:
+                    hits.append((friend_id, PREFIX))
+                    if len(hits) == limit:
+                        return hits
+        if len(hits) < limit and len(term) >= 3:
+            for friend_id in self._substring_candidates(term):
+                if self._score(friend_id, term) == SUBSTRING:
+                    hits.append((friend_id, SUBSTRING))
+                    if len(hits) == limit:
+                        return hits
+        return hits
+
+    def _term_postings(self, term):
+        # Listor som ALLA vänner som matchar term finns i (och nästan bara de)
+        if len(term) <= 2:
+            return [self._grams.get(' ' + term, ())]
+        return [self._grams.get(gram, ()) for gram in trigrams(term)]
+
+    def _search_terms(self, terms, limit):
+        """Returnerar (träffar, truncated), se search_with_truncated."""
+        # Vännen måste finnas i varje sökords listor, så den kortaste listan räcker som
+        # kandidater. Oftast har vi limit träffar långt innan den är slut.
+        postings = sorted((posting for term in terms for posting in self._term_postings(term)), key=len)
+        best_possible = sum(self._best_score(term) for term in terms)
+        best = []  # heap med (poäng, -id): sämsta träffen överst
+        if self._rank(islice(postings[0], MAX_CANDIDATES), terms, limit, best, best_possible) \
+                or len(postings[0]) <= MAX_CANDIDATES:
+            return self._sorted_hits(best), False
+        # Många kandidater men inte limit perfekta träffar: ta snittet av ALLA listorna för
+        # resten av den kortaste (mängdoperationer i C, mycket snabbare än att poängsätta)
+        candidates = set(islice(postings[0], MAX_CANDIDATES, None))
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        candidates = sorted(candidates)
+        done = self._rank(islice(candidates, MAX_CANDIDATES), terms, limit, best, best_possible)
+        return self._sorted_hits(best), not done and len(candidates) > MAX_CANDIDATES
+
+    def _rank(self, candidates, terms, limit, best, best_possible):
+        # Poängsätter kandidaterna (i id-ordning) mot alla ord och håller de limit bästa i best.
+        # Returnerar True när best är full med högsta möjliga poäng: inget senare id kan slå dem.
+        for friend_id in candidates:
+            score = 0
+            for term in terms:
+                term_score = self._score(friend_id, term)
+                if not term_score:
+                    break
+                score += term_score
+            else:
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -friend_id))
+                elif (score, -friend_id) > best[0]:
+                    heapq.heapreplace(best, (score, -friend_id))
+                if len(best) == limit and best[0][0] == best_possible:
+                    return True
+        return False
+
+    @staticmethod
+    def _sorted_hits(best):
+        return [(-neg_id, score) for score, neg_id in sorted(best, reverse=True)]
+
+    def search(self, query, limit=20):
+        """Returnerar upp till limit vänner som matchar alla ord i query, bästa träff först."""
+        return self.search_with_truncated(query, limit)[0]
+
+    def search_with_truncated(self, query, limit=20):
+        """
+        Som search, men returnerar (vänner, truncated). truncated=True betyder att sökningen
+        gav upp efter MAX_CANDIDATES kandidater: alla vänner i listan matchar, men det kan
+        finnas bättre träffar som inte kom med.
+        """
+        terms = [term for term in query.lower().split() if term]
+        if not terms:
+            return [], False
+        # Låt repositoryt upptäcka om filen ändrats utifrån (ger en 'reset'-händelse).
+        # Görs innan vårt lås tas, så att låsen alltid tas i samma ordning.
+        self.repo.get_version()
+        # Bara före det allra första bygget finns inget index att svara från
+        self._ready.wait()
+        with self._lock:
+            self._catch_up()
+            if len(terms) == 1:
+                best, truncated = self._search_term(terms[0], limit), False
+            else:
+                best, truncated = self._search_terms(terms, limit)
+        results = []
+        for friend_id, score in best:
+            friend = self.repo.get_by_id(friend_id)
+            if friend is not None:
+                results.append({**friend, "score": score})
+        return results, truncated
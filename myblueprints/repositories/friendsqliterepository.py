@@ -0,0 +1,359 @@
+# --- REPOSITORY MED SQLITE ---
+#myblueprints/repositories/friendsqliterepository.py
+# Samma gränssnitt som FriendRepository (get_all, get_by_id, add, update, delete)
+# men datan ligger i en SQLite-databas istället för i en JSON-fil.
+# - id är primärnyckel och email har ett unikt index, status ett vanligt index -> snabba
+#   uppslag. Det unika indexet ligger på kolumnen email_key = normalize_email(email), som
+#   Python räknar ut. SQLites NOCASE gör bara om A-Z, så "Ö@x.se" och "ö@x.se" hade annars
+#   varit olika här men samma e-post i JSON- och logg-lagringen.
+# - WAL (write-ahead logging) gör att läsare inte blockeras medan någon skriver
+# - varje tråd (Flask kör ett anrop per tråd) får en egen uppkoppling som återanvänds
+#   under anropet och stängs när anropet är klart (release_connection, se flask_app.py).
+#   Annars blir det en öppen uppkoppling för varje tråd som någonsin funnits.
+# - triggers räknar upp en version (tabellen meta) vid varje ändring och stämplar den
+#   ändrade raden med den, så att ETag kan tas fram utan att läsa vännerna
+#
+# Engångsimport från JSON:
+#   python -m myblueprints.repositories.friendsqliterepository friends.json friends.db
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from .. import jsoncodec
+from .changenotifier import ChangeNotifier
+from .friendrepository import FriendConflictError, check_friend, normalize_email, save_rejected, without_id
+
+# Kolumner vi har egna fält för. Övriga nycklar sparas som JSON i kolumnen 'extra'
+# (v2/v3 tillåter ju att man skickar in vad som helst). Där hamnar också fält som
+# uttryckligen är null: en NULL-kolumn betyder "fältet finns inte", precis som i JSON-filen.
+# Likaså värden som inte är strängar (t.ex. "status": 7 eller en lista som namn): en
+# TEXT-kolumn skulle göra om 7 till "7", och en lista går inte att spara alls.
+COLUMNS = ('id', 'name', 'email', 'status')
+# Kolumnen som email-indexet bygger på (normalize_email av email)
+EMAIL_KEY = 'email_key'
+INSERT_SQL = 'INSERT INTO friends (id, name, email, status, extra, email_key) VALUES (?, ?, ?, ?, ?, ?)'
+# Vid import skrivs ett befintligt id över, men en email som redan finns (hos ett annat id,
+# oavsett skiftläge) ger fortfarande IntegrityError. INSERT OR REPLACE skulle istället
+# tyst ta bort den andra vännen.
+IMPORT_SQL = (INSERT_SQL + ' ON CONFLICT(id) DO UPDATE SET name = excluded.name, email = excluded.email,'
+              ' status = excluded.status, extra = excluded.extra, email_key = excluded.email_key')
+UPDATE_SQL = 'UPDATE friends SET id = ?, name = ?, email = ?, status = ?, extra = ?, email_key = ? WHERE id = ?'
+
+# Körs i samma transaktion som ändringen: version + 1 och ny ändringstid (sekunder sedan 1970)
+BUMP_VERSION_SQL = """
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+    UPDATE meta SET value = (julianday('now') - 2440587.5) * 86400.0 WHERE key = 'modified';
+"""
+STAMP_ROW_SQL = """
+    UPDATE friends SET version = (SELECT value FROM meta WHERE key = 'version') WHERE id = NEW.id;
+"""
+
+class ImportConflictError(ValueError):
+    """Importen avbröts: vänner i filen har en email som redan används av en annan vän."""
+    def __init__(self, conflicts):
+        # [{"id": ..., "email": ..., "conflicts_with": id}, ...]
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} friend(s) with an email that is already taken, nothing imported")
+
+class FriendSQLiteRepository(ChangeNotifier):
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    # --- Uppkopplingar ---
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release_connection(self):
+        """Stänger den här trådens uppkoppling. Nästa anrop från tråden öppnar en ny."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.remove(conn)
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # 'with conn' = en transaktion: commit om allt gick bra, annars rollback.
+        # Det unika indexet på email (och primärnyckeln) stoppar dubbletter även om två
+        # anrop hinner förbi kontrollerna i API:et samtidigt. Det blir 409, inte 500.
+        try:
+            with self._conn() as conn:
+                yield conn
+        except sqlite3.IntegrityError as e:
+            what = 'Email' if 'friends.email_key' in str(e) else 'ID'
+            raise FriendConflictError(f"{what} already exists.") from e
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def _create_schema(self):
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS friends (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    email TEXT COLLATE NOCASE,
+                    status TEXT,
+                    extra TEXT,
+                    version INTEGER NOT NULL DEFAULT 0
+                )""")
+            # Databaser skapade innan versionskolumnen fanns
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(friends)')]
+            if 'version' not in columns:
+                conn.execute('ALTER TABLE friends ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+            # ... och innan email_key fanns: räkna ut den för alla befintliga vänner
+            if 'email_key' not in columns:
+                conn.execute('ALTER TABLE friends ADD COLUMN email_key TEXT')
+                rows = conn.execute('SELECT id, email FROM friends WHERE email IS NOT NULL').fetchall()
+                conn.executemany('UPDATE friends SET email_key = ? WHERE id = ?',
+                                 [(normalize_email(row['email']), row['id']) for row in rows])
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)')
+            conn.executemany('INSERT OR IGNORE INTO meta VALUES (?, ?)',
+                             [('epoch', time.time_ns()), ('version', 0), ('modified', time.time())])
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS friends_insert AFTER INSERT ON friends '
+                         f'BEGIN {BUMP_VERSION_SQL} {STAMP_ROW_SQL} END')
+            # 'UPDATE OF ...' utan version: annars skulle stämplingen trigga sig själv
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS friends_update AFTER UPDATE OF id, name, email, status, extra '
+                         f'ON friends BEGIN {BUMP_VERSION_SQL} {STAMP_ROW_SQL} END')
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS friends_delete AFTER DELETE ON friends '
+                         f'BEGIN {BUMP_VERSION_SQL} END')
+            # De tidigare indexen (på email, och på trim(email) COLLATE NOCASE) räknade
+            # " a@x.se" och "a@x.se", eller "Ö@x.se" och "ö@x.se", som olika
+            conn.execute('DROP INDEX IF EXISTS friends_email')
+            conn.execute('DROP INDEX IF EXISTS friends_email_key')
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS friends_email_normalized ON friends ({EMAIL_KEY})')
+            conn.execute('CREATE INDEX IF NOT EXISTS friends_status ON friends (status)')
+
+    # --- Omvandling rad <-> dict ---
+
+    @staticmethod
+    def _to_row(friend):
+        extra = {k: v for k, v in friend.items() if k != 'id' and (k not in COLUMNS or not isinstance(v, str))}
+        text = {k: v for k, v in friend.items() if k in COLUMNS and isinstance(v, str)}
+        # email_key även för en e-post som inte är en sträng, som i JSON-lagringens index
+        email = friend.get('email')
+        return (friend.get('id'), text.get('name'), text.get('email'), text.get('status'),
+                jsoncodec.dumps(extra) if extra else None,
+                normalize_email(email) if email is not None else None)
+
+    @staticmethod
+    def _to_dict(row):
+        friend = {k: row[k] for k in COLUMNS if row[k] is not None}
+        if row['extra']:
+            friend.update(jsoncodec.loads(row['extra']))
+        return friend
+
+    # --- Samma API som FriendRepository ---
+
+    # --- Versioner (för ETag / Last-Modified) ---
+
+    def get_version(self):
+        meta = dict(self._conn().execute('SELECT key, value FROM meta').fetchall())
+        return f"{meta['epoch']}-{meta['version']}", meta['modified']
+
+    def get_record_version(self, friend_id):
+        row = self._conn().execute('SELECT version FROM friends WHERE id = ?', (friend_id,)).fetchone()
+        if row is None:
+            return None
+        epoch = self._conn().execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+        return f"{epoch}-{row['version']}"
+
+    def get_all(self):
+        rows = self._conn().execute('SELECT * FROM friends ORDER BY id')
+        return [self._to_dict(row) for row in rows]
+
+    def _select(self, after_id, filters, limit=None):
+        where, params = [], []
+        if after_id is not None:
+            where.append('id > ?')
+            params.append(after_id)
+        for key, value in (filters or {}).items():
+            if key not in COLUMNS:
+                raise ValueError(f"Cannot filter on {key}")
+            if key == 'email':
+                where.append(f'{EMAIL_KEY} = ?')
+                params.append(normalize_email(value))
+            else:
+                where.append(f'{key} = ?')
+                params.append(value)
+        sql = 'SELECT * FROM friends'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self._conn().execute(sql, params)
+
+    def get_page(self, after_id=None, limit=None, filters=None):
+        """Samma som FriendRepository.get_page. Primärnyckeln gör att sidan hämtas utan att läsa allt."""
+        # Hämta en extra rad för att veta om det finns fler sidor
+        rows = self._select(after_id, filters, limit + 1 if limit is not None else None)
+        page = [self._to_dict(row) for row in rows]
+        if limit is not None and len(page) > limit:
+            return page[:limit], True
+        return page, False
+
+    def iter_friends(self, after_id=None, filters=None):
+        # sqlite-cursorn hämtar raderna allt eftersom vi itererar
+        for row in self._select(after_id, filters):
+            yield self._to_dict(row)
+
+    def get_by_email(self, email):
+        row = self._conn().execute(f'SELECT * FROM friends WHERE {EMAIL_KEY} = ?', (normalize_email(email),)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_by_status(self, status):
+        rows = self._conn().execute('SELECT * FROM friends WHERE status = ? ORDER BY id', (status,))
+        return [self._to_dict(row) for row in rows]
+
+    def get_by_id(self, friend_id):
+        row = self._conn().execute('SELECT * FROM friends WHERE id = ?', (friend_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def add(self, friend_dict):
+        check_friend(friend_dict)
+        with self._transaction() as conn:
+            conn.execute(INSERT_SQL, self._to_row(friend_dict))
+        self._notify('add', friend_dict['id'], friend_dict)
+        return friend_dict
+
+    def update(self, friend_id, updates):
+        with self._transaction() as conn:
+            row = conn.execute('SELECT * FROM friends WHERE id = ?', (friend_id,)).fetchone()
+            if row is None:
+                return None
+            friend = self._to_dict(row)
+            friend.update(without_id(updates))
+            conn.execute(UPDATE_SQL, self._to_row(friend) + (friend_id,))
+        self._notify('update', friend_id, friend)
+        return friend
+
+    def delete(self, friend_id):
+        with self._conn() as conn:
+            cursor = conn.execute('DELETE FROM friends WHERE id = ?', (friend_id,))
+        if cursor.rowcount > 0:
+            self._notify('delete', friend_id)
+        return cursor.rowcount > 0
+
+    # --- Massoperationer: allt i en och samma transaktion ---
+
+    def add_many(self, friends):
+        for friend in friends:
+            check_friend(friend)
+        with self._transaction() as conn:
+            conn.executemany(INSERT_SQL, [self._to_row(friend) for friend in friends])
+        for friend in friends:
+            self._notify('add', friend['id'], friend)
+        return friends
+
+    def update_many(self, updates_by_id):
+        updated = []
+        with self._transaction() as conn:
+            for friend_id, updates in updates_by_id.items():
+                row = conn.execute('SELECT * FROM friends WHERE id = ?', (friend_id,)).fetchone()
+                if row is None:
+                    continue
+                friend = self._to_dict(row)
+                friend.update(without_id(updates))
+                conn.execute(UPDATE_SQL, self._to_row(friend) + (friend_id,))
+                updated.append(friend)
+        for friend in updated:
+            self._notify('update', friend['id'], friend)
+        return updated
+
+    def delete_many(self, friend_ids):
+        deleted = []
+        with self._conn() as conn:
+            for friend_id in dict.fromkeys(friend_ids):
+                if conn.execute('DELETE FROM friends WHERE id = ?', (friend_id,)).rowcount:
+                    deleted.append(friend_id)
+        for friend_id in deleted:
+            self._notify('delete', friend_id)
+        return deleted
+
+    # --- Import ---
+
+    def import_json(self, json_path):
+        """Läser in alla vänner från en JSON-fil (befintliga id skrivs över). Returnerar antalet.
+        Krockar en email med en annan väns kastas ImportConflictError och ingenting importeras.
+        Vänner utan ett giltigt heltals-id importeras inte, de sparas i json_path + '.rejected'."""
+        data = jsoncodec.read_file(json_path)
+        # Utan kontroll skulle en vän utan id få ett automatiskt id (t.ex. 7), och en senare
+        # {"id": "7"} skulle göras om till 7 och tyst skriva över den
+        good, bad = [], []
+        for friend in data:
+            try:
+                check_friend(friend)
+                good.append(friend)
+            except ValueError:
+                bad.append(friend)
+        if bad:
+            save_rejected(json_path, bad)
+        data = good
+        rows = [self._to_row(friend) for friend in data]
+        try:
+            with self._conn() as conn:
+                conn.executemany(IMPORT_SQL, rows)
+        except sqlite3.IntegrityError:
+            # Transaktionen är redan återställd. Gör om raderna en och en för att hitta alla krockar.
+            raise ImportConflictError(self._find_conflicts(rows))
+        self._notify('reset')
+        return len(data)
+
+    def _find_conflicts(self, rows):
+        conflicts = []
+        conn = self._conn()
+        # Allt i en transaktion som rullas tillbaka på slutet. En savepoint per rad gör att en
+        # krock bara ångrar den raden, så att följande rader krockar mot rätt data.
+        conn.execute('BEGIN')
+        try:
+            for row in rows:
+                try:
+                    conn.execute('SAVEPOINT import_row')
+                    conn.execute(IMPORT_SQL, row)
+                    conn.execute('RELEASE import_row')
+                except sqlite3.IntegrityError:
+                    conn.execute('ROLLBACK TO import_row')
+                    conn.execute('RELEASE import_row')
+                    other = conn.execute(f'SELECT id FROM friends WHERE {EMAIL_KEY} = ?',
+                                         (normalize_email(row[2]),)).fetchone()
+                    conflicts.append({"id": row[0], "email": row[2],
+                                      "conflicts_with": other['id'] if other else None})
+        finally:
+            conn.rollback()
+        return conflicts
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Användning: python -m myblueprints.repositories.friendsqliterepository friends.json friends.db')
+        sys.exit(1)
+    try:
+        count = FriendSQLiteRepository(sys.argv[2]).import_json(sys.argv[1])
+    except ImportConflictError as e:
+        print(f'Ingenting importerades, {len(e.conflicts)} vänner har en email som redan används:')
+        for conflict in e.conflicts:
+            print(f"  id {conflict['id']}: {conflict['email']} (används av id {conflict['conflicts_with']})")
+        sys.exit(1)
+    print(f'Importerade {count} vänner till {sys.argv[2]}')
@@ -0,0 +1,53 @@
+# --- VÄLJ LAGRING FÖR VÄNNER ---
+#myblueprints/repositories/repositoryfactory.py
+# Alla versioner av API:et (v1-v7) frågar härifrån efter repositoryt istället för att
+# skapa ett eget. Då finns det EN bild av datan per process, och alla ändringar går via
+# samma repository (som meddelar sökindex m.m., se changenotifier.py).
+# Vilken lagring som används styrs av miljövariabeln FRIENDS_BACKEND:
+#   json   -> friends.json (standard)
+#   log    -> friends.json + append-only logg (friends.json.log)
+#   sqlite -> friends.db (importeras automatiskt från friends.json första gången)
+# Exempel i cmd: set FRIENDS_BACKEND=sqlite   (Linux/Mac: export FRIENDS_BACKEND=sqlite)
+import os
+import threading
+
+from .friendrepository import FriendRepository
+from .friendlogrepository import FriendLogRepository
+from .friendsqliterepository import FriendSQLiteRepository
+
+JSON_DATA_FILE = 'friends.json'
+SQLITE_DB_FILE = 'friends.db'
+FRIENDS_BACKEND = os.environ.get('FRIENDS_BACKEND', 'json')
+
+# Ett repository per lagringstyp och process. Två instanser mot samma logg/databas
+# skulle annars ha var sin bild av datan.
+_repositories = {}
+_lock = threading.Lock()
+
+def create_friend_repository(backend):
+    if backend == 'json':
+        return FriendRepository(JSON_DATA_FILE, cache=True)
+    if backend == 'log':
+        return FriendLogRepository(JSON_DATA_FILE)
+    if backend == 'sqlite':
+        is_new = not os.path.exists(SQLITE_DB_FILE)
+        repo = FriendSQLiteRepository(SQLITE_DB_FILE)
+        if is_new and os.path.exists(JSON_DATA_FILE):
+            try:
+                repo.import_json(JSON_DATA_FILE)
+            except ValueError:
+                # Lämna ingen tom databas efter oss, då skulle nästa start hoppa över importen
+                repo.close()
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(SQLITE_DB_FILE + suffix):
+                        os.remove(SQLITE_DB_FILE + suffix)
+                raise
+        return repo
+    raise ValueError(f"Okänd FRIENDS_BACKEND: {backend} (välj json, log eller sqlite)")
+
+def get_friend_repository(backend=None):
+    backend = backend or FRIENDS_BACKEND
+    with _lock:
+        if backend not in _repositories:
+            _repositories[backend] = create_friend_repository(backend)
+        return _repositories[backend]
@@ -0,0 +1,148 @@
+# myblueprints/resultcache.py
+# LRU-cache för analysresultat, begränsad av hur många BYTE resultaten tar.
+# Nyckeln är en hash (sha256) av innehållet plus en version av mönstren, så samma text
+# med samma mönster ger samma nyckel och kan besvaras utan att skannas igen.
+# - LRU (least recently used): när cachen är full slängs det som använts längst sedan.
+#   OrderedDict håller ordningen, move_to_end() flyttar en träff sist (= senast använd).
+# - Storleken räknas som längden på resultatet i JSON, så taket gäller ungefär det
+#   minne och den disk som resultaten tar.
+# - Med en sökväg sparas resultaten också i en SQLite-fil och läses in igen vid omstart,
+#   i LRU-ordning. seq i filen är när resultatet senast användes. Träffar skrivs inte till
+#   filen en och en (en commit per träff skulle kosta mer än den sparar), utan samlas och
+#   skrivs vid nästa put, var SPARA_ORDNING:e träff och vid close(). Stängs processen av
+#   utan close() kan de senaste träffarna alltså saknas i ordningen.
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from . import jsoncodec
+
+# Så många träffar samlas högst innan ordningen skrivs till filen
+SPARA_ORDNING = 100
+
+def content_key(text, version):
+    """Nyckel för en text analyserad med en viss version av mönstren."""
+    return hashlib.sha256(text.encode('utf-8', errors='surrogatepass')).hexdigest() + '-' + version
+
+class ResultCache:
+    def __init__(self, max_bytes, path=None):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # nyckel -> (resultat, storlek i byte)
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._db = None
+        # Nycklar som använts sedan ordningen senast skrevs till filen, senast använd sist
+        self._anvanda = {}
+        # Högsta seq i filen. Vi sätter seq själva, så att en träff kan flyttas sist
+        self._seq = 0
+        if path:
+            self._open(path)
+
+    def _open(self, path):
+        # En uppkoppling som delas av trådarna, alla anrop går via self._lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT UNIQUE NOT NULL,
+                value BLOB NOT NULL
+            )""")
+        self._db.commit()
+        # Läs in de senast sparade först, tills taket är nått. Äldre rader tas bort från filen
+        spara = []
+        aldsta = None
+        for seq, key, value in self._db.execute('SELECT seq, key, value FROM results ORDER BY seq DESC'):
+            self._seq = max(self._seq, seq)
+            if self.bytes + len(value) > self.max_bytes:
+                break
+            spara.append((key, jsoncodec.loads(value), len(value)))
+            self.bytes += len(value)
+            aldsta = seq
+        for key, value, size in reversed(spara):
+            self._entries[key] = (value, size)
+        if aldsta is None:
+            self._db.execute('DELETE FROM results')
+        else:
+            self._db.execute('DELETE FROM results WHERE seq < ?', (aldsta,))
+        self._db.commit()
+
+    def get(self, key):
+        """Det sparade resultatet, eller None. Räknas som träff (hit) eller miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self._db is not None:
+                self._anvanda.pop(key, None)
+                self._anvanda[key] = None
+                if len(self._anvanda) >= SPARA_ORDNING:
+                    self._spara_ordning()
+                    self._db.commit()
+            return entry[0]
+
+    def _spara_ordning(self):
+        # Under self._lock. Ge de använda resultaten nya seq, i den ordning de användes
+        rader = []
+        for key in self._anvanda:
+            self._seq += 1
+            rader.append((self._seq, key))
+        self._db.executemany('UPDATE results SET seq = ? WHERE key = ?', rader)
+        self._anvanda.clear()
+
+    def put(self, key, value):
+        data = jsoncodec.dumpb(value)
+        size = len(data)
+        # Ett resultat som är större än hela cachen sparas inte alls
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            borttagna = []
+            while self.bytes > self.max_bytes:
+                gammal, (_, gammal_size) = self._entries.popitem(last=False)
+                self.bytes -= gammal_size
+                self.evictions += 1
+                borttagna.append((gammal,))
+            if self._db is not None:
+                # Träffarna först: resultatet som sparas nu är det senast använda
+                self._spara_ordning()
+                self._seq += 1
+                self._db.execute('INSERT OR REPLACE INTO results (seq, key, value) VALUES (?, ?, ?)',
+                                 (self._seq, key, data))
+                self._db.executemany('DELETE FROM results WHERE key = ?', borttagna)
+                self._db.commit()
+
+    def close(self):
+        """Skriv ordningen för de senaste träffarna och stäng filen."""
+        with self._lock:
+            if self._db is not None:
+                self._spara_ordning()
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "evictions": self.evictions,
+                "persistent": self._db is not None
+            }
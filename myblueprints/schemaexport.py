@@ -0,0 +1,88 @@
+# myblueprints/schemaexport.py
+# Schemat som iCalendar (.ics, för kalenderprogram) och CSV (för Excel m.fl.).
+# Båda är generatorer som lämnar ifrån sig texten bit för bit (CHUNK_SIZE bokningar åt
+# gången), så ett helt läsårs schema behöver aldrig ligga som en enda stor sträng i minnet.
+# Indata är träffarna från SchemaIndex.query: (post, start, slut).
+import csv
+import io
+import zlib
+from datetime import datetime, timezone
+
+from .streaming import CHUNK_SIZE
+
+CSV_FALT = ('datum', 'tid', 'kurs', 'larare', 'lokal', 'typ')
+
+def csv_chunks(traffar):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FALT)
+    for i, (post, _, _) in enumerate(traffar, 1):
+        writer.writerow([post.get(falt, '') for falt in CSV_FALT])
+        if i % CHUNK_SIZE == 0:
+            # Skicka det vi har och börja om med en tom buffer
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# --- iCalendar (RFC 5545) ---
+# Raderna ska sluta med \r\n och får vara högst 75 byte. Längre rader viks: fortsättningen
+# hamnar på nästa rad som börjar med ett mellanslag. I text måste \ ; , och radbrytningar
+# skrivas med ett \ framför.
+ICS_DATUM = "%Y%m%dT%H%M%S"
+
+def ics_text(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+                .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def ics_rad(namn, varde):
+    rad = f'{namn}:{varde}'.encode('utf-8')
+    delar = []
+    while len(rad) > 75:
+        # Vik inte mitt i ett flerbytetecken (t.ex. å, ä, ö): backa till början av tecknet
+        klipp = 75 if not delar else 74
+        while rad[klipp] & 0xC0 == 0x80:
+            klipp -= 1
+        delar.append(rad[:klipp])
+        rad = rad[klipp:]
+    delar.append(rad)
+    return b'\r\n '.join(delar).decode('utf-8') + '\r\n'
+
+def ics_event(post, start, slut, dtstamp):
+    kurskod = post.get('kurs', '').split('_')[0]
+    # UID ska vara samma för samma bokning varje gång, så att en kalender som
+    # prenumererar uppdaterar händelsen istället för att lägga till en kopia
+    uid = zlib.crc32('|'.join(post.get(falt, '') for falt in CSV_FALT).encode())
+    return ''.join([
+        'BEGIN:VEVENT\r\n',
+        ics_rad('UID', f'{start:{ICS_DATUM}}-{uid:08x}@duschema'),
+        ics_rad('DTSTAMP', dtstamp),
+        # Utan tidszon ("flytande tid") = lokal tid, samma som i TimeEdit
+        ics_rad('DTSTART', f'{start:{ICS_DATUM}}'),
+        ics_rad('DTEND', f'{slut:{ICS_DATUM}}'),
+        ics_rad('SUMMARY', ics_text(f"{kurskod} {post.get('typ', '')}".strip())),
+        ics_rad('LOCATION', ics_text(post.get('lokal', ''))),
+        ics_rad('DESCRIPTION', ics_text(f"Kurs: {post.get('kurs', '')}\nLärare: {post.get('larare', '')}")),
+        'END:VEVENT\r\n',
+    ])
+
+def ics_chunks(traffar, last_modified):
+    # DTSTAMP måste finnas i varje händelse: vi använder när schemat senast ändrades (UTC)
+    dtstamp = datetime.fromtimestamp(last_modified, timezone.utc).strftime(ICS_DATUM) + 'Z'
+    yield ('BEGIN:VCALENDAR\r\n'
+           'VERSION:2.0\r\n'
+           'PRODID:-//duschema//Schema-appen//SV\r\n'
+           'CALSCALE:GREGORIAN\r\n'
+           'X-WR-CALNAME:Schema\r\n'
+           'X-WR-TIMEZONE:Europe/Stockholm\r\n')
+    chunk = []
+    for post, start, slut in traffar:
+        # Bokningar utan datum/tid kan inte bli kalenderhändelser
+        if start is None:
+            continue
+        chunk.append(ics_event(post, start, slut, dtstamp))
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('END:VCALENDAR\r\n')
+    yield ''.join(chunk)
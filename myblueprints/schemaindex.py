@@ -0,0 +1,192 @@
+# myblueprints/schemaindex.py
+# Index över TimeEdit-schemat så att /duschema/query slipper gå igenom alla lektioner.
+# Byggs EN gång per ny version av schemat (se hamta_schema i duschema_bp.py):
+# - datum och tid tolkas till riktiga datetime-värden
+# - lektionerna sorteras på starttid, så ett datumintervall hittas med binärsökning
+#   (bisect) istället för att jämföra varje lektion
+# - för kurs, lärare, lokal och typ finns ett uppslagsverk (dict) värde -> positioner
+#   som ger svaret direkt, oavsett hur stort schemat är
+# - per lokal en sorterad lista med bokningar, för dubbelbokningar och lediga lokaler,
+#   och en sorterad lista med lokalens krockar, så att konflikter(lokal=...) inte går
+#   igenom alla lokalers krockar i tidsintervallet
+import heapq
+from bisect import bisect_left
+from datetime import datetime
+
+# Fälten man kan filtrera på (utöver datum)
+FALT = ('kurs', 'larare', 'lokal', 'typ')
+
+def tolka_tid(post):
+    """(start, slut) som datetime, eller (None, None) om datum/tid saknas i posten."""
+    try:
+        start, _, slut = post['tid'].partition(' - ')
+        return (datetime.strptime(f"{post['datum']} {start}", "%Y-%m-%d %H:%M"),
+                datetime.strptime(f"{post['datum']} {slut}", "%Y-%m-%d %H:%M"))
+    except (KeyError, ValueError):
+        return None, None
+
+def _nycklar(falt, varde):
+    # Sökningar ska inte bry sig om stora/små bokstäver. En kurs som "GMI35S_V3NJJ"
+    # går också att hitta på bara kurskoden "GMI35S" (samma del som schema.html visar)
+    varde = varde.strip().lower()
+    if falt == 'kurs' and '_' in varde:
+        return (varde, varde.split('_')[0])
+    return (varde,)
+
+def _konfliktlista(konflikter):
+    # (krockarna sorterade på start, deras starttider för bisect, längsta krocken)
+    return (konflikter, [k[0] for k in konflikter],
+            max((k[1] - k[0] for k in konflikter), default=None))
+
+_INGA = _konfliktlista([])
+
+class SchemaIndex:
+    def __init__(self, poster, version=None, last_modified=None):
+        # Originalordningen, som /duschema och /duschema/view lämnar ut
+        self.poster = poster
+        # Versionsstämpel och när schemat senast ändrades, för villkorliga GET (ETag)
+        self.version = version
+        self.last_modified = last_modified
+        tider = [tolka_tid(post) for post in poster]
+        # Positioner i starttidsordning. Poster utan tid hamnar sist och har inget datum
+        ordning = sorted((i for i in range(len(poster)) if tider[i][0] is not None),
+                         key=lambda i: tider[i][0])
+        self.utan_tid = len(poster) - len(ordning)
+        ordning += [i for i in range(len(poster)) if tider[i][0] is None]
+
+        self._sorterade = [poster[i] for i in ordning]
+        self._tider = [tider[i] for i in ordning]
+        # Starttiderna i egen lista (bara de med tid) för bisect
+        self._starter = [start for start, _ in self._tider[:len(ordning) - self.utan_tid]]
+
+        self._index = {falt: {} for falt in FALT}
+        for pos, post in enumerate(self._sorterade):
+            for falt in FALT:
+                for nyckel in _nycklar(falt, post.get(falt, '')):
+                    self._index[falt].setdefault(nyckel, []).append(pos)
+        self._bygg_lokaler()
+
+    def __len__(self):
+        return len(self.poster)
+
+    def query(self, fran=None, till=None, **filter):
+        """
+        Lektioner som startar i [fran, till) och matchar alla filter, sorterade på starttid.
+        fran/till är datetime eller None (öppet). filter är t.ex. kurs=['GMI35S'] och ett
+        fält med flera värden matchar om NÅGOT av dem stämmer.
+        Returnerar en lista med (post, start, slut).
+        """
+        if fran is None and till is None:
+            lo, hi = 0, len(self._sorterade)
+        else:
+            # Med datumgräns är poster utan tid uteslutna
+            lo = bisect_left(self._starter, fran) if fran is not None else 0
+            hi = bisect_left(self._starter, till) if till is not None else len(self._starter)
+        if lo >= hi:
+            return []
+
+        # Börja med det minsta urvalet och skär bort det som inte finns i resten
+        urval = None
+        for falt, varden in sorted(filter.items(), key=lambda fv: self._antal(*fv)):
+            if not varden:
+                continue
+            traffar = set()
+            for varde in varden:
+                traffar.update(self._index[falt].get(varde.strip().lower(), ()))
+            urval = traffar if urval is None else urval & traffar
+            if not urval:
+                return []
+
+        if urval is None:
+            positioner = range(lo, hi)
+        else:
+            positioner = sorted(pos for pos in urval if lo <= pos < hi)
+        return [(self._sorterade[pos],) + self._tider[pos] for pos in positioner]
+
+    def _bygg_lokaler(self):
+        # Per lokal: positionerna i starttidsordning, starttiderna (för bisect) och
+        # "senaste slut hittills". Är senaste slut bland bokningarna som börjar före T2
+        # efter T1, så är lokalen upptagen någon gång mellan T1 och T2.
+        self._lokaler = {}
+        for pos in range(len(self._starter)):
+            lokal = self._sorterade[pos].get('lokal', '')
+            if lokal and lokal != 'Saknas':
+                self._lokaler.setdefault(lokal, []).append(pos)
+        self._lokal_starter = {}
+        self._lokal_maxslut = {}
+        konflikter = []
+        for lokal, positioner in self._lokaler.items():
+            starter, maxslut = [], []
+            # Svepet: gå igenom bokningarna i starttidsordning och håll de som fortfarande
+            # pågår i en heap sorterad på sluttid. Allt som redan slutat plockas bort, så
+            # varje ny bokning jämförs bara med dem den faktiskt krockar med.
+            pagaende = []
+            for pos in positioner:
+                start, slut = self._tider[pos]
+                starter.append(start)
+                maxslut.append(max(slut, maxslut[-1]) if maxslut else slut)
+                while pagaende and pagaende[0][0] <= start:
+                    heapq.heappop(pagaende)
+                for annan_slut, annan in pagaende:
+                    konflikter.append((start, min(slut, annan_slut), lokal, annan, pos))
+                heapq.heappush(pagaende, (slut, pos))
+            self._lokal_starter[lokal] = starter
+            self._lokal_maxslut[lokal] = maxslut
+
+        # Alla krockar sorterade på när de börjar, plus den längsta krocken, så att
+        # konflikter(fran, till) kan binärsöka fram sitt intervall. Samma sak per lokal
+        # (utan hänsyn till stora/små bokstäver), så att en fråga om en lokal bara går
+        # igenom den lokalens krockar
+        konflikter.sort(key=lambda k: k[0])
+        self._konflikter = _konfliktlista(konflikter)
+        per_lokal = {}
+        for konflikt in konflikter:
+            per_lokal.setdefault(konflikt[2].lower(), []).append(konflikt)
+        self._lokal_konflikter = {lokal: _konfliktlista(lista) for lokal, lista in per_lokal.items()}
+
+    def lokaler(self):
+        """Alla lokaler som förekommer i schemat, sorterade."""
+        return sorted(self._lokaler)
+
+    def ar_ledig(self, lokal, fran, till):
+        """True om lokalen inte har någon bokning som överlappar [fran, till)."""
+        # Bokningarna som startar före till ligger först i listan (bisect hittar gränsen).
+        # Den som slutar senast av dem avgör, ingen annan bokning behöver tittas på.
+        i = bisect_left(self._lokal_starter.get(lokal, ()), till)
+        return i == 0 or self._lokal_maxslut[lokal][i - 1] <= fran
+
+    def lediga_lokaler(self, fran, till):
+        """(lediga, upptagna): lokalerna utan respektive med bokning mellan fran och till."""
+        lediga, upptagna = [], []
+        for lokal in self.lokaler():
+            (lediga if self.ar_ledig(lokal, fran, till) else upptagna).append(lokal)
+        return lediga, upptagna
+
+    def konflikter(self, fran=None, till=None, lokal=None):
+        """
+        Dubbelbokningar: två bokningar i samma lokal som överlappar i tid.
+        Returnerar (krock_start, krock_slut, lokal, post_a, post_b) för krockar som
+        överlappar [fran, till), sorterade på när krocken börjar.
+        """
+        if lokal is None:
+            konflikter, starter, langsta = self._konflikter
+        else:
+            konflikter, starter, langsta = self._lokal_konflikter.get(lokal.strip().lower(), _INGA)
+        lo, hi = 0, len(konflikter)
+        if till is not None:
+            hi = bisect_left(starter, till)
+        if fran is not None and langsta is not None:
+            # En krock som slutar efter fran kan inte ha börjat mer än den längsta
+            # krockens längd innan fran
+            lo = bisect_left(starter, fran - langsta)
+        svar = []
+        for start, slut, krock_lokal, a, b in konflikter[lo:hi]:
+            if fran is not None and slut <= fran:
+                continue
+            svar.append((start, slut, krock_lokal, self._sorterade[a], self._sorterade[b]))
+        return svar
+
+    def _antal(self, falt, varden):
+        if falt not in self._index:
+            raise ValueError(f"Okänt fält: {falt}")
+        return sum(len(self._index[falt].get(v.strip().lower(), ())) for v in varden or ())
@@ -0,0 +1,80 @@
+# myblueprints/streaming.py
+# Strömmade JSON-svar. jsonify(lista) bygger hela svaret som EN sträng innan första byten
+# skickas. Här skickar vi istället svaret bit för bit från en generator, så minnet per
+# anrop håller sig lika litet oavsett hur många vänner som finns.
+#
+# Accept: application/json      -> en vanlig JSON-lista: [{...},{...}]
+# Accept: application/x-ndjson  -> en JSON-rad per vän (newline delimited JSON)
+from flask import Response, request, stream_with_context
+
+from . import jsoncodec
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Hur många poster vi samlar ihop innan en bit skickas (färre, större skrivningar)
+CHUNK_SIZE = 100
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def json_array_chunks(items):
+    yield '['
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(jsoncodec.dumps(item))
+        if len(chunk) >= CHUNK_SIZE:
+            yield ('' if first else ',') + ','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']'
+
+def ndjson_chunks(items):
+    chunk = []
+    for item in items:
+        chunk.append(jsoncodec.dumps(item) + '\n')
+        if len(chunk) >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def stream_items(items, status=200, headers=None):
+    """Gör ett strömmat Response av en lista/generator med dicts."""
+    if wants_ndjson():
+        chunks, mimetype = ndjson_chunks(items), NDJSON_MIMETYPE
+    else:
+        chunks, mimetype = json_array_chunks(items), 'application/json'
+    # stream_with_context: generatorn får tillgång till request även när den körs
+    return Response(stream_with_context(chunks), status=status, headers=headers, mimetype=mimetype)
+
+def stream_text(chunks, mimetype, headers=None):
+    """Gör ett strömmat Response av en generator med färdig text (t.ex. CSV eller iCalendar)."""
+    return Response(stream_with_context(chunks), headers=headers, mimetype=mimetype)
+
+# --- Server-Sent Events (text/event-stream) ---
+# Webbläsarens EventSource håller ett anrop öppet och tar emot händelser i formatet
+#   id: 42
+#   event: update
+#   data: {...}
+# med en tom rad efter varje händelse. Tappas anslutningen kopplar webbläsaren upp
+# igen av sig själv och skickar senaste id i headern Last-Event-ID.
+SSE_MIMETYPE = 'text/event-stream'
+
+def sse_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append('data: ' + jsoncodec.dumps(data))
+    return '\n'.join(lines) + '\n\n'
+
+def stream_events(chunks):
+    """Gör ett SSE-Response av en generator med färdiga händelser (se sse_event)."""
+    # X-Accel-Buffering: no ber t.ex. nginx att inte samla ihop svaret innan det skickas
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(chunks), headers=headers, mimetype=SSE_MIMETYPE)
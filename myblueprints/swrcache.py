@@ -0,0 +1,68 @@
+# myblueprints/swrcache.py
+# Cache med "stale-while-revalidate" för data som vi hämtar från andra webbplatser.
+# - Färsk data (yngre än ttl sekunder) lämnas ut direkt.
+# - Gammal data lämnas OCKSÅ ut direkt, men då startas en hämtning i bakgrunden så att
+#   nästa anrop får ny data. Besökaren behöver alltså aldrig vänta på den andra sidan.
+# - Finns ingen data alls (första anropet) måste vi vänta. Kommer många anrop samtidigt
+#   gör bara ETT av dem hämtningen, de andra väntar på samma resultat ("coalescing").
+# - Misslyckas en bakgrundshämtning behåller vi den gamla datan och försöker igen
+#   tidigast efter retry_after sekunder.
+import threading
+import time
+
+class SWRCache:
+    def __init__(self, fetch, ttl, retry_after=30):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = None
+        self._failed_at = None
+        # Ett Event medan en hämtning pågår (None annars), de som väntar gör wait() på det
+        self._refreshing = None
+        self.last_error = None
+
+    def get(self):
+        """Returnerar (värde, hämtat_tidpunkt). Kastar hämtningens fel om ingen data finns."""
+        with self._lock:
+            if self._fetched_at is not None:
+                now = time.time()
+                stale = now - self._fetched_at >= self.ttl
+                recently_failed = self._failed_at is not None and now - self._failed_at < self.retry_after
+                if stale and self._refreshing is None and not recently_failed:
+                    self._refreshing = threading.Event()
+                    threading.Thread(target=self._refresh, daemon=True).start()
+                return self._value, self._fetched_at
+            # Ingen data: den första hämtar, övriga väntar på den
+            waiting = self._refreshing
+            if waiting is None:
+                self._refreshing = threading.Event()
+        if waiting is None:
+            self._refresh()
+        else:
+            waiting.wait()
+        with self._lock:
+            if self._fetched_at is None:
+                raise self.last_error
+            return self._value, self._fetched_at
+
+    def _refresh(self):
+        value, error, ok = None, None, False
+        try:
+            value, ok = self.fetch(), True
+        except Exception as e:
+            error = e
+        finally:
+            # Alltid, även om hämtningen avbröts med något annat än Exception (t.ex.
+            # KeyboardInterrupt): annars skulle nyckeln räknas som "hämtas" för alltid
+            # och ingen skulle någonsin försöka igen.
+            with self._lock:
+                if ok:
+                    self._value, self._fetched_at, self._failed_at = value, time.time(), None
+                else:
+                    self._failed_at = time.time()
+                    error = error or RuntimeError('Hämtningen avbröts')
+                self.last_error = error
+                done, self._refreshing = self._refreshing, None
+            done.set()
@@ -0,0 +1,36 @@
+# tests/conftest.py
+# Gemensamt för testerna. Kör från projektets rot:  python -m pytest -q
+import os
+import sys
+
+import pytest
+
+# Så att "import myblueprints" fungerar även när pytest startas från en annan katalog
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from myblueprints import jsoncodec
+
+FRIENDS = [
+    {"id": 1, "name": "Harvey Specter", "email": "harvey@law.com", "status": "Awesome"},
+    {"id": 2, "name": "Mike Ross", "email": "mike@law.com", "status": "Kompis"},
+    {"id": 3, "name": "Donna Paulsen", "email": "donna@law.com", "status": "Kompis"},
+]
+
+@pytest.fixture(scope='session')
+def app_dir(tmp_path_factory):
+    # flask_app läser friends.json m.m. från arbetskatalogen, så den körs i en egen katalog
+    path = tmp_path_factory.mktemp('app')
+    old_cwd = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(old_cwd)
+
+@pytest.fixture
+def client(app_dir):
+    """Testklient för hela appen (alla versioner), med FRIENDS i friends.json."""
+    # Ny fil (nytt inode) -> repositoryt märker ändringen och läser om den
+    jsoncodec.write_file('friends.json.new', FRIENDS)
+    os.replace('friends.json.new', 'friends.json')
+    import flask_app
+    flask_app.app.testing = True
+    return flask_app.app.test_client()
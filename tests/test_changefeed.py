@@ -0,0 +1,49 @@
+# tests/test_changefeed.py
+# Ändringsflödet sparar bara de senaste max_events händelserna. Den som frågar efter något
+# äldre (eller okänt) ska få None ("ladda om allt"), aldrig en lucka i händelserna.
+import threading
+
+from myblueprints.repositories.changefeed import MAX_EVENTS, FriendChangeFeed
+from myblueprints.repositories.changenotifier import ChangeNotifier
+
+def make_feed(changes):
+    repo = ChangeNotifier()
+    feed = FriendChangeFeed(repo)
+    for i in range(1, changes + 1):
+        repo._notify('update', i, {"id": i, "name": f"Vän {i}"})
+    return repo, feed
+
+def test_events_since_after_the_ring_wraps():
+    total = MAX_EVENTS + 500
+    repo, feed = make_feed(total)
+    assert feed.seq == total
+    # De 500 första har fallit ur kön: den som bara sett upp till 499 har missat 500
+    assert feed.events_since(0) == (None, total)
+    assert feed.events_since(499) == (None, total)
+    events, seq = feed.events_since(500)
+    assert seq == total
+    assert [event[0] for event in events] == list(range(501, total + 1))
+    assert events[0] == (501, 'update', 501, {"id": 501, "name": "Vän 501"})
+    events, _ = feed.events_since(total - 2)
+    assert [event[0] for event in events] == [total - 1, total]
+    assert feed.events_since(total) == ([], total)
+    # Ett nummer från framtiden (t.ex. från före en omstart) är också okänt
+    assert feed.events_since(total + 1) == (None, total)
+
+def test_events_are_copies():
+    repo = ChangeNotifier()
+    feed = FriendChangeFeed(repo)
+    friend = {"id": 1, "name": "Harvey"}
+    repo._notify('add', 1, friend)
+    friend['name'] = "Ändrad efteråt"
+    repo._notify('delete', 1)
+    events, _ = feed.events_since(0)
+    assert events == [(1, 'add', 1, {"id": 1, "name": "Harvey"}), (2, 'delete', 1, None)]
+
+def test_waiting_reader_wakes_up_on_change():
+    repo, feed = make_feed(3)
+    timer = threading.Timer(0.05, repo._notify, ('delete', 2))
+    timer.start()
+    events, seq = feed.events_since(3, timeout=10)
+    timer.join()
+    assert (events, seq) == ([(4, 'delete', 2, None)], 4)
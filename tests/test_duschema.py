@@ -0,0 +1,158 @@
+# tests/test_duschema.py
+# /duschema med det sparade schemat i tests/fixtures istället för TimeEdit.
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from myblueprints import duschema_bp
+from myblueprints.schemaindex import SchemaIndex
+from myblueprints.swrcache import SWRCache
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+@pytest.fixture
+def schema(monkeypatch):
+    def fetch():
+        with open(os.path.join(FIXTURES, 'duschema.html'), 'rb') as f:
+            return SchemaIndex(duschema_bp.tolka_schema(f.read()), version='test', last_modified=0)
+    monkeypatch.setattr(duschema_bp, 'schema_cache', SWRCache(fetch, ttl=60))
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    def fetch():
+        raise ConnectionError('TimeEdit svarar inte')
+    monkeypatch.setattr(duschema_bp, 'schema_cache', SWRCache(fetch, ttl=60))
+
+def test_query_by_date(client, schema):
+    response = client.get('/duschema/query?fran=2026-01-26&till=2026-01-26')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 16 and body['total'] == 79
+    assert {post['datum'] for post in body['schema']} == {'2026-01-26'}
+
+@pytest.mark.parametrize('url', [
+    '/duschema/query?fran=2026-01-26T08:00%2B01:00',
+    '/duschema/query?till=2026-01-27T10:00Z',
+    '/duschema/free?fran=2026-01-26T08:00%2B01:00&till=2026-01-26T10:00%2B01:00',
+    '/duschema/free?fran=2026-01-26T08:00&till=2026-01-26T10:00Z',
+    '/duschema/export.csv?fran=2026-01-26T08:00Z',
+])
+def test_time_zone_is_rejected(client, schema, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": duschema_bp.DATUM_FEL}
+
+def test_free_rooms(client, schema):
+    response = client.get('/duschema/free?fran=2026-01-26T08:00&till=2026-01-26T10:00')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['fran'] == '2026-01-26 08:00' and body['till'] == '2026-01-26 10:00'
+    assert 'B302' in body['busy']
+
+def test_fetch_error_is_logged_not_returned(client, unreachable, caplog):
+    for url in ['/duschema/', '/duschema/query', '/duschema/free?fran=2026-01-26&till=2026-01-27',
+                '/duschema/export.csv']:
+        response = client.get(url)
+        assert response.status_code == 500
+        assert response.get_json() == {"error": "Kunde inte hämta schemat från TimeEdit"}
+    # Felet står i loggen, inte i svaret
+    assert 'TimeEdit svarar inte' in caplog.text
+    assert client.get('/duschema/view').status_code == 200
+
+def test_timeout_is_a_504(client, monkeypatch):
+    def fetch():
+        raise requests.exceptions.ReadTimeout('read timed out')
+    monkeypatch.setattr(duschema_bp, 'schema_cache', SWRCache(fetch, ttl=60))
+    response = client.get('/duschema/')
+    assert response.status_code == 504
+    assert 'read timed out' not in response.get_data(as_text=True)
+
+# --- Mot en lokal "TimeEdit" som svarar med ETag och 304 ---
+
+class TimeEdit(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    page = b''
+    etag = '"v1"'
+    status = 200
+    requests = []
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests.append(dict(self.headers))
+        if cls.status != 200:
+            self.send_response(cls.status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == cls.etag:
+            self.send_response(304)
+            self.send_header('ETag', cls.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', cls.etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(cls.page)))
+        self.end_headers()
+        self.wfile.write(cls.page)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def timeedit(monkeypatch):
+    with open(os.path.join(FIXTURES, 'duschema.html'), 'rb') as f:
+        TimeEdit.page = f.read()
+    TimeEdit.etag, TimeEdit.status, TimeEdit.requests = '"v1"', 200, []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TimeEdit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(duschema_bp, 'BASE_URL', f'http://127.0.0.1:{server.server_port}/schema.html')
+    monkeypatch.setattr(duschema_bp, '_senaste', {"schema": None, "etag": None, "last_modified": None})
+    # ttl=0: varje anrop startar en förnyelse i bakgrunden, retry_after=0: även efter ett fel
+    cache = SWRCache(duschema_bp.hamta_schema, ttl=0, retry_after=0)
+    monkeypatch.setattr(duschema_bp, 'schema_cache', cache)
+    yield cache
+    server.shutdown()
+    server.server_close()
+
+def wait_for_refresh(cache):
+    while cache._refreshing is not None:
+        time.sleep(0.01)
+
+def test_json_and_view_share_one_fetch(client, timeedit):
+    timeedit.ttl = 60
+    assert len(client.get('/duschema/').get_json()['schema']) == 79
+    view = client.get('/duschema/view')
+    assert view.status_code == 200 and 'GMI35S' in view.get_data(as_text=True)
+    assert len(TimeEdit.requests) == 1
+
+def test_unchanged_schedule_costs_a_304(client, timeedit):
+    first = client.get('/duschema/').get_json()
+    schema = duschema_bp._senaste["schema"]
+    # Gammal data direkt, förnyelsen skickar If-None-Match och får 304
+    assert client.get('/duschema/').get_json()['schema'] == first['schema']
+    wait_for_refresh(timeedit)
+    assert TimeEdit.requests[-1]['If-None-Match'] == '"v1"'
+    assert duschema_bp._senaste["schema"] is schema
+    # En ny version av sidan hämtas och tolkas
+    TimeEdit.etag, TimeEdit.page = '"v2"', TimeEdit.page.replace(b'GMI35S_V3NJJ', b'NY101_V26')
+    client.get('/duschema/')
+    wait_for_refresh(timeedit)
+    kurser = {post['kurs'] for post in client.get('/duschema/').get_json()['schema']}
+    assert 'NY101_V26' in kurser and 'GMI35S_V3NJJ' not in kurser
+
+def test_last_good_copy_is_served_when_timeedit_fails(client, timeedit):
+    first = client.get('/duschema/').get_json()
+    TimeEdit.status = 500
+    for _ in range(3):
+        response = client.get('/duschema/')
+        assert response.status_code == 200
+        assert response.get_json()['schema'] == first['schema']
+        wait_for_refresh(timeedit)
+    assert timeedit.last_error is not None
+    assert 'GMI35S' in client.get('/duschema/view').get_data(as_text=True)
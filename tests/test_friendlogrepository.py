@@ -0,0 +1,135 @@
+# tests/test_friendlogrepository.py
+# Återställning av logg-lagringen efter krascher: halv sista rad, en rad som inte går att
+# spela upp och en komprimering som avbröts.
+import os
+import shutil
+
+import pytest
+
+from myblueprints import jsoncodec
+from myblueprints.repositories.friendlogrepository import FriendLogRepository
+
+FRIENDS = [
+    {"id": 1, "name": "Harvey Specter", "email": "harvey@law.com", "status": "Awesome"},
+    {"id": 2, "name": "Mike Ross", "email": "mike@law.com", "status": "Kompis"},
+]
+
+@pytest.fixture
+def paths(tmp_path):
+    json_path = str(tmp_path / 'friends.json')
+    jsoncodec.write_file(json_path, FRIENDS)
+    return json_path, json_path + '.log'
+
+def reopen(json_path):
+    repo = FriendLogRepository(json_path)
+    friends = repo.get_all()
+    repo.close()
+    return friends
+
+def write_log(log_path, *lines):
+    with open(log_path, 'ab') as f:
+        for line in lines:
+            f.write(line if isinstance(line, bytes) else jsoncodec.dumpb(line) + b'\n')
+
+def test_add_with_bad_id_is_not_logged(paths):
+    json_path, log_path = paths
+    repo = FriendLogRepository(json_path)
+    for bad_id in ("x1", None, True, [1]):
+        with pytest.raises(ValueError):
+            repo.add({"id": bad_id, "name": "A"})
+    with pytest.raises(ValueError):
+        repo.add_many([{"id": 3, "name": "C"}, {"id": "x2", "name": "D"}])
+    repo.close()
+    # Ingenting skrevs, inte ens den giltiga vännen i add_many
+    assert os.path.getsize(log_path) == 0
+    assert [f['id'] for f in reopen(json_path)] == [1, 2]
+
+def test_truncated_tail_is_dropped(paths):
+    json_path, log_path = paths
+    repo = FriendLogRepository(json_path)
+    repo.add({"id": 3, "name": "Louis Litt"})
+    repo.close()
+    good_size = os.path.getsize(log_path)
+    # Processen dog mitt i nästa skrivning: raden saknar slut och radbrytning
+    write_log(log_path, b'{"op": "add", "friend": {"id": 4, "na')
+
+    assert [f['id'] for f in reopen(json_path)] == [1, 2, 3]
+    assert os.path.getsize(log_path) == good_size
+
+def test_poisoned_record_is_quarantined(paths):
+    json_path, log_path = paths
+    poisoned = {"op": "add", "friend": {"id": "x1", "name": "A"}}
+    write_log(log_path,
+              {"op": "add", "friend": {"id": 3, "name": "Louis Litt"}},
+              poisoned,
+              b'not json\n',
+              {"op": "update", "id": 1, "updates": {"status": "Boss"}})
+
+    friends = reopen(json_path)
+    assert [f['id'] for f in friends] == [1, 2, 3]
+    assert friends[0]['status'] == "Boss"
+    # De trasiga raderna ligger i karantän, loggen är tömd och allt finns i snapshoten
+    with open(log_path + '.rejected', 'rb') as f:
+        assert f.read() == jsoncodec.dumpb(poisoned) + b'\nnot json\n'
+    assert os.path.getsize(log_path) == 0
+    assert [f['id'] for f in jsoncodec.read_file(json_path)] == [1, 2, 3]
+    # Och nästa start går lika bra
+    assert [f['id'] for f in reopen(json_path)] == [1, 2, 3]
+
+def test_crash_before_snapshot_is_replaced(paths):
+    json_path, log_path = paths
+    repo = FriendLogRepository(json_path)
+    repo.add({"id": 3, "name": "Louis Litt"})
+    repo.delete(1)
+    repo.close()
+    # Komprimeringen hann flytta loggen och börja på en ny snapshot, sedan kraschade vi
+    os.replace(log_path, log_path + '.old')
+    with open(json_path + '.tmp', 'wb') as f:
+        f.write(b'[{"id": 2, "na')
+    write_log(log_path, {"op": "update", "id": 2, "updates": {"status": "Boss"}})
+
+    friends = reopen(json_path)
+    assert [(f['id'], f.get('status')) for f in friends] == [(2, "Boss"), (3, None)]
+    assert not os.path.exists(log_path + '.old')
+    assert [f['id'] for f in jsoncodec.read_file(json_path)] == [2, 3]
+
+def test_crash_after_snapshot_is_replaced(paths):
+    json_path, log_path = paths
+    repo = FriendLogRepository(json_path)
+    repo.add({"id": 3, "name": "Louis Litt"})
+    repo.update(3, {"status": "Kompis"})
+    repo.delete(2)
+    repo.close()
+    shutil.copy(log_path, log_path + '.saved')
+    repo = FriendLogRepository(json_path)
+    repo.compact()
+    repo.close()
+    # Ny snapshot skriven men den gamla loggen hann inte tas bort: spelas upp igen
+    os.replace(log_path + '.saved', log_path + '.old')
+
+    friends = reopen(json_path)
+    assert [(f['id'], f.get('status')) for f in friends] == [(1, "Awesome"), (3, "Kompis")]
+    assert not os.path.exists(log_path + '.old')
+
+def fail_snapshot(table, done_logs):
+    raise OSError("disk full")
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_compaction_after_a_failed_one_keeps_its_log(paths, monkeypatch):
+    json_path, log_path = paths
+    repo = FriendLogRepository(json_path)
+    repo.add({"id": 3, "name": "Louis Litt"})
+    # Första komprimeringen misslyckas (t.ex. full disk): den gamla loggen blir kvar
+    write_snapshot = repo._write_snapshot
+    monkeypatch.setattr(repo, '_write_snapshot', fail_snapshot)
+    repo.compact()
+    assert os.path.exists(log_path + '.old')
+    monkeypatch.setattr(repo, '_write_snapshot', write_snapshot)
+    repo.update(3, {"status": "Kompis"})
+    repo.compact()
+    repo.close()
+    assert not os.path.exists(log_path + '.old')
+    assert os.path.getsize(log_path) == 0
+    expected = [(1, "Awesome"), (2, "Kompis"), (3, "Kompis")]
+    assert [(f['id'], f.get('status')) for f in jsoncodec.read_file(json_path)] == expected
+    assert [(f['id'], f.get('status')) for f in reopen(json_path)] == expected
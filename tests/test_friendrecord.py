@@ -0,0 +1,92 @@
+# tests/test_friendrecord.py
+# FriendTable ska bete sig som en vanlig dict {id: vän}: samma vänner och värden tillbaka,
+# även efter många ändringar och efter att texten packats om (_maybe_compact).
+import random
+
+import pytest
+
+from myblueprints.repositories import friendrecord
+from myblueprints.repositories.friendrecord import FriendTable
+from myblueprints.repositories.friendrepository import normalize_email
+
+STATUSES = ["Kompis", "Awesome", None, 1, True, [1, 2], {"a": 1}]
+
+def random_friend(rnd, friend_id):
+    friend = {"id": friend_id, "name": rnd.choice(["Anna", "Bo Ek", "Åsa Öberg", "", "\ud800", 7, None]),
+              "email": f" E{rnd.randint(0, 200)}@Law.com", "status": rnd.choice(STATUSES)}
+    if rnd.random() < 0.2:
+        del friend["email"]
+    if rnd.random() < 0.2:
+        friend["age"] = rnd.randint(1, 99)
+    return friend
+
+def check(table, model):
+    assert list(table.ids) == sorted(model)
+    assert list(table.rows()) == [model[friend_id] for friend_id in sorted(model)]
+    for status in ("Kompis", "Awesome", 1, True):
+        assert list(table.status_ids(status)) == \
+            [i for i in sorted(model) if type(model[i].get("status")) is type(status) and model[i].get("status") == status]
+    for n in (0, 5, 17):
+        email = f"e{n}@law.com"
+        assert table.email_owners(email) == \
+            [i for i in sorted(model) if model[i].get("email") is not None and normalize_email(model[i]["email"]) == email]
+
+def test_table_behaves_like_a_dict(monkeypatch):
+    # Liten gräns så att _blob packas om många gånger under testet
+    monkeypatch.setattr(friendrecord, "COMPACT_MIN_BYTES", 256)
+    rnd = random.Random(5)
+    model = {i: random_friend(rnd, i) for i in rnd.sample(range(1, 400), 150)}
+    table = FriendTable.from_dicts(list(model.values()), normalize_email, 1)
+    check(table, model)
+    for version in range(2, 3000):
+        friend_id = rnd.randint(1, 400)
+        op = rnd.random()
+        if op < 0.3:
+            assert table.remove(friend_id) == model.pop(friend_id, None)
+        elif op < 0.6 and friend_id in model:
+            updates = {key: value for key, value in random_friend(rnd, friend_id).items() if rnd.random() < 0.5}
+            model[friend_id].update(updates)
+            assert table.update(friend_id, updates, version) == model[friend_id]
+        else:
+            model[friend_id] = random_friend(rnd, friend_id)
+            table.put(dict(model[friend_id]), version)
+        assert table.version(friend_id) == (version if friend_id in model else None)
+        if version % 200 == 0:
+            check(table, model)
+    check(table, model)
+
+def test_snapshot_is_not_affected_by_later_changes():
+    friends = [{"id": 1, "name": "Harvey", "status": "Kompis", "extra": [1]}, {"id": 2, "name": "Mike"}]
+    table = FriendTable.from_dicts(friends, normalize_email, 1)
+    snapshot = table.snapshot()
+    table.update(1, {"name": "Louis", "extra": [2]}, 2)
+    table.remove(2)
+    table.put({"id": 3, "name": "Donna"}, 3)
+    assert list(snapshot.rows()) == friends
+
+def test_last_duplicate_wins_and_ids_must_be_integers():
+    table = FriendTable.from_dicts([{"id": 2, "name": "a"}, {"id": 1}, {"id": 2, "name": "b"}], normalize_email, 1)
+    assert list(table.rows()) == [{"id": 1}, {"id": 2, "name": "b"}]
+    assert table.get("1") is None and 1 in table and True not in table
+    for bad_id in ("1", True, 2 ** 63):
+        with pytest.raises(ValueError):
+            FriendTable.from_dicts([{"id": bad_id}], normalize_email, 1)
+
+@pytest.mark.parametrize('shuffle', [False, True])
+def test_from_a_generator_in_any_order(shuffle):
+    rnd = random.Random(7)
+    friends = [random_friend(rnd, rnd.randint(1, 300)) for _ in range(400)]
+    if not shuffle:
+        # Sorterad utan dubbletter, som en fil vi själva har skrivit
+        friends = list({f["id"]: f for f in sorted(friends, key=lambda f: f["id"])}.values())
+    model = {}
+    for friend in friends:
+        model[friend["id"]] = friend
+    table = FriendTable.from_dicts((dict(friend) for friend in friends), normalize_email, 1)
+    check(table, model)
+    # Tabellen går att ändra som vanligt efteråt
+    table.put({"id": 1000, "name": "Ny", "email": "e5@law.com"}, 2)
+    model[1000] = {"id": 1000, "name": "Ny", "email": "e5@law.com"}
+    table.remove(min(model))
+    del model[min(model)]
+    check(table, model)
@@ -0,0 +1,146 @@
+# tests/test_friendrepository.py
+# Samma beteende oavsett lagring: json (med cache), logg och SQLite.
+import pytest
+
+from myblueprints import jsoncodec
+from myblueprints.repositories.friendrepository import FriendConflictError, FriendRepository
+from myblueprints.repositories.friendlogrepository import FriendLogRepository
+from myblueprints.repositories.friendsqliterepository import FriendSQLiteRepository
+
+FRIENDS = [
+    {"id": 1, "name": "Harvey Specter", "email": "harvey@law.com", "status": "Awesome"},
+    {"id": 2, "name": "Mike Ross", "email": "mike@law.com", "status": "Kompis"},
+    {"id": 3, "name": "Donna Paulsen", "email": "donna@law.com", "status": "Kompis"},
+]
+
+@pytest.fixture(params=['json', 'log', 'sqlite'])
+def repo(request, tmp_path):
+    json_path = tmp_path / 'friends.json'
+    jsoncodec.write_file(json_path, FRIENDS)
+    if request.param == 'json':
+        yield FriendRepository(str(json_path), cache=True)
+    elif request.param == 'log':
+        repo = FriendLogRepository(str(json_path))
+        yield repo
+        repo.close()
+    else:
+        repo = FriendSQLiteRepository(str(tmp_path / 'friends.db'))
+        repo.import_json(str(json_path))
+        yield repo
+        repo.close()
+
+def test_update_keeps_id(repo):
+    # Ett id bland ändringarna får inte flytta vännen (indexen bygger på id)
+    updated = repo.update(1, {"id": 99, "name": "Harvey"})
+    assert updated['id'] == 1
+    assert repo.get_by_id(1)['name'] == "Harvey"
+    assert repo.get_by_id(99) is None
+    assert [f['id'] for f in repo.get_all()] == [1, 2, 3]
+
+def test_update_many_keeps_id(repo):
+    repo.update_many({2: {"id": 77, "status": "Awesome"}})
+    assert repo.get_by_id(2)['status'] == "Awesome"
+    assert repo.get_by_id(77) is None
+    assert [f['id'] for f in repo.get_by_status("Awesome")] == [1, 2]
+
+def test_add_with_taken_email_is_a_conflict(repo):
+    with pytest.raises(FriendConflictError):
+        repo.add({"id": 4, "name": "Harvey Två", "email": " Harvey@LAW.com"})
+    with pytest.raises(FriendConflictError):
+        repo.add_many([{"id": 4, "email": "louis@law.com"}, {"id": 5, "email": "LOUIS@law.com"}])
+    # Ingenting sparades och e-postindexet pekar fortfarande rätt
+    assert [f['id'] for f in repo.get_all()] == [1, 2, 3]
+    assert repo.get_by_email("harvey@law.com")['id'] == 1
+
+def test_update_to_taken_email_is_a_conflict(repo):
+    with pytest.raises(FriendConflictError):
+        repo.update(2, {"email": "DONNA@law.com"})
+    with pytest.raises(FriendConflictError):
+        repo.update_many({1: {"status": "Boss"}, 2: {"email": "harvey@law.com"}})
+    assert repo.get_by_id(1)['status'] == "Awesome"
+    assert repo.get_by_email("donna@law.com")['id'] == 3
+    assert repo.get_by_email("mike@law.com")['id'] == 2
+    # Samma e-post i annan stil hos samma vän är ingen krock
+    assert repo.update(2, {"email": "Mike@Law.com"})['email'] == "Mike@Law.com"
+
+def test_add_with_taken_id_is_a_conflict(repo):
+    with pytest.raises(FriendConflictError, match="ID already exists"):
+        repo.add({"id": 1, "name": "Louis Litt", "email": "louis@law.com"})
+    with pytest.raises(FriendConflictError):
+        repo.add_many([{"id": 4, "name": "Louis Litt"}, {"id": 2, "name": "Rachel Zane"}])
+    # Ingenting skrevs över och ingenting lades till
+    assert repo.get_all() == FRIENDS
+
+def test_bulk_create_update_delete(repo):
+    new = [{"id": 5, "name": "Louis Litt", "email": "louis@law.com"},
+           {"id": 4, "name": "Rachel Zane", "email": "rachel@law.com", "status": "Kompis"}]
+    assert repo.add_many([dict(f) for f in new]) == new
+    assert [f['id'] for f in repo.get_all()] == [1, 2, 3, 4, 5]
+    updated = repo.update_many({2: {"status": "Boss"}, 4: {"email": "zane@law.com"}, 99: {"status": "X"}})
+    assert sorted((f['id'], f['status'] if f['id'] == 2 else f['email']) for f in updated) == \
+        [(2, "Boss"), (4, "zane@law.com")]
+    assert repo.get_by_email("zane@law.com")['id'] == 4
+    assert repo.get_by_id(2)['status'] == "Boss"
+    assert sorted(repo.delete_many([1, 5, 5, 99])) == [1, 5]
+    assert [f['id'] for f in repo.get_all()] == [2, 3, 4]
+    # Den borttagna vännens e-post är ledig igen
+    repo.add({"id": 6, "name": "Harvey Två", "email": "harvey@law.com"})
+
+def test_email_filter_ignores_case(repo):
+    friends, _ = repo.get_page(filters={"email": "HARVEY@law.com"})
+    assert [f['id'] for f in friends] == [1]
+    assert [f['id'] for f in repo.iter_friends(filters={"email": " donna@LAW.com "})] == [3]
+
+def test_missing_file_is_read_once(tmp_path):
+    # Ingen friends.json: samma version varje gång, och ingen 'reset' efter den första läsningen
+    repo = FriendRepository(str(tmp_path / 'friends.json'), cache=True)
+    resets = []
+    repo.subscribe(lambda op, *args: resets.append(op))
+    assert repo.get_all() == []
+    version = repo.get_version()
+    assert repo.get_all() == [] and repo.get_version() == version
+    assert resets == ['reset']
+    repo.add({"id": 1, "name": "Harvey"})
+    assert repo.get_version() != version and [f['id'] for f in repo.get_all()] == [1]
+
+def test_email_conflict_ignores_case_outside_ascii(repo):
+    repo.add({"id": 4, "name": "Örjan", "email": "Örjan@x.se"})
+    with pytest.raises(FriendConflictError):
+        repo.add({"id": 5, "name": "Örjan Två", "email": " örjan@X.se"})
+    assert repo.get_by_email("ÖRJAN@x.se")['id'] == 4
+
+def test_null_values_are_kept(repo):
+    # null är inte samma sak som att fältet saknas
+    friend = {"id": 4, "name": None, "email": None, "status": None, "age": None}
+    repo.add(dict(friend))
+    assert repo.get_by_id(4) == friend
+    assert repo.update(4, {"name": "Louis Litt", "status": None}) == dict(friend, name="Louis Litt")
+    assert repo.get_by_id(4) == dict(friend, name="Louis Litt")
+    assert repo.get_all()[-1] == dict(friend, name="Louis Litt")
+
+def test_values_keep_their_type(repo):
+    # Inga TEXT-kolumner som gör om 7 till "7", och listor/dicts går att spara
+    friend = {"id": 4, "name": ["Louis", "Litt"], "email": "louis@law.com", "status": 7,
+              "tags": {"team": "Pearson"}}
+    repo.add(dict(friend))
+    assert repo.get_by_id(4) == friend
+    assert repo.update(4, {"status": {"level": 2}}) == dict(friend, status={"level": 2})
+    assert repo.get_by_id(4) == dict(friend, status={"level": 2})
+    assert repo.get_by_email("LOUIS@law.com")['id'] == 4
+
+@pytest.mark.parametrize('repo_class', [lambda path: FriendRepository(path, cache=True), FriendLogRepository])
+def test_friends_without_valid_id_are_quarantined(tmp_path, caplog, repo_class):
+    # En äldre friends.json kan ha id som inte är heltal. Resten ska gå att använda.
+    path = str(tmp_path / 'friends.json')
+    bad = [{"id": "7", "name": "Sträng"}, {"id": True, "name": "Bool"}, {"name": "Inget id"}, "inte en vän"]
+    jsoncodec.write_file(path, [FRIENDS[0], *bad, FRIENDS[1]])
+    repo = repo_class(path)
+    assert [f['id'] for f in repo.get_all()] == [1, 2]
+    assert "4 friend(s)" in caplog.text
+    with open(path + '.rejected', 'rb') as f:
+        assert [jsoncodec.loads(line) for line in f] == bad
+    # Nästa skrivning tar bara med de giltiga, men de andra finns kvar i .rejected
+    repo.add({"id": 3, "name": "Donna"})
+    assert [f['id'] for f in repo.get_all()] == [1, 2, 3]
+    if hasattr(repo, 'close'):
+        repo.close()
@@ -0,0 +1,206 @@
+# tests/test_friends_api.py
+# Anrop mot hela appen via Flasks testklient (se client i conftest.py).
+import base64
+import time
+
+import pytest
+from werkzeug.http import http_date
+
+from myblueprints import jsoncodec
+
+KEY = {'x-api-key': 'abc'}
+
+def cursor_for(value):
+    return base64.urlsafe_b64encode(jsoncodec.dumpb(value)).decode()
+
+def test_cursor_pages_through_friends(client):
+    response = client.get('/api/v6/friends/?limit=2', headers=KEY)
+    assert [f['id'] for f in response.get_json()] == [1, 2]
+    response = client.get(f"/api/v6/friends/?cursor={response.headers['X-Next-Cursor']}", headers=KEY)
+    assert [f['id'] for f in response.get_json()] == [3]
+
+@pytest.mark.parametrize('url', ['/api/v6/friends/', '/api/v7/friends/'])
+@pytest.mark.parametrize('value', ["x", "1", None, True, 1.5, [1], {"id": 1}])
+def test_cursor_that_is_not_an_id_is_rejected(client, url, value):
+    response = client.get(f'{url}?cursor={cursor_for(value)}', headers=KEY)
+    assert response.status_code == 400
+
+def test_cursor_that_is_not_base64_is_rejected(client):
+    assert client.get('/api/v6/friends/?cursor=%%%', headers=KEY).status_code == 400
+
+def test_duplicate_email_is_a_conflict_in_every_version(client):
+    assert client.post('/api/v1/friends', json={"id": 4, "email": "HARVEY@law.com"}).status_code == 409
+    assert client.post('/api/v2/friends/', json={"id": 4, "email": "HARVEY@law.com"}).status_code == 409
+    assert client.put('/api/v3/friends/2', json={"email": "donna@law.com"}).status_code == 409
+    response = client.get('/api/v7/friends/?email=Harvey@Law.com', headers=KEY)
+    assert [f['id'] for f in response.get_json()] == [1]
+
+@pytest.mark.parametrize('bad_id', [True, False, 2 ** 63])
+@pytest.mark.parametrize('url', ['/api/v4/friends/', '/api/v6/friends/', '/api/v7/friends/'])
+def test_create_with_bool_or_huge_id_is_rejected(client, url, bad_id):
+    friend = {"id": bad_id, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"}
+    assert client.post(url, json=friend, headers=KEY).status_code == 400
+
+@pytest.mark.parametrize('url', ['/api/v6/friends/bulk', '/api/v7/friends/bulk'])
+def test_bulk_with_bool_id_reports_an_error(client, url):
+    friend = {"id": True, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"}
+    response = client.post(url, json=[friend], headers=KEY)
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['message'] == "ID must be an integer."
+    response = client.patch(url, json=[{"id": True, "status": "Boss"}], headers=KEY)
+    assert response.status_code == 400
+    assert client.delete(url, json=[True], headers=KEY).status_code == 404
+    assert client.get('/api/v6/friends/1', headers=KEY).get_json()['status'] == "Awesome"
+
+@pytest.mark.parametrize('url', ['/api/v6/friends/bulk', '/api/v7/friends/bulk'])
+def test_bulk_create_update_delete(client, url):
+    new = [{"id": 4, "name": "louis litt", "email": "Louis@law.com", "status": "kompis"},
+           {"id": 5, "name": "rachel zane", "email": "rachel@law.com", "status": "kompis"}]
+    response = client.post(url, json=new, headers=KEY)
+    assert response.status_code == 201
+    assert response.get_json() == {"errors": [], "created": [
+        {"id": 4, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"},
+        {"id": 5, "name": "Rachel Zane", "email": "rachel@law.com", "status": "Kompis"}]}
+    response = client.patch(url, json=[{"id": 4, "status": "boss"}, {"id": 99, "status": "x"}], headers=KEY)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [(f['id'], f['status']) for f in body['updated']] == [(4, "Boss")]
+    assert body['errors'] == [{"index": 1, "id": 99, "message": "Not Found"}]
+    response = client.delete(url, json=[5, 99], headers=KEY)
+    assert response.status_code == 200
+    assert response.get_json() == {"deleted": [5], "errors": [{"id": 99, "message": "Not Found"}]}
+    assert [f['id'] for f in client.get('/api/v6/friends/', headers=KEY).get_json()] == [1, 2, 3, 4]
+
+@pytest.mark.parametrize('url', ['/api/v6/friends/bulk', '/api/v7/friends/bulk'])
+def test_bulk_create_with_taken_id_changes_nothing(client, url):
+    friends = [{"id": 1, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"},
+               {"id": 4, "name": "Rachel Zane", "email": "rachel@law.com", "status": "Kompis"},
+               {"id": 4, "name": "Rachel Två", "email": "rachel2@law.com", "status": "Kompis"}]
+    response = client.post(url, json=friends, headers=KEY)
+    errors = response.get_json()['errors']
+    assert [(e['index'], e['id']) for e in errors] == [(0, 1), (2, 4)]
+    assert client.get('/api/v6/friends/1', headers=KEY).get_json()['name'] == "Harvey Specter"
+
+def test_if_modified_since_is_not_fooled_by_two_writes_in_one_second(client):
+    response = client.get('/api/v6/friends/', headers=KEY)
+    assert response.get_json()[1]['status'] == "Kompis"
+    since = response.headers['Last-Modified']
+    # En ändring (troligen i samma sekund): klientens kopia är gammal
+    client.put('/api/v3/friends/2', json={"status": "Boss"})
+    response = client.get('/api/v6/friends/', headers={**KEY, 'If-Modified-Since': since})
+    assert response.status_code == 200
+    assert response.get_json()[1]['status'] == "Boss"
+    later = http_date(time.time() + 3600)
+    assert client.get('/api/v6/friends/', headers={**KEY, 'If-Modified-Since': later}).status_code == 304
+
+def test_search_reports_whether_it_was_truncated(client):
+    response = client.get('/api/v6/friends/search?q=harvey law', headers=KEY)
+    assert [f['id'] for f in response.get_json()] == [1]
+    assert response.headers['X-Search-Truncated'] == 'false'
+
+def test_bulk_reports_a_huge_id_as_it_was_sent(client):
+    friend = {"id": 2 ** 70 + 1, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"}
+    response = client.post('/api/v6/friends/bulk', json=[friend], headers=KEY)
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{"index": 0, "id": 2 ** 70 + 1, "message": "ID must be an integer."}]
+
+# --- Alla versioner delar samma data: skriv genom v2, läs genom v6 och v7 ---
+
+def read_everywhere(client, friend_id):
+    """Vännen som v6 och v7 ser den (None om den inte finns), plus v7:s lista."""
+    seen = []
+    for url in (f'/api/v6/friends/{friend_id}', f'/api/v7/friends/{friend_id}'):
+        response = client.get(url, headers=KEY)
+        seen.append(response.get_json() if response.status_code == 200 else None)
+    listed = [f for f in client.get('/api/v7/friends/', headers=KEY).get_json() if f['id'] == friend_id]
+    seen.append(listed[0] if listed else None)
+    return seen
+
+def test_create_through_v2_is_seen_by_v6_and_v7(client):
+    friend = {"id": 4, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"}
+    assert client.post('/api/v2/friends/', json=friend).status_code == 201
+    assert read_everywhere(client, 4) == [friend, friend, friend]
+
+def test_update_through_v2_is_seen_by_v6_and_v7(client):
+    response = client.put('/api/v2/friends/2', json={"status": "Boss"})
+    assert response.status_code == 200
+    updated = response.get_json()
+    assert updated['status'] == "Boss"
+    assert read_everywhere(client, 2) == [updated, updated, updated]
+
+def test_delete_through_v2_is_seen_by_v6_and_v7(client):
+    assert client.delete('/api/v2/friends/3').status_code == 200
+    assert read_everywhere(client, 3) == [None, None, None]
+
+@pytest.mark.parametrize('url', ['/api/v1/friends', '/api/v2/friends/', '/api/v3/friends/', '/api/v5/friends/'])
+@pytest.mark.parametrize('bad_id', ["abc", "7", True, None, 1.5, 2 ** 63])
+def test_create_with_non_integer_id_is_rejected(client, url, bad_id):
+    friend = {"id": bad_id, "name": "Louis Litt", "email": "louis@law.com", "status": "Kompis"}
+    assert client.post(url, json=friend, headers=KEY).status_code == 400
+    assert [f['id'] for f in client.get('/api/v3/friends/').get_json()] == [1, 2, 3]
+
+# --- /api/v7/friends/changes (Server-Sent Events) ---
+
+def read_events(response, count):
+    """De första count händelserna (keepalive och retry hoppas över) som (id, event, data)."""
+    events = []
+    try:
+        for chunk in response.response:
+            text = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if not text.startswith(('id:', 'event:')):
+                continue
+            fields = dict(line.split(': ', 1) for line in text.strip().split('\n'))
+            events.append((int(fields['id']), fields['event'], jsoncodec.loads(fields['data'])))
+            if len(events) == count:
+                return events
+    finally:
+        response.close()
+    return events
+
+@pytest.fixture
+def quick_keepalive(monkeypatch):
+    # Flödet väntar annars 15 s på nästa ändring innan det skickar en keepalive
+    from myblueprints import friends_restful_bp
+    monkeypatch.setattr(friends_restful_bp, 'KEEPALIVE_SECONDS', 0.05)
+
+def list_seq(client):
+    response = client.get('/api/v7/friends/', headers=KEY)
+    response.get_data()
+    return int(response.headers['X-Change-Seq'])
+
+def test_list_reports_the_change_seq(client):
+    seq = list_seq(client)
+    client.put('/api/v3/friends/2', json={"status": "Boss"})
+    client.delete('/api/v3/friends/3')
+    assert list_seq(client) == seq + 2
+
+def test_changes_since_the_list(client, quick_keepalive):
+    seq = list_seq(client)
+    client.put('/api/v3/friends/2', json={"status": "Boss"})
+    client.delete('/api/v3/friends/3')
+    response = client.get(f'/api/v7/friends/changes?since={seq}', headers=KEY, buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert read_events(response, 2) == [
+        (seq + 1, 'update', {"seq": seq + 1, "id": 2, "friend": {"id": 2, "name": "Mike Ross", "email": "mike@law.com", "status": "Boss"}}),
+        (seq + 2, 'delete', {"seq": seq + 2, "id": 3, "friend": None}),
+    ]
+
+def test_changes_resume_from_last_event_id(client, quick_keepalive):
+    seq = list_seq(client)
+    client.put('/api/v3/friends/1', json={"status": "Boss"})
+    client.put('/api/v3/friends/2', json={"status": "Boss"})
+    # Webbläsaren kopplar upp igen efter den första händelsen: Last-Event-ID går före ?since
+    headers = {**KEY, 'Last-Event-ID': str(seq + 1)}
+    response = client.get(f'/api/v7/friends/changes?since={seq}', headers=headers, buffered=False)
+    assert [(event_id, data['id']) for event_id, _, data in read_events(response, 1)] == [(seq + 2, 2)]
+
+def test_changes_from_too_long_ago_ask_for_a_reset(client, quick_keepalive):
+    from myblueprints.repositories.changefeed import MAX_EVENTS
+    seq = list_seq(client)
+    for i in range(MAX_EVENTS + 1):
+        client.put('/api/v3/friends/2', json={"status": f"Status {i}"})
+    response = client.get(f'/api/v7/friends/changes?since={seq}', headers=KEY, buffered=False)
+    assert read_events(response, 1) == [(seq + MAX_EVENTS + 1, 'reset', {"seq": seq + MAX_EVENTS + 1})]
+
+def test_changes_with_bad_since_is_rejected(client):
+    assert client.get('/api/v7/friends/changes?since=abc', headers=KEY).status_code == 400
@@ -0,0 +1,112 @@
+# tests/test_friendsearchindex.py
+# Sökindexet ska ge samma träffar och samma ordning som att poängsätta alla vänner en och en,
+# även efter ändringar och när sökningen avbryts tidigt (limit).
+import random
+
+import pytest
+
+from myblueprints import jsoncodec
+from myblueprints.repositories.friendrepository import FriendRepository
+from myblueprints.repositories.friendsearchindex import (EXACT, MAX_CANDIDATES, PREFIX, SUBSTRING, FriendSearchIndex,
+                                                         tokenize)
+
+FIRST = ["anna", "anders", "bo", "britt", "carl", "erik", "harvey", "mike", "donna", "son", "ann"]
+LAST = ["andersson", "berg", "carlsson", "specter", "ross", "paulsen", "lind", "lindberg"]
+QUERIES = ["a", "an", "ann", "anna", "son", "com", "berg", "erik b", "anna ber", "s", "zz", "an la", "ro ss"]
+
+def random_friend(rnd, friend_id):
+    return {"id": friend_id, "name": f"{rnd.choice(FIRST).title()} {rnd.choice(LAST).title()}",
+            "email": f"{rnd.choice(FIRST)}.{rnd.choice(LAST)}{friend_id}@{rnd.choice(['law.com', 'mail.se'])}"}
+
+def expected(friends, query, limit):
+    # Samma regler som indexet, men utan index: poängsätt varje vän och sortera
+    def score(friend, term):
+        words = tokenize(friend)
+        if term in words:
+            return EXACT
+        if any(word.startswith(term) for word in words):
+            return PREFIX
+        if len(term) >= 3 and any(term in word for word in words):
+            return SUBSTRING
+        return 0
+    hits = []
+    for friend in friends:
+        scores = [score(friend, term) for term in query.split()]
+        if all(scores):
+            hits.append((-sum(scores), friend['id']))
+    return [(friend_id, -neg_score) for neg_score, friend_id in sorted(hits)[:limit]]
+
+@pytest.fixture
+def repo(tmp_path):
+    rnd = random.Random(3)
+    path = str(tmp_path / 'friends.json')
+    jsoncodec.write_file(path, [random_friend(rnd, i) for i in range(1, 1001)])
+    return FriendRepository(path, cache=True)
+
+def search(index, query, limit):
+    return [(f['id'], f['score']) for f in index.search(query, limit)]
+
+def test_ranking_matches_scoring_every_friend(repo):
+    index = FriendSearchIndex(repo)
+    friends = repo.get_all()
+    for query in QUERIES:
+        for limit in (1, 20, 2000):
+            assert search(index, query, limit) == expected(friends, query, limit), (query, limit)
+
+def test_changes_are_applied_incrementally(repo):
+    index = FriendSearchIndex(repo)
+    index.wait_ready()
+    rnd = random.Random(4)
+    for i in range(300):
+        friend_id = rnd.randint(1, 1000)
+        if i % 3 == 0:
+            repo.delete(friend_id)
+        elif i % 3 == 1 and repo.get_by_id(friend_id):
+            repo.update(friend_id, {"name": f"{rnd.choice(FIRST)} {rnd.choice(LAST)}"})
+        else:
+            repo.add(random_friend(rnd, 1000 + i))
+        if i % 50 == 0:
+            search(index, "a", 5)
+    # Ändringarna kan ha gett så många inaktuella id att indexet byggs om i bakgrunden.
+    # Under bygget svarar sökningen från det gamla indexet, så vänta ut det.
+    index.wait_ready()
+    friends = repo.get_all()
+    for query in QUERIES:
+        assert search(index, query, 20) == expected(friends, query, 20), query
+
+def test_reset_rebuilds_in_the_background(repo, tmp_path):
+    index = FriendSearchIndex(repo)
+    assert search(index, "harvey", 2000) == expected(repo.get_all(), "harvey", 2000)
+    # Filen skrivs om utifrån: repositoryt säger 'reset' och indexet byggs om
+    jsoncodec.write_file(str(tmp_path / 'new.json'), [{"id": 1, "name": "Harvey Specter", "email": "h@law.com"}])
+    (tmp_path / 'new.json').replace(tmp_path / 'friends.json')
+    repo.get_version()
+    index.wait_ready()
+    assert search(index, "harvey", 20) == [(1, EXACT)]
+
+def test_rare_combination_among_many_candidates(tmp_path):
+    # Fler än MAX_CANDIDATES vänner heter Anna och lika många Berg, men bara de sista heter
+    # båda. De ska hittas ändå, via snittet av listorna.
+    n = MAX_CANDIDATES + 1000
+    friends = [{"id": i, "name": "Anna Lind"} for i in range(1, n + 1)]
+    friends += [{"id": n + i, "name": "Carl Berg"} for i in range(1, n + 1)]
+    friends += [{"id": 2 * n + i, "name": "Anna Berg"} for i in range(1, 6)]
+    path = str(tmp_path / 'friends.json')
+    jsoncodec.write_file(path, friends)
+    index = FriendSearchIndex(FriendRepository(path, cache=True))
+    results, truncated = index.search_with_truncated("anna berg", 20)
+    assert [f['id'] for f in results] == [2 * n + i for i in range(1, 6)]
+    assert not truncated
+
+def test_search_says_when_it_gave_up(tmp_path):
+    # Alla matchar "anna berg" med prefix, den enda exakta träffen kommer sist. Kandidaterna
+    # tar slut innan dess: svaret är fullt men truncated, eftersom en bättre träff kan finnas.
+    n = 2 * MAX_CANDIDATES + 1000
+    friends = [{"id": i, "name": "Annas Bergs"} for i in range(1, n + 1)] + [{"id": n + 1, "name": "Anna Berg"}]
+    path = str(tmp_path / 'friends.json')
+    jsoncodec.write_file(path, friends)
+    index = FriendSearchIndex(FriendRepository(path, cache=True))
+    results, truncated = index.search_with_truncated("anna berg", 20)
+    assert [f['id'] for f in results] == list(range(1, 21))
+    assert truncated
+    assert [f['id'] for f in index.search("anna berg", 20)] == list(range(1, 21))
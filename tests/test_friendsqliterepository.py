@@ -0,0 +1,60 @@
+# tests/test_friendsqliterepository.py
+# Import från JSON till SQLite: krockande email (oavsett skiftläge) får inte tyst ta bort vänner.
+import pytest
+
+from myblueprints import jsoncodec
+from myblueprints.repositories.friendsqliterepository import FriendSQLiteRepository, ImportConflictError
+
+FRIENDS = [
+    {"id": 1, "name": "Harvey Specter", "email": "harvey@law.com", "status": "Awesome"},
+    {"id": 2, "name": "Mike Ross", "email": "mike@law.com", "status": "Kompis"},
+]
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = FriendSQLiteRepository(str(tmp_path / 'friends.db'))
+    repo.add_many(FRIENDS)
+    yield repo
+    repo.close()
+
+def write_json(tmp_path, friends):
+    path = str(tmp_path / 'import.json')
+    jsoncodec.write_file(path, friends)
+    return path
+
+def test_import_overwrites_same_id(repo, tmp_path):
+    path = write_json(tmp_path, [{"id": 2, "name": "Mike Ross", "email": "MIKE@law.com", "status": "Boss"},
+                                 {"id": 3, "name": "Donna Paulsen", "email": "donna@law.com"}])
+    assert repo.import_json(path) == 2
+    assert [(f['id'], f.get('status')) for f in repo.get_all()] == [(1, "Awesome"), (2, "Boss"), (3, None)]
+
+def test_import_conflicting_email_imports_nothing(repo, tmp_path):
+    path = write_json(tmp_path, [{"id": 3, "name": "Donna Paulsen", "email": "donna@law.com"},
+                                 {"id": 4, "name": "Harvey Två", "email": "Harvey@Law.com"},
+                                 {"id": 5, "name": "Donna Två", "email": "DONNA@law.com"}])
+    with pytest.raises(ImportConflictError) as info:
+        repo.import_json(path)
+    assert info.value.conflicts == [
+        {"id": 4, "email": "Harvey@Law.com", "conflicts_with": 1},
+        {"id": 5, "email": "DONNA@law.com", "conflicts_with": 3},
+    ]
+    # Ingenting importerades och ingenting togs bort
+    assert [f['id'] for f in repo.get_all()] == [1, 2]
+    # Uppkopplingen går att använda som vanligt efteråt
+    repo.add({"id": 6, "name": "Louis Litt", "email": "louis@law.com"})
+    assert [f['id'] for f in repo.get_all()] == [1, 2, 6]
+
+def test_import_rejects_friends_without_valid_id(repo, tmp_path, caplog):
+    # Utan kontroll fick vännen utan id ett automatiskt id (3), som "3" sedan skrev över
+    bad = [{"name": "Utan id"}, {"id": "3", "name": "Sträng-id"}, {"id": True, "name": "Bool"}, "inte en vän"]
+    path = write_json(tmp_path, [bad[0], {"id": 4, "name": "Louis Litt"}, bad[1], bad[2], bad[3]])
+    assert repo.import_json(path) == 1
+    assert [f['id'] for f in repo.get_all()] == [1, 2, 4]
+    with open(path + '.rejected', 'rb') as f:
+        assert [jsoncodec.loads(line) for line in f] == bad
+    assert '4 friend(s)' in caplog.text
+
+def test_import_keeps_value_types(repo, tmp_path):
+    friend = {"id": 3, "name": ["Donna", "Paulsen"], "status": 7, "email": "donna@law.com"}
+    assert repo.import_json(write_json(tmp_path, [friend])) == 1
+    assert repo.get_by_id(3) == friend
@@ -0,0 +1,56 @@
+# tests/test_htmlparse.py
+# Skraparna på sparade sidor (tests/fixtures). Med parse_only byggs bara nyhetskorten och
+# bokningarna, resultatet ska ändå bli exakt som när hela sidan tolkas (som förut).
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from myblueprints import dunews_bp, duschema_bp, htmlparse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PARSERS = ['html.parser', 'lxml']
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+@pytest.fixture(params=PARSERS)
+def parser(request, monkeypatch):
+    if request.param == 'lxml':
+        pytest.importorskip('lxml')
+    monkeypatch.setattr(htmlparse, 'HTML_PARSER', request.param)
+    return request.param
+
+def parse_whole_page(module, html, monkeypatch):
+    # Som skraparna gjorde förut: hela sidan med html.parser, sedan find_all
+    with monkeypatch.context() as m:
+        m.setattr(module, 'parse_only', lambda markup, name, class_: BeautifulSoup(markup, 'html.parser'))
+        return module.parse_du_news(html) if module is dunews_bp else module.tolka_schema(html)
+
+def test_news_same_as_whole_page(parser, monkeypatch):
+    html = fixture('dunews.html')
+    news = dunews_bp.parse_du_news(html)
+    assert news == parse_whole_page(dunews_bp, html, monkeypatch)
+    # 24 kort, varav ett utan länk och ett utan du-title. Evenemangskorten räknas inte.
+    assert len(news) == 22
+    assert news[0] == {"title": "Ny forskning om solenergi i Dalarna",
+                       "url": f"{dunews_bp.BASE_URL}/sv/om-oss/nytt-och-aktuellt/nyheter/2026/00-nyhet/"}
+    assert news[4]["title"] == "Rektor om budgeten 2026 & framtiden"
+    assert news[5]["url"] == "https://www.dalarna.se/nyheter/samarbete/"
+
+def test_schedule_same_as_whole_page(parser, monkeypatch):
+    html = fixture('duschema.html')
+    poster = duschema_bp.tolka_schema(html)
+    assert poster == parse_whole_page(duschema_bp, html, monkeypatch)
+    # 80 bokningar, varav en utan title. "bookingDiv-legend" är inte en bokning.
+    assert len(poster) == 79
+    assert poster[0] == {"datum": "2026-01-26", "tid": "08:00 - 10:00", "kurs": "GMI35S_V3NJJ",
+                         "larare": "Ulrika Artursson Wissa", "lokal": "B302", "typ": "Lektion"}
+    # "Grupp 2" på lärarens plats: läraren står längre bak
+    assert poster[6]["larare"] == "Anna Karlsson"
+
+def test_class_among_several_classes(parser):
+    soup = htmlparse.parse_only('<div class="a bookingDiv b">x</div><div class="bookingDivs">y</div>',
+                                'div', 'bookingDiv')
+    assert [div.get_text() for div in soup.find_all('div')] == ['x']
@@ -0,0 +1,76 @@
+# tests/test_httpclient.py
+# httpclient mot en lokal server som håller anslutningarna öppna (HTTP/1.1). Servern
+# räknar vilka anslutningar (klientportar) anropen kom på och hur många som pågick samtidigt.
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from myblueprints import httpclient
+
+class Upstream(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+    lock = threading.Lock()
+    ports = set()
+    active = 0
+    max_active = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.ports.add(self.client_address[1])
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(cls.delay)
+            body = b'ok'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def upstream():
+    Upstream.delay, Upstream.ports, Upstream.active, Upstream.max_active = 0, set(), 0, 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Varje test får en ny port, dvs en ny värd med egen semafor och egen anslutningspool
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+def test_connection_is_reused(upstream):
+    for _ in range(10):
+        response = httpclient.get(upstream)
+        assert response.status_code == 200 and response.text == 'ok'
+    assert len(Upstream.ports) == 1
+
+def test_fetches_are_recorded(upstream):
+    httpclient.get(upstream + 'nyheter')
+    fetch = httpclient.recent_fetches()[-1]
+    assert fetch['url'] == upstream + 'nyheter'
+    assert fetch['host'] == upstream.split('/')[2]
+    assert fetch['status'] == 200
+
+def test_at_most_max_per_host_at_once(upstream, monkeypatch):
+    monkeypatch.setattr(httpclient, 'MAX_PER_HOST', 2)
+    Upstream.delay = 0.1
+    threads = [threading.Thread(target=httpclient.get, args=(upstream,)) for _ in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert Upstream.max_active == 2
+    # 8 hämtningar, två åt gången: minst fyra omgångar
+    assert time.perf_counter() - start >= 4 * Upstream.delay
+    # ... på högst två anslutningar, som återanvänds
+    assert len(Upstream.ports) <= 2
@@ -0,0 +1,65 @@
+# tests/test_jsoncodec.py
+# jsoncodec ska ge exakt samma resultat som standardbibliotekets json, oavsett om orjson
+# är installerat eller inte.
+import json
+
+import pytest
+
+from myblueprints import jsoncodec
+
+TEXTS = [
+    '{"id": 1180591620717411303424}',
+    '[-9223372036854775809, 9223372036854775808, 18446744073709551616]',
+    '[1, -1, 9223372036854775807, 1.5, 1e3, "12345678901234567890123"]',
+    '{"name": "Åsa Öberg", "status": null, "ok": true}',
+]
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_loads_is_the_same_as_json(text):
+    expected = json.loads(text)
+    for data in (text, text.encode()):
+        result = jsoncodec.loads(data)
+        assert result == expected
+        assert jsoncodec.dumps(result) == jsoncodec.dumps(expected)
+        # Ett heltal förblir ett heltal (1e21 == 10**21 men är en float)
+        assert repr(result) == repr(expected)
+
+def test_big_integers_round_trip():
+    data = {"id": 2 ** 70 + 1, "ids": [-(2 ** 64), 2 ** 63]}
+    assert jsoncodec.loads(jsoncodec.dumpb(data)) == data
+
+def test_long_number_across_scan_chunks(monkeypatch):
+    # Sifferföljden hamnar över gränsen mellan två bitar i sökningen
+    monkeypatch.setattr(jsoncodec, '_SCAN_CHUNK', 16)
+    text = '[' + ' ' * 5 + str(2 ** 70 + 1) + ']'
+    assert repr(jsoncodec.loads(text)) == repr(json.loads(text))
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 1 << 20])
+def test_iter_file_is_the_same_as_read_file(tmp_path, chunk_size):
+    # Elementen delas mitt i tal ("1.5" av "1.5e3"), strängar och flerbytetecken
+    path = tmp_path / 'friends.json'
+    data = [{"id": 2 ** 70 + 1, "name": "Åsa Öberg", "n": [1.5e3, -0.25, 10]}, 12345, "a,]b", [], {},
+            None, True, {"tags": ["x", {"y": None}]}]
+    for text in (json.dumps(data), json.dumps(data, indent=4), ' [ ]\n', '[]'):
+        path.write_text(text, encoding='utf-8')
+        assert list(jsoncodec.iter_file(str(path), chunk_size)) == jsoncodec.read_file(str(path))
+    assert list(jsoncodec.iter_file(str(tmp_path / 'missing.json'))) == []
+
+@pytest.mark.parametrize('text', ['{"id": 1}', '[1, 2', '[1 2]', '[1,]', ''])
+def test_iter_file_rejects_what_is_not_a_list(tmp_path, text):
+    path = tmp_path / 'friends.json'
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        list(jsoncodec.iter_file(str(path), 2))
+
+def test_indented_files_look_the_same_with_and_without_orjson(tmp_path, monkeypatch):
+    friends = [{"id": 1, "name": "Harvey", "tags": ["a", {"b": None}], "empty": []}, {"id": 2}]
+    expected = json.dumps(friends, indent=2).encode()
+    written = []
+    for backend in dict.fromkeys([jsoncodec.orjson, None]):
+        monkeypatch.setattr(jsoncodec, 'orjson', backend)
+        assert jsoncodec.dumpb(friends, indent=True) == expected
+        path = tmp_path / f'friends-{len(written)}.json'
+        jsoncodec.write_items(str(path), iter(friends), compact=False)
+        written.append(path.read_bytes())
+    assert all(data == expected for data in written)
@@ -0,0 +1,257 @@
+# tests/test_regex.py
+# analysera_text (förkompilerade SKANNERS med förfilter, snabba former och sammanslagna
+# hashar) ska ge exakt samma träffar som re.findall med varje mönster i PATTERNS.
+# Samma jämförelse för StromAnalys (/regex/stream) och /regex/batch, plus taken för arkiv.
+import io
+import random
+import re
+import tarfile
+import zipfile
+
+import pytest
+
+from myblueprints import regex_bp
+from myblueprints.regex_bp import analysera_text
+
+def findall_per_monster(text):
+    # Som /regex/ gjorde innan SKANNERS fanns
+    results = {}
+    for name, pattern in regex_bp.PATTERNS.items():
+        matches = re.findall(pattern, text)
+        if matches and isinstance(matches[0], tuple):
+            matches = [m[0] for m in matches]
+        results[name] = set(matches)
+    return results
+
+def som_mangder(analys):
+    assert set(analys) == set(regex_bp.PATTERNS)
+    return {namn: set(traffar) for namn, traffar in analys.items()}
+
+FALL = [
+    '',
+    'inga träffar alls här',
+    # Postnummer inuti mobilnummer, datum och IP-adresser
+    'Mobil: 070-1234567, 0731234567, 076 1234567, Postnr: 123 45 och 54321',
+    '2026-01-26 10.0.0.254 192.168.1.50 1234.5.6.7 1.2.3.4567 a1.2.3.4',
+    # md5/sha256: exakt 32/64 tecken, inte 40 (sha1) eller inuti längre ord
+    'md5 85202888629f635f3d3d6396f9a65d78 sha1 da39a3ee5e6b4b0d3255bfef95601890afd80709',
+    'sha256 e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855',
+    'x85202888629f635f3d3d6396f9a65d78 85202888629f635f3d3d6396f9a65d78_ '
+    '85202888629F635F3D3D6396F9A65D78' + 'a' * 32 + ' ' + 'b' * 96,
+    # Hashar som ser ut som IPv6 och MAC, och tvärtom
+    '2001:0db8:85a3:0000:0000:8a2e:0370:7334 fe80:0:0:0:0:0:0:1x 00:1A:2B:3C:4D:5E 00-1a-2b-3c-4d-5e-6f',
+    # Sökvägar: Windows med och utan filnamn, Linux inuti URL:er och Windows-sökvägar
+    r'C:\Users\Admin\Downloads\payload.exe D:\ E:\mapp\ /var/log/syslog /etc/shadow',
+    '<a href="https://skadlig-sida.ru/exploit/x.php">x</a> href="" href="/a/b"',
+    'nisse.it-forensik@bolaget.se, a@b.c, info@foretag.se. CVE-2021-44228',
+]
+
+@pytest.mark.parametrize('text', FALL)
+def test_same_as_findall(text):
+    assert som_mangder(analysera_text(text)) == findall_per_monster(text)
+
+def slumpad_text(rnd, rader=300):
+    # Delar av riktiga träffar i slumpad ordning, så att de krockar och överlappar
+    bitar = ['070-', '1234567', '123 45', '.', ':', '-', '\\', '/', 'C:\\', 'href="', '"', '@',
+             'se', 'var', 'log', ' ', '\n', '_', 'CVE-2024-', 'é', '00:1A', '2001:db8:',
+             'a.b@c.se', 'user@host', '/var/log/', 'app/x.log', '10.0.', '.1.2', '1.2.3.4',
+             'fe80:0:0:0:0:0:0:', 'ab:cd:ef:', '12-34-56-']
+    hexa = '0123456789abcdefABCDEF'
+    rader_ut = []
+    for _ in range(rader):
+        delar = []
+        for _ in range(rnd.randrange(1, 12)):
+            val = rnd.random()
+            if val < 0.3:
+                delar.append(''.join(rnd.choice(hexa) for _ in range(rnd.choice([2, 4, 31, 32, 33, 64, 65]))))
+            elif val < 0.5:
+                delar.append(str(rnd.randrange(10 ** rnd.randrange(1, 8))))
+            else:
+                delar.append(rnd.choice(bitar))
+        rader_ut.append(''.join(delar))
+    return '\n'.join(rader_ut)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_random_text_same_as_findall(seed):
+    text = slumpad_text(random.Random(seed))
+    assert som_mangder(analysera_text(text)) == findall_per_monster(text)
+
+def test_changed_pattern_is_used_as_is(monkeypatch):
+    # Ändras ett mönster i PATTERNS används inte längre den snabba formen
+    patterns = dict(regex_bp.PATTERNS, ipv4=r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b(?!\.)',
+                    md5_hash=r'\b[0-9a-f]{32}\b')
+    skanners = regex_bp.bygg_skanners(patterns)
+    monster = {namn: regex.pattern for regex, namn, _ in skanners if isinstance(namn, str)}
+    assert monster['ipv4'] == patterns['ipv4'] and monster['md5_hash'] == patterns['md5_hash']
+    assert not any(isinstance(namn, dict) for _, namn, _ in skanners)
+    monkeypatch.setattr(regex_bp, 'PATTERNS', patterns)
+    monkeypatch.setattr(regex_bp, 'SKANNERS', skanners)
+    text = FALL[3] + ' 85202888629F635F3D3D6396F9A65D78 ' + FALL[4]
+    analys = som_mangder(analysera_text(text))
+    assert analys == findall_per_monster(text)
+    assert '85202888629F635F3D3D6396F9A65D78' not in analys['md5_hash']
+
+# --- StromAnalys (/regex/stream) med små bitar, så att gränserna mellan dem kommer med ---
+
+@pytest.fixture
+def sma_bitar(monkeypatch):
+    # Ett litet fönster: en bit ger en skanning efter OVERLAP tecken, inte efter 1 MiB
+    monkeypatch.setattr(regex_bp, 'CHUNK_SIZE', 10)
+    monkeypatch.setattr(regex_bp, 'OVERLAP', 256)
+
+def strom(text, rnd=None, listor=None):
+    """Matar text till en StromAnalys i bitar om 1-50 tecken (slumpade) och returnerar analysen."""
+    rnd = rnd or random.Random(0)
+    analys = regex_bp.StromAnalys(listor)
+    i = 0
+    while i < len(text):
+        n = rnd.randrange(1, 50)
+        analys.mata(text[i:i + n])
+        i += n
+    analys.resultat = analys.avsluta()
+    return analys
+
+def langsta_traff(text):
+    return max((len(m[0]) for monster in regex_bp.PATTERNS.values()
+                for m in re.finditer(monster, text)), default=0)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_stream_same_as_whole_text(sma_bitar, seed):
+    rnd = random.Random(seed)
+    # En href=" utan avslutande " tar resten av texten: stäng direkt så att träffarna ryms i OVERLAP
+    text = slumpad_text(rnd).replace('href="', 'href="x"') + '\n'.join(FALL)
+    assert langsta_traff(text) <= regex_bp.OVERLAP
+    analys = strom(text, rnd)
+    assert som_mangder(analys.resultat) == findall_per_monster(text)
+    assert analys.tecken == len(text) and analys.avklippta == set()
+    # Antal träffar med dubbletter, som findall: ingen träff räknas två gånger i överlappet
+    for namn, monster in regex_bp.PATTERNS.items():
+        assert analys.antal[namn] == len(re.findall(monster, text)), namn
+
+def test_match_across_chunk_boundary(sma_bitar):
+    # Varje träff delas mellan två anrop till mata, mitt i
+    delar = ['ip 192.168.', '1.50 mail nisse@bol', 'aget.se md5 85202888629f635f',
+             '3d3d6396f9a65d78 tel 070-12', '34567 ' + 'x' * 200, ' slut /var/lo', 'g/syslog']
+    analys = regex_bp.StromAnalys()
+    for del_ in delar:
+        analys.mata(del_)
+    resultat = analys.avsluta()
+    text = ''.join(delar)
+    assert som_mangder(resultat) == findall_per_monster(text)
+    assert resultat['ipv4'] == ['192.168.1.50'] and resultat['linux_path'] == ['/var/log/syslog']
+    assert resultat['md5_hash'] == ['85202888629f635f3d3d6396f9a65d78']
+
+def test_max_unika_truncates(sma_bitar, monkeypatch):
+    monkeypatch.setattr(regex_bp, 'MAX_UNIKA', 5)
+    text = ' '.join(f'user{i}@foretag.se' for i in range(20)) + ' ' + 'user0@foretag.se ' * 3
+    analys = strom(text)
+    assert len(analys.resultat['email']) == 5
+    assert set(analys.resultat['email']) <= findall_per_monster(text)['email']
+    assert analys.avklippta == {'email'}
+    # Alla räknas ändå
+    assert analys.antal['email'] == 23
+
+def test_match_longer_than_overlap_can_be_split(monkeypatch):
+    # Känd begränsning: en träff som är längre än OVERLAP kan hamna i två fönster.
+    # Med standardvärdet (4096) händer det bara för orimligt långa sökvägar o.d.
+    monkeypatch.setattr(regex_bp, 'OVERLAP', 16)
+    sokvag = 'C:\\' + '\\'.join(f'mapp{i}' for i in range(10)) + '\\fil.exe'
+    analys = regex_bp.StromAnalys()
+    analys.mata('kör ' + sokvag[:40])
+    analys.mata(sokvag[40:] + '\nklart')
+    traffar = analys.avsluta()['windows_path']
+    assert traffar != [sokvag]
+    assert ''.join(traffar).startswith('C:\\mapp0')
+    # Ett fönster som rymmer hela träffen ger rätt svar
+    monkeypatch.setattr(regex_bp, 'OVERLAP', 128)
+    analys = regex_bp.StromAnalys()
+    analys.mata('kör ' + sokvag[:40])
+    analys.mata(sokvag[40:] + '\nklart')
+    assert analys.avsluta()['windows_path'] == [sokvag]
+
+def test_stream_route(client, sma_bitar):
+    # Två byte per 'é': med CHUNK_SIZE = 10 delas flera tecken mellan bitarna
+    text = 'é' * 15 + ' 192.168.1.50 é nisse@bolaget.se ' + slumpad_text(random.Random(1), 50).replace('href="', 'href="x"')
+    for kwargs in ({'data': text.encode('utf-8'), 'content_type': 'application/octet-stream'},
+                   {'data': {'file': (io.BytesIO(text.encode('utf-8')), 'logg.txt')},
+                    'content_type': 'multipart/form-data'}):
+        body = client.post('/regex/stream', **kwargs).get_json()
+        assert body['characters'] == len(text)
+        assert som_mangder(body['analysis']) == findall_per_monster(text)
+        assert body['truncated'] == []
+
+# --- /regex/batch och arkiven ---
+
+def zip_arkiv(filer):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as arkiv:
+        for namn, data in filer:
+            arkiv.writestr(namn, data)
+    buffer.seek(0)
+    return buffer
+
+def tar_arkiv(filer):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as arkiv:
+        for namn, data in filer:
+            info = tarfile.TarInfo(namn)
+            info.size = len(data)
+            arkiv.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+FILER = [(f'dok{i}.log', f'{FALL[i % len(FALL)]}\nip 10.0.0.{i}'.encode('utf-8')) for i in range(6)]
+
+@pytest.mark.parametrize('arkiv', [zip_arkiv, tar_arkiv])
+def test_batch_archive(client, arkiv):
+    body = client.post('/regex/batch', data={'file': (arkiv(FILER), 'fall')},
+                       content_type='multipart/form-data').get_json()
+    assert body['count'] == 6 and [d['name'] for d in body['documents']] == [n for n, _ in FILER]
+    for dok, (_, data) in zip(body['documents'], FILER):
+        assert som_mangder(dok['analysis']) == findall_per_monster(data.decode('utf-8'))
+    assert set(body['summary']['ipv4']) >= {f'10.0.0.{i}' for i in range(6)}
+    # Samma arkiv som rå body
+    response = client.post('/regex/batch', data=arkiv(FILER).read(), content_type='application/octet-stream')
+    assert response.get_json()['count'] == 6
+
+def test_batch_json(client):
+    documents = [{"name": "a.log", "content": FALL[2]}, FALL[3]]
+    body = client.post('/regex/batch', json={"documents": documents}).get_json()
+    assert [d['name'] for d in body['documents']] == ['a.log', '1']
+    assert client.post('/regex/batch', json={"documents": [{"name": "x"}]}).status_code == 400
+    assert client.post('/regex/batch', data=b'inget arkiv', content_type='application/octet-stream').status_code == 400
+
+@pytest.mark.parametrize('arkiv', [zip_arkiv, tar_arkiv])
+def test_archive_stops_at_max_documents(monkeypatch, arkiv):
+    monkeypatch.setattr(regex_bp, 'MAX_DOKUMENT', 4)
+    lasta = []
+    with pytest.raises(regex_bp.ForStortError):
+        for namn, _ in regex_bp.las_arkiv(arkiv(FILER)):
+            lasta.append(namn)
+    # Felet kommer innan den femte filen packas upp, inte efter hela arkivet
+    assert len(lasta) == 4
+
+@pytest.mark.parametrize('arkiv', [zip_arkiv, tar_arkiv])
+def test_archive_stops_at_total_size(monkeypatch, arkiv):
+    # Filer som packas ihop till nästan ingenting: 6 x 1 MB nollor
+    filer = [(f'noll{i}.bin', bytes(1_000_000)) for i in range(6)]
+    monkeypatch.setattr(regex_bp, 'MAX_TOTAL_STORLEK', 2_500_000)
+    lasta = []
+    with pytest.raises(regex_bp.ForStortError, match='tillsammans'):
+        for namn, _ in regex_bp.las_arkiv(arkiv(filer)):
+            lasta.append(namn)
+    assert len(lasta) == 2
+    monkeypatch.setattr(regex_bp, 'MAX_DOKUMENT_STORLEK', 999_999)
+    with pytest.raises(regex_bp.ForStortError, match='noll0.bin'):
+        next(regex_bp.las_arkiv(arkiv(filer)))
+
+def test_batch_too_large_is_413(client, monkeypatch):
+    monkeypatch.setattr(regex_bp, 'MAX_DOKUMENT', 4)
+    response = client.post('/regex/batch', data={'file': (zip_arkiv(FILER), 'fall.zip')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert response.get_json() == {"error": "Högst 4 dokument per anrop"}
+    assert client.post('/regex/batch', json=[FALL[2]] * 5).status_code == 413
+    monkeypatch.setattr(regex_bp, 'MAX_TOTAL_STORLEK', 100)
+    response = client.post('/regex/batch', data=tar_arkiv(FILER[:3]).read(), content_type='application/gzip')
+    assert response.status_code == 413
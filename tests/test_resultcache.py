@@ -0,0 +1,131 @@
+# tests/test_resultcache.py
+# ResultCache: LRU begränsad av byte, SQLite-filen mellan omstarter och cachenycklarna
+# i /regex/ (ny version av mönstren eller bevakningslistorna ger nya nycklar).
+import pytest
+
+from myblueprints import jsoncodec, regex_bp, resultcache
+from myblueprints.resultcache import ResultCache, content_key
+from myblueprints.watchlist import WatchlistStore
+
+def varde(n):
+    # Ett resultat som tar exakt n byte som JSON
+    return 'x' * (n - 2)
+
+def nycklar(cache):
+    return list(cache._entries)
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = ResultCache(30)
+    for key in 'abc':
+        cache.put(key, varde(10))
+    assert cache.bytes == 30 and nycklar(cache) == ['a', 'b', 'c']
+    assert cache.get('a') == varde(10)
+    cache.put('d', varde(10))
+    # b användes längst sedan, inte a som är äldst
+    assert nycklar(cache) == ['c', 'a', 'd'] and cache.get('b') is None
+    # Ett stort resultat kan slänga flera
+    cache.put('e', varde(25))
+    assert nycklar(cache) == ['e'] and cache.bytes == 25
+    assert cache.stats() | {"hit_rate": None} == {
+        "entries": 1, "bytes": 25, "max_bytes": 30, "hits": 1, "misses": 1,
+        "hit_rate": None, "evictions": 4, "persistent": False}
+
+def test_oversized_result_is_not_cached():
+    cache = ResultCache(30)
+    cache.put('a', varde(10))
+    cache.put('stor', varde(31))
+    assert cache.get('stor') is None and nycklar(cache) == ['a'] and cache.evictions == 0
+    cache.put('exakt', varde(20))
+    assert nycklar(cache) == ['a', 'exakt'] and cache.bytes == 30
+
+def test_replacing_a_key_counts_the_new_size():
+    cache = ResultCache(30)
+    cache.put('a', varde(10))
+    cache.put('b', varde(10))
+    cache.put('a', varde(15))
+    assert cache.bytes == 25 and nycklar(cache) == ['b', 'a']
+
+def test_reloads_from_sqlite_in_lru_order(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    size = len(jsoncodec.dumpb({"key": "a", "v": varde(8)}))
+    cache = ResultCache(4 * size, path)
+    for key in 'abcd':
+        cache.put(key, {"key": key, "v": varde(8)})
+    cache.get('a')
+    cache.get('c')
+    cache.close()
+
+    igen = ResultCache(4 * size, path)
+    assert igen.stats()['persistent'] and igen.bytes == cache.bytes
+    assert nycklar(igen) == ['b', 'd', 'a', 'c']
+    assert igen.get('a') == {"key": "a", "v": varde(8)}
+    igen.close()
+
+    # Mindre tak: bara de senast använda läses in (a användes igen ovan), resten tas bort ur filen
+    liten = ResultCache(2 * size, path)
+    assert nycklar(liten) == ['c', 'a']
+    liten.close()
+    assert nycklar(ResultCache(4 * size, path)) == ['c', 'a']
+
+def test_hits_are_written_with_the_next_put(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResultCache(100, path)
+    for key in 'abc':
+        cache.put(key, varde(10))
+    cache.get('a')
+    cache.put('d', varde(10))
+    # Ingen close(): ordningen skrevs tillsammans med d
+    assert nycklar(ResultCache(100, path)) == ['b', 'c', 'a', 'd']
+
+def test_hits_are_written_every_spara_ordning(tmp_path, monkeypatch):
+    monkeypatch.setattr(resultcache, 'SPARA_ORDNING', 2)
+    path = str(tmp_path / 'cache.db')
+    cache = ResultCache(100, path)
+    for key in 'abc':
+        cache.put(key, varde(10))
+    cache.get('a')
+    assert nycklar(ResultCache(100, path)) == ['a', 'b', 'c']
+    cache.get('b')
+    assert nycklar(ResultCache(100, path)) == ['c', 'a', 'b']
+
+def test_content_key():
+    assert content_key('text', 'v1') == content_key('text', 'v1')
+    assert content_key('text', 'v1') != content_key('text', 'v2')
+    assert content_key('text', 'v1') != content_key('text ', 'v1')
+    # Ensamma surrogattecken (från JSON "\ud800") får inte krascha
+    assert content_key('\ud800', 'v1').endswith('-v1')
+
+@pytest.fixture
+def tom_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(regex_bp, 'result_cache', ResultCache(1024 * 1024))
+    monkeypatch.setattr(regex_bp, 'watchlists', WatchlistStore(str(tmp_path / 'listor'), check_interval=0))
+    return tmp_path / 'listor'
+
+def post(client, text):
+    response = client.post('/regex/', json={"content": text})
+    return response.headers['X-Cache'], response.get_json()
+
+def test_route_uses_cache_until_patterns_change(client, tom_cache, monkeypatch):
+    text = 'ip 192.168.1.50 md5 85202888629f635f3d3d6396f9a65d78'
+    status, forsta = post(client, text)
+    assert status == 'MISS'
+    assert post(client, text) == ('HIT', forsta)
+    assert post(client, text + ' ')[0] == 'MISS'
+    # Ny version av PATTERNS: gamla resultat används inte
+    monkeypatch.setattr(regex_bp, 'MONSTER_VERSION', 'ny-version')
+    assert post(client, text) == ('MISS', forsta)
+    assert post(client, text)[0] == 'HIT'
+    assert client.get('/regex/cache').get_json()['hits'] == 2
+
+def test_route_uses_new_key_when_watchlists_change(client, tom_cache):
+    text = 'ip 192.168.1.50'
+    assert post(client, text)[0] == 'MISS'
+    assert 'watchlist' not in post(client, text)[1]
+    tom_cache.mkdir()
+    (tom_cache / 'hot.txt').write_text('192.168.1.50\n', encoding='utf-8')
+    status, svar = post(client, text)
+    assert status == 'MISS' and svar['watchlist']['hits'] == {'ipv4': {'192.168.1.50': ['hot']}}
+    assert post(client, text)[0] == 'HIT'
+    (tom_cache / 'hot.txt').write_text('10.0.0.1\n', encoding='utf-8')
+    status, svar = post(client, text)
+    assert status == 'MISS' and svar['watchlist']['hits'] == {}
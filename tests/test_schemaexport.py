@@ -0,0 +1,112 @@
+# tests/test_schemaexport.py
+# Exporten av schemat: iCalendar (vikning, \-kodning, tider) och CSV (citattecken).
+import csv
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from myblueprints import schemaexport
+from myblueprints.schemaexport import csv_chunks, ics_chunks, ics_rad, ics_text
+
+def bokning(**falt):
+    post = {'datum': '2026-01-26', 'tid': '08:15 - 10:00', 'kurs': 'GMI35S_V3NJJ',
+            'larare': 'Anna Andersson', 'lokal': 'B302', 'typ': 'Föreläsning'}
+    post.update(falt)
+    return post, datetime(2026, 1, 26, 8, 15), datetime(2026, 1, 26, 10, 0)
+
+def ics(traffar, last_modified=0):
+    return ''.join(ics_chunks(traffar, last_modified))
+
+def vik_upp(text):
+    # Tillbaka till en logisk rad per egenskap (RFC 5545 3.1)
+    return text.replace('\r\n ', '').split('\r\n')
+
+def egenskaper(text):
+    return [rad.partition(':') for rad in vik_upp(text) if rad]
+
+def avkoda(varde):
+    # Motsatsen till ics_text
+    ut, i = [], 0
+    while i < len(varde):
+        if varde[i] == '\\':
+            i += 1
+            ut.append('\n' if varde[i] in 'nN' else varde[i])
+        else:
+            ut.append(varde[i])
+        i += 1
+    return ''.join(ut)
+
+@pytest.mark.parametrize('varde', [
+    'kort',
+    'x' * 200,
+    'å' * 100,                      # två byte per tecken: ingen vikning mitt i ett tecken
+    'a' + 'ö' * 60 + '€' * 20,      # tre byte per tecken, udda förskjutning
+])
+def test_long_lines_are_folded(varde):
+    rad = ics_rad('DESCRIPTION', varde)
+    assert rad.endswith('\r\n') and '\n' not in rad.replace('\r\n', '')
+    fysiska = rad[:-2].split('\r\n')
+    assert all(len(f.encode('utf-8')) <= 75 for f in fysiska)
+    assert all(f.startswith(' ') for f in fysiska[1:])
+    assert vik_upp(rad) == [f'DESCRIPTION:{varde}', '']
+
+def test_text_is_escaped():
+    assert ics_text('a\\b;c,d\ne\r\nf') == 'a\\\\b\\;c\\,d\\ne\\nf'
+    post = bokning(kurs='X1_Y', typ='Lab; grupp A, B', lokal='C:\\rum, 2', larare='Per\nOla')
+    rader = dict((namn, varde) for namn, _, varde in egenskaper(ics([post])))
+    assert rader['SUMMARY'] == 'X1 Lab\\; grupp A\\, B'
+    assert rader['LOCATION'] == 'C:\\\\rum\\, 2'
+    assert avkoda(rader['DESCRIPTION']) == 'Kurs: X1_Y\nLärare: Per\nOla'
+    # Inga okodade ; eller , finns kvar i värdena
+    for namn in ('SUMMARY', 'LOCATION', 'DESCRIPTION'):
+        assert ';' not in rader[namn].replace('\\;', '') and ',' not in rader[namn].replace('\\,', '')
+
+def test_calendar_times():
+    last_modified = datetime(2026, 1, 20, 12, 30, 5, tzinfo=timezone.utc).timestamp()
+    text = ics([bokning(), (bokning()[0] | {'tid': ''}, None, None)], last_modified)
+    assert text.startswith('BEGIN:VCALENDAR\r\n') and text.endswith('END:VCALENDAR\r\n')
+    rader = egenskaper(text)
+    namn = [n for n, _, _ in rader]
+    # Bokningen utan tid hoppas över
+    assert namn.count('BEGIN') == 2 and namn.count('DTSTART') == 1
+    rader = dict((n, v) for n, _, v in rader)
+    # Bokningarna i lokal tid utan tidszon ("flytande"), som i TimeEdit
+    assert rader['DTSTART'] == '20260126T081500' and rader['DTEND'] == '20260126T100000'
+    # DTSTAMP alltid i UTC
+    assert rader['DTSTAMP'] == '20260120T123005Z'
+    assert rader['X-WR-TIMEZONE'] == 'Europe/Stockholm'
+
+def test_uid_is_stable():
+    uid = lambda post: dict((n, v) for n, _, v in egenskaper(ics([post])))['UID']
+    assert uid(bokning()) == uid(bokning())
+    assert uid(bokning()) != uid(bokning(lokal='B303'))
+
+def test_csv_quoting(monkeypatch):
+    monkeypatch.setattr(schemaexport, 'CHUNK_SIZE', 2)
+    poster = [bokning(kurs='A,B', typ='"Lab"', larare='Per\nOla', lokal=' B302 ')] + [bokning()] * 3
+    chunks = list(csv_chunks(poster))
+    assert len(chunks) == 3  # rubrik + 2, 2 och en tom rest
+    text = ''.join(chunks)
+    assert text.splitlines()[0] == ','.join(schemaexport.CSV_FALT)
+    assert '"A,B"' in text and '"""Lab"""' in text and '"Per\nOla"' in text
+    rader = list(csv.reader(io.StringIO(text, newline='')))
+    assert rader[0] == list(schemaexport.CSV_FALT)
+    assert rader[1] == ['2026-01-26', '08:15 - 10:00', 'A,B', 'Per\nOla', ' B302 ', '"Lab"']
+    assert len(rader) == 5
+
+def test_export_routes(client, monkeypatch):
+    from myblueprints import duschema_bp
+    from myblueprints.schemaindex import SchemaIndex
+    from myblueprints.swrcache import SWRCache
+    poster = [bokning(kurs='GMI35S_V3NJJ', typ='Lab, grupp 1')[0], bokning(kurs='ANNAN')[0]]
+    monkeypatch.setattr(duschema_bp, 'schema_cache',
+                        SWRCache(lambda: SchemaIndex(poster, version='v', last_modified=0), ttl=60))
+    response = client.get('/duschema/export.ics?kurs=GMI35S')
+    assert response.mimetype == 'text/calendar'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="schema.ics"'
+    rader = egenskaper(response.get_data(as_text=True))
+    assert [v for n, _, v in rader if n == 'SUMMARY'] == ['GMI35S Lab\\, grupp 1']
+    response = client.get('/duschema/export.csv')
+    assert response.mimetype == 'text/csv'
+    assert len(list(csv.reader(io.StringIO(response.get_data(as_text=True), newline='')))) == 3
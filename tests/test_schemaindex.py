@@ -0,0 +1,106 @@
+# tests/test_schemaindex.py
+# SchemaIndex: dubbelbokningar och lediga lokaler, jämfört med att gå igenom alla par.
+import random
+from datetime import datetime, timedelta
+from itertools import combinations
+
+import pytest
+
+from myblueprints.schemaindex import SchemaIndex, tolka_tid
+
+def bokning(kurs, lokal, datum, tid):
+    return {'kurs': kurs, 'larare': 'Lärare', 'lokal': lokal, 'typ': 'Föreläsning',
+            'datum': datum, 'tid': tid}
+
+POSTER = [
+    bokning('A1', 'B302', '2026-01-26', '08:00 - 10:00'),
+    bokning('A2', 'B302', '2026-01-26', '09:00 - 11:00'),  # krockar med A1 09-10
+    bokning('A3', 'B302', '2026-01-26', '10:00 - 12:00'),  # krockar med A2 10-11, inte A1
+    bokning('B1', 'C201', '2026-01-26', '08:00 - 12:00'),
+    bokning('B2', 'C201', '2026-01-26', '11:30 - 13:00'),  # krockar med B1 11:30-12
+    bokning('B3', 'c201', '2026-01-27', '08:00 - 09:00'),
+    bokning('C1', 'D100', '2026-01-26', '13:00 - 15:00'),
+    bokning('X1', 'Saknas', '2026-01-26', '08:00 - 10:00'),
+    bokning('X2', 'Saknas', '2026-01-26', '08:00 - 10:00'),  # ingen riktig lokal
+    {'kurs': 'U1', 'lokal': 'B302'},                         # utan tid
+]
+
+def t(text):
+    return datetime.fromisoformat(text)
+
+def krockar(index, *args, **kwargs):
+    return [(lokal, start.strftime('%d %H:%M'), slut.strftime('%H:%M'), a['kurs'], b['kurs'])
+            for start, slut, lokal, a, b in index.konflikter(*args, **kwargs)]
+
+def test_conflicts():
+    index = SchemaIndex(POSTER)
+    assert krockar(index) == [
+        ('B302', '26 09:00', '10:00', 'A1', 'A2'),
+        ('B302', '26 10:00', '11:00', 'A2', 'A3'),
+        ('C201', '26 11:30', '12:00', 'B1', 'B2'),
+    ]
+    # Bara krockar som överlappar [fran, till)
+    assert [k[3:] for k in krockar(index, t('2026-01-26 10:00'), t('2026-01-26 11:30'))] == [('A2', 'A3')]
+    assert krockar(index, t('2026-01-26 12:00'), t('2026-01-27 00:00')) == []
+    # Per lokal, utan hänsyn till stora/små bokstäver
+    assert [k[3:] for k in krockar(index, lokal=' b302 ')] == [('A1', 'A2'), ('A2', 'A3')]
+    assert [k[3:] for k in krockar(index, t('2026-01-26 11:00'), lokal='C201')] == [('B1', 'B2')]
+    assert krockar(index, lokal='D100') == [] and krockar(index, lokal='Finns inte') == []
+
+def test_free_rooms():
+    index = SchemaIndex(POSTER)
+    assert index.lokaler() == ['B302', 'C201', 'D100', 'c201']
+    assert index.lediga_lokaler(t('2026-01-26 15:00'), t('2026-01-26 16:00')) == (['B302', 'C201', 'D100', 'c201'], [])
+    assert index.lediga_lokaler(t('2026-01-26 12:00'), t('2026-01-26 13:01')) == (['B302', 'c201'], ['C201', 'D100'])
+    # Gränserna är halvöppna: en bokning som slutar 12:00 stör inte från 12:00
+    assert index.ar_ledig('B302', t('2026-01-26 12:00'), t('2026-01-26 18:00'))
+    assert not index.ar_ledig('B302', t('2026-01-26 07:00'), t('2026-01-26 08:01'))
+    assert index.ar_ledig('B302', t('2026-01-26 07:00'), t('2026-01-26 08:00'))
+    assert index.ar_ledig('Finns inte', t('2026-01-26 07:00'), t('2026-01-26 18:00'))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_schedule_matches_brute_force(seed):
+    rnd = random.Random(seed)
+    lokaler = ['B302', 'C201', 'D100', 'E1']
+    poster = []
+    for i in range(150):
+        start = datetime(2026, 1, 26, 8) + timedelta(days=rnd.randrange(5), minutes=15 * rnd.randrange(36))
+        slut = start + timedelta(minutes=15 * rnd.randrange(1, 16))
+        poster.append(bokning(f'K{i}', rnd.choice(lokaler), start.strftime('%Y-%m-%d'),
+                              f'{start:%H:%M} - {slut:%H:%M}'))
+    index = SchemaIndex(poster)
+    tider = [tolka_tid(post) for post in poster]
+    par = [(a, b, tider[i], tider[j]) for (i, a), (j, b) in combinations(enumerate(poster), 2)
+           if a['lokal'] == b['lokal']]
+
+    def brute_krockar(fran, till, lokal):
+        svar = set()
+        for a, b, (a_start, a_slut), (b_start, b_slut) in par:
+            if lokal and a['lokal'] != lokal:
+                continue
+            start, slut = max(a_start, b_start), min(a_slut, b_slut)
+            if start < slut and (fran is None or slut > fran) and (till is None or start < till):
+                svar.add((start, slut, a['lokal'], frozenset((a['kurs'], b['kurs']))))
+        return svar
+
+    for _ in range(20):
+        fran = datetime(2026, 1, 26, 8) + timedelta(days=rnd.randrange(5), minutes=15 * rnd.randrange(48))
+        till = fran + timedelta(minutes=15 * rnd.randrange(1, 40))
+        for lokal in [None] + lokaler:
+            svar = index.konflikter(fran, till, lokal)
+            assert [k[0] for k in svar] == sorted(k[0] for k in svar)
+            assert {(s, e, l, frozenset((a['kurs'], b['kurs']))) for s, e, l, a, b in svar} == brute_krockar(fran, till, lokal)
+        lediga, upptagna = index.lediga_lokaler(fran, till)
+        assert set(upptagna) == {post['lokal'] for post, (start, slut) in zip(poster, tider)
+                                 if start < till and slut > fran}
+        assert sorted(lediga + upptagna) == index.lokaler()
+
+def test_conflicts_route(client, monkeypatch):
+    from myblueprints import duschema_bp
+    from myblueprints.swrcache import SWRCache
+    monkeypatch.setattr(duschema_bp, 'schema_cache', SWRCache(lambda: SchemaIndex(POSTER), ttl=60))
+    body = client.get('/duschema/conflicts?fran=2026-01-26&till=2026-01-26&lokal=c201').get_json()
+    assert body['count'] == 1
+    krock = body['conflicts'][0]
+    assert (krock['lokal'], krock['fran'], krock['till']) == ('C201', '2026-01-26 11:30', '2026-01-26 12:00')
+    assert [post['kurs'] for post in krock['bokningar']] == ['B1', 'B2']
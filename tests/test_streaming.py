@@ -0,0 +1,59 @@
+# tests/test_streaming.py
+# Strömmade listor (v6 och v7): en JSON-lista eller NDJSON beroende på Accept, och en egen
+# ETag per format så att 304 bara ges för det format klienten redan har.
+import pytest
+
+from myblueprints import jsoncodec, streaming
+
+KEY = {'x-api-key': 'abc'}
+NDJSON = {**KEY, 'Accept': streaming.NDJSON_MIMETYPE}
+JSON = {**KEY, 'Accept': 'application/json'}
+URLS = ['/api/v6/friends/', '/api/v7/friends/']
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Tre vänner i bitar om två: delningen mellan bitarna kommer med
+    monkeypatch.setattr(streaming, 'CHUNK_SIZE', 2)
+
+@pytest.mark.parametrize('url', URLS)
+def test_json_array(client, small_chunks, url):
+    response = client.get(url, headers=JSON)
+    assert response.mimetype == 'application/json'
+    assert not response.is_sequence  # strömmat, inte en färdig sträng
+    friends = jsoncodec.loads(response.get_data())
+    assert [f['id'] for f in friends] == [1, 2, 3]
+    assert friends[0] == {"id": 1, "name": "Harvey Specter", "email": "harvey@law.com", "status": "Awesome"}
+    assert response.headers['Vary'] == 'Accept'
+
+@pytest.mark.parametrize('url', URLS)
+def test_ndjson(client, small_chunks, url):
+    response = client.get(url, headers=NDJSON)
+    assert response.mimetype == streaming.NDJSON_MIMETYPE
+    lines = response.get_data(as_text=True).split('\n')
+    assert lines[-1] == ''
+    assert [jsoncodec.loads(line)['id'] for line in lines[:-1]] == [1, 2, 3]
+    assert response.headers['Vary'] == 'Accept'
+
+def test_empty_list(client, url='/api/v6/friends/'):
+    response = client.get(url + '?status=Ingen', headers=JSON)
+    assert response.get_json() == []
+    assert client.get(url + '?status=Ingen', headers=NDJSON).get_data() == b''
+
+@pytest.mark.parametrize('url', URLS)
+def test_each_format_gets_its_own_304(client, url):
+    etags = {}
+    for name, headers in (('json', JSON), ('ndjson', NDJSON)):
+        response = client.get(url, headers=headers)
+        response.get_data()
+        etags[name] = response.headers['ETag']
+    assert etags['json'] != etags['ndjson']
+    for name, headers in (('json', JSON), ('ndjson', NDJSON)):
+        response = client.get(url, headers={**headers, 'If-None-Match': etags[name]})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['Vary'] == 'Accept'
+    # Det andra formatets ETag räcker inte
+    response = client.get(url, headers={**NDJSON, 'If-None-Match': etags['json']})
+    assert response.status_code == 200
+    assert response.mimetype == streaming.NDJSON_MIMETYPE
+    response.get_data()
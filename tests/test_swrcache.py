@@ -0,0 +1,100 @@
+# tests/test_swrcache.py
+# SWRCache mot en lokal "du.se": en liten HTTP-server i en tråd som räknar anropen och
+# svarar långsamt, så att många samtidiga anrop hinner krocka.
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from myblueprints import httpclient
+from myblueprints.swrcache import SWRCache
+
+class Upstream(BaseHTTPRequestHandler):
+    delay = 0.3
+    hits = 0
+    status = 200
+
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(self.delay)
+        body = f'svar {self.hits}'.encode()
+        self.send_response(self.status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def upstream():
+    Upstream.hits, Upstream.status = 0, 200
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+def fetcher(url):
+    def fetch():
+        response = httpclient.get(url, timeout=5)
+        response.raise_for_status()
+        return response.text
+    return fetch
+
+def get_concurrently(cache, count):
+    results = []
+    def worker():
+        try:
+            results.append(cache.get()[0])
+        except Exception as e:
+            results.append(e)
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+def test_cold_start_is_fetched_once(upstream):
+    cache = SWRCache(fetcher(upstream), ttl=60)
+    assert get_concurrently(cache, 20) == ['svar 1'] * 20
+    assert Upstream.hits == 1
+
+def test_stale_data_is_served_while_one_refresh_runs(upstream):
+    cache = SWRCache(fetcher(upstream), ttl=0.1)
+    assert cache.get()[0] == 'svar 1'
+    time.sleep(0.2)
+    start = time.perf_counter()
+    # Alla får den gamla datan direkt, utan att vänta på den långsamma servern
+    assert get_concurrently(cache, 20) == ['svar 1'] * 20
+    assert time.perf_counter() - start < Upstream.delay
+    while cache._refreshing is not None:
+        time.sleep(0.01)
+    assert Upstream.hits == 2
+    assert cache.get()[0] == 'svar 2'
+
+def test_failed_cold_start_is_raised_to_every_waiter(upstream):
+    Upstream.status = 404
+    cache = SWRCache(fetcher(upstream), ttl=60)
+    results = get_concurrently(cache, 10)
+    assert all(isinstance(result, Exception) for result in results)
+    assert Upstream.hits == 1
+    # Nästa anrop försöker igen
+    Upstream.status = 200
+    assert cache.get()[0] == 'svar 2'
+
+def test_interrupted_refresh_is_not_left_refreshing():
+    calls = []
+    def fetch():
+        calls.append(1)
+        if len(calls) == 1:
+            raise KeyboardInterrupt
+        return 'ok'
+    cache = SWRCache(fetch, ttl=60)
+    with pytest.raises(KeyboardInterrupt):
+        cache.get()
+    assert cache._refreshing is None
+    assert cache.get()[0] == 'ok'
+    assert len(calls) == 2
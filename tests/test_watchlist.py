@@ -0,0 +1,142 @@
+# tests/test_watchlist.py
+# Bevakningslistorna: Aho-Corasick mot en enkel sökning, nycklarna för IOC-värden,
+# avgränsade träffar (även över gränsen mellan bitar vid strömning) och omladdning.
+import os
+import random
+
+import pytest
+
+from myblueprints import regex_bp
+from myblueprints.watchlist import AhoCorasick, WatchlistStore, ioc_nyckel
+
+def alla_forekomster(text, orden):
+    return sorted((i, ordet, namn) for ordet, namn in orden
+                  for i in range(len(text)) if text.startswith(ordet, i))
+
+def automat(orden):
+    a = AhoCorasick()
+    for ordet, namn in orden:
+        a.add(ordet, namn)
+    return a.bygg()
+
+def test_aho_corasick_finds_overlapping_words():
+    orden = [('he', 'a'), ('she', 'a'), ('his', 'b'), ('hers', 'b'), ('s', 'c')]
+    a = automat(orden)
+    assert sorted(a.sok('ushers')) == [(1, 's', 'c'), (1, 'she', 'a'), (2, 'he', 'a'), (2, 'hers', 'b'), (5, 's', 'c')]
+    # start: bara förekomster som börjar på start eller senare
+    assert sorted(a.sok('ushers', 2)) == [(2, 'he', 'a'), (2, 'hers', 'b'), (5, 's', 'c')]
+    assert len(a) == 9 and a.langsta == 4
+
+@pytest.mark.parametrize('seed', range(20))
+def test_aho_corasick_same_as_brute_force(seed):
+    rnd = random.Random(seed)
+    alfabet = 'abc.'
+    orden = {(''.join(rnd.choice(alfabet) for _ in range(rnd.randrange(1, 6))), rnd.choice('xy'))
+             for _ in range(rnd.randrange(1, 30))}
+    text = ''.join(rnd.choice(alfabet) for _ in range(300))
+    assert sorted(automat(orden).sok(text)) == alla_forekomster(text, orden)
+
+def test_ioc_nyckel():
+    md5 = '85202888629f635f3d3d6396f9a65d78'
+    assert ioc_nyckel(md5.upper()) == ioc_nyckel(f'  {md5}\n') == bytes.fromhex(md5)
+    sha1 = 'da39a3ee5e6b4b0d3255bfef95601890afd80709'
+    assert ioc_nyckel(sha1.upper()) == bytes.fromhex(sha1)
+    # 33 hextecken är ingen hash: jämförs som text
+    assert ioc_nyckel(md5 + 'A') == md5 + 'a'
+    assert ioc_nyckel('192.168.1.50') == ioc_nyckel(' 192.168.1.50 ') == 3232235826
+    assert ioc_nyckel('999.1.1.1') == '999.1.1.1'
+    assert ioc_nyckel('Nisse@Bolaget.SE') == 'nisse@bolaget.se'
+
+@pytest.fixture
+def listkatalog(tmp_path):
+    (tmp_path / 'hot.txt').write_text(
+        '# kända IOC:er\n85202888629F635F3D3D6396F9A65D78  # md5\n192.168.1.50,källa\nNisse@Bolaget.se\n',
+        encoding='utf-8')
+    (tmp_path / 'domaner.literals.txt').write_text('Evil.com\n/tmp/x.sh\n', encoding='utf-8')
+    return tmp_path
+
+def test_values_and_literals_are_flagged(listkatalog):
+    listor = WatchlistStore(str(listkatalog), check_interval=0).get()
+    text = ('md5 85202888629f635f3d3d6396f9a65d78 från 192.168.1.50 och 10.0.0.1, '
+            'mail NISSE@bolaget.se. Länk evil.com, EVIL.COM/x, notevil.com, evil.commerce, '
+            'kör /tmp/x.sh')
+    analys = regex_bp.analysera_text(text)
+    rapport = regex_bp.bevaka(analys, text, listor)
+    assert rapport['hits'] == {
+        'md5_hash': {'85202888629f635f3d3d6396f9a65d78': ['hot']},
+        'ipv4': {'192.168.1.50': ['hot']},
+        'email': {'NISSE@bolaget.se': ['hot']},
+    }
+    assert rapport['literals'] == [{"list": "domaner", "match": "/tmp/x.sh", "count": 1},
+                                   {"list": "domaner", "match": "evil.com", "count": 2}]
+    assert rapport['lists'] == {'hot': 3, 'domaner': 2}
+
+def literal_antal(listor, text, bitar, overlap):
+    # Samma text strömmad i bitar om 'bitar' tecken, med ett litet OVERLAP
+    gammal = regex_bp.OVERLAP
+    regex_bp.OVERLAP = overlap
+    try:
+        analys = regex_bp.StromAnalys(listor)
+    finally:
+        regex_bp.OVERLAP = gammal
+    for i in range(0, len(text), bitar):
+        analys.mata(text[i:i + bitar])
+    analys.avsluta()
+    return analys.literal_antal
+
+@pytest.mark.parametrize('bitar', [1, 3, 7, 50])
+def test_literals_across_chunks(listkatalog, bitar):
+    listor = WatchlistStore(str(listkatalog), check_interval=0).get()
+    text = ('x' * 30 + ' evil.com ' + 'y' * 20 + 'notevil.com evil.comx evil.com' + '.' * 40
+            + 'kör /tmp/x.sh;' + 'z' * 30 + '/tmp/x.shell')
+    helt = {}
+    listor.rakna_literaler(text, helt)
+    assert helt == {('domaner', 'evil.com'): 2, ('domaner', '/tmp/x.sh'): 1}
+    assert literal_antal(listor, text, bitar, overlap=4) == helt
+
+def test_literal_longer_than_overlap_checks_next_chunk(tmp_path):
+    # Ett ord som är längre än OVERLAP och slutar precis där en bit slutar: om nästa bit
+    # börjar med en bokstav är det inte en avgränsad träff
+    lang = 'c2.' + 'a' * 40 + '.example'
+    (tmp_path / 'lang.literals.txt').write_text(lang + '\n', encoding='utf-8')
+    listor = WatchlistStore(str(tmp_path), check_interval=0).get()
+    assert listor.literal_overlap() == len(lang)
+    for efter, antal in (('x rest av texten', {}), (' rest av texten', {('lang', lang): 1})):
+        text = 'se ' + lang + efter + '.' * 100
+        helt = {}
+        listor.rakna_literaler(text, helt)
+        assert helt == antal
+        assert regex_bp.StromAnalys(listor)._overlap >= len(lang)
+        for bitar in (len('se ' + lang), 5):
+            assert literal_antal(listor, text, bitar, overlap=8) == antal
+
+def test_store_reloads_when_files_change(listkatalog):
+    store = WatchlistStore(str(listkatalog), check_interval=0)
+    forsta = store.get()
+    assert store.get() is forsta  # inget ändrat: samma objekt
+    (listkatalog / 'hot.txt').write_text('10.0.0.1\n', encoding='utf-8')
+    andra = store.get()
+    assert andra is not forsta and andra.version != forsta.version
+    assert andra.storlekar == {'hot': 1, 'domaner': 2}
+    assert andra.flagga_varden({'ipv4': ['10.0.0.1', '192.168.1.50']}) == {'ipv4': {'10.0.0.1': ['hot']}}
+    (listkatalog / 'ny.txt').write_text('a@b.se\n', encoding='utf-8')
+    assert set(store.get().storlekar) == {'hot', 'domaner', 'ny'}
+    for namn in os.listdir(listkatalog):
+        os.remove(listkatalog / namn)
+    assert store.get() is None
+
+def test_store_checks_at_most_every_interval(listkatalog):
+    store = WatchlistStore(str(listkatalog), check_interval=3600)
+    forsta = store.get()
+    (listkatalog / 'hot.txt').write_text('10.0.0.1\n', encoding='utf-8')
+    assert store.get() is forsta
+    assert WatchlistStore(str(listkatalog / 'finns-inte')).get() is None
+
+def test_watchlist_in_regex_route(client, listkatalog, monkeypatch):
+    monkeypatch.setattr(regex_bp, 'watchlists', WatchlistStore(str(listkatalog), check_interval=0))
+    text = 'ip 192.168.1.50 länk https://evil.com/a'
+    body = client.post('/regex/', json={"content": text}).get_json()
+    assert body['watchlist']['hits'] == {'ipv4': {'192.168.1.50': ['hot']}}
+    assert body['watchlist']['literals'] == [{"list": "domaner", "match": "evil.com", "count": 1}]
+    body = client.post('/regex/stream', data=text.encode('utf-8'), content_type='text/plain').get_json()
+    assert body['watchlist']['literals'] == [{"list": "domaner", "match": "evil.com", "count": 1}]